@@ -0,0 +1,92 @@
+"""Benchmarks the serving paths of the classification head against the previous predict path.
+
+Run from the ml folder with: python -m benchmarks.classifier_inference --threads 1
+Embeddings are random, so only the head is measured, not the sentence encoder.
+"""
+
+import argparse
+import time
+from typing import Callable, Dict, List
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+
+from src.models.torch_head import TorchClassifierHead, configure_torch_threads
+from src.models.trained_classifier import build_classification_head
+
+
+def legacy_predict(head: torch.nn.Module) -> Callable[[np.ndarray], np.ndarray]:
+    """The previous path: no_grad, and an autograd-ready clone of the embeddings"""
+
+    def run(embeddings: np.ndarray) -> np.ndarray:
+        with torch.no_grad():
+            inputs = torch.as_tensor(embeddings, dtype=torch.float32)
+            inputs = inputs.clone().detach().requires_grad_(True)
+            return F.softmax(head(inputs), dim=1).numpy()
+
+    return run
+
+
+def serving_predict(head: TorchClassifierHead) -> Callable[[np.ndarray], np.ndarray]:
+    def run(embeddings: np.ndarray) -> np.ndarray:
+        return F.softmax(torch.from_numpy(head(embeddings)), dim=1).numpy()
+
+    return run
+
+
+def throughput(
+    fn: Callable[[np.ndarray], np.ndarray], embeddings: np.ndarray, min_seconds: float
+) -> float:
+    """Rows per second, after a few warm-up calls"""
+    for _ in range(3):
+        fn(embeddings)
+    calls = 0
+    start = time.perf_counter()
+    while (elapsed := time.perf_counter() - start) < min_seconds:
+        fn(embeddings)
+        calls += 1
+    return calls * len(embeddings) / elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 64, 512])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--hidden-dim", type=int, default=128)
+    parser.add_argument("--classes", type=int, default=300)
+    parser.add_argument("--threads", type=int, help="Intra-op threads, like one worker")
+    parser.add_argument("--seconds", type=float, default=1.0)
+    parser.add_argument(
+        "--with-compile", action="store_true", help="Also measure torch.compile"
+    )
+    args = parser.parse_args()
+
+    configure_torch_threads(args.threads, None)
+    head = build_classification_head(args.dim, args.hidden_dim, 0.3, args.classes).eval()
+
+    paths: Dict[str, Callable[[np.ndarray], np.ndarray]] = {
+        "legacy no_grad": legacy_predict(head),
+        "inference_mode": serving_predict(TorchClassifierHead(head, args.dim)),
+        "torchscript": serving_predict(
+            TorchClassifierHead(head, args.dim, "torchscript")
+        ),
+    }
+    if args.with_compile:
+        paths["torch.compile"] = serving_predict(
+            TorchClassifierHead(head, args.dim, "compile")
+        )
+
+    rng = np.random.default_rng(0)
+    header: List[str] = [f"{'path':<16}"] + [f"{f'batch {b}':>14}" for b in args.batch_sizes]
+    print("".join(header) + "   (rows/s)")
+    for name, fn in paths.items():
+        row = [f"{name:<16}"]
+        for batch_size in args.batch_sizes:
+            embeddings = rng.normal(size=(batch_size, args.dim)).astype(np.float32)
+            row.append(f"{throughput(fn, embeddings, args.seconds):>14,.0f}")
+        print("".join(row))
+
+
+if __name__ == "__main__":
+    main()
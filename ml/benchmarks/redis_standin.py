@@ -0,0 +1,174 @@
+"""In-process stand-in for a Redis server, so the cache backends can be benchmarked offline.
+
+It speaks RESP2 over a local TCP socket, so the real redis clients and their round-trips are exercised, but only
+implements the handful of commands the caches send. Everything lives in a dict, on a thread of its own.
+"""
+
+import asyncio
+import bisect
+import fnmatch
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+Reply = None | bytes | int | str | list | Exception
+
+
+class RedisStandIn:
+    def __init__(self, host: str = "127.0.0.1"):
+        self.host = host
+        self.port: Optional[int] = None
+        # key -> (value, expiry as a time.monotonic() deadline or None)
+        self.data: Dict[bytes, Tuple[bytes, Optional[float]]] = {}
+        self.commands = 0
+        # SCAN cursor -> last key it returned, so keys deleted meanwhile don't make the next page skip any
+        self._scan_cursors: Dict[int, bytes] = {}
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server: Optional[asyncio.Server] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> int:
+        """Starts serving on a free port, which is returned"""
+        started = threading.Event()
+
+        def run() -> None:
+            self._loop = asyncio.new_event_loop()
+            self._server = self._loop.run_until_complete(
+                asyncio.start_server(self.__handle, self.host, 0)
+            )
+            self.port = self._server.sockets[0].getsockname()[1]
+            started.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, name="redis-standin", daemon=True)
+        self._thread.start()
+        started.wait()
+        return self.port
+
+    def stop(self) -> None:
+        if self._loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self.__shutdown(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._loop = None
+
+    def flush(self) -> None:
+        self.data.clear()
+
+    async def __shutdown(self) -> None:
+        """Closes the server along with the connections clients left open"""
+        self._server.close()
+        connections = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in connections:
+            task.cancel()
+        await asyncio.gather(*connections, return_exceptions=True)
+
+    async def __handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while (command := await self.__read_command(reader)) is not None:
+                self.commands += 1
+                writer.write(encode_reply(self.__execute(command)))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, asyncio.CancelledError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def __read_command(reader: asyncio.StreamReader) -> Optional[List[bytes]]:
+        line = await reader.readline()
+        if not line:
+            return None
+        arguments = []
+        for _ in range(int(line[1:-2])):
+            length = int((await reader.readline())[1:-2])
+            arguments.append((await reader.readexactly(length + 2))[:-2])
+        return arguments
+
+    def __execute(self, command: List[bytes]) -> Reply:
+        name, arguments = command[0].upper().decode(), command[1:]
+        if name in ("PING",):
+            return "PONG"
+        if name in ("CLIENT", "SELECT"):
+            return "OK"
+        if name == "GET":
+            return self.__get(arguments[0])
+        if name == "MGET":
+            return [self.__get(key) for key in arguments]
+        if name == "SET":
+            ttl = None
+            if len(arguments) >= 4 and arguments[2].upper() == b"EX":
+                ttl = int(arguments[3])
+            return self.__set(arguments[0], arguments[1], ttl)
+        if name == "SETEX":
+            return self.__set(arguments[0], arguments[2], int(arguments[1]))
+        if name in ("DEL", "UNLINK"):
+            return sum(self.data.pop(key, None) is not None for key in arguments)
+        if name == "EXISTS":
+            return sum(self.__get(key) is not None for key in arguments)
+        if name == "KEYS":
+            return self.__matching(arguments[0])
+        if name == "SCAN":
+            return self.__scan(arguments)
+        if name in ("FLUSHDB", "FLUSHALL"):
+            self.flush()
+            return "OK"
+        if name == "DBSIZE":
+            return len(self.data)
+        return Exception(f"ERR unknown command '{name}'")
+
+    def __get(self, key: bytes) -> Optional[bytes]:
+        entry = self.data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self.data[key]
+            return None
+        return value
+
+    def __set(self, key: bytes, value: bytes, ttl: Optional[int]) -> str:
+        self.data[key] = (value, None if ttl is None else time.monotonic() + ttl)
+        return "OK"
+
+    def __matching(self, pattern: bytes) -> List[bytes]:
+        return [key for key in list(self.data) if fnmatch.fnmatchcase(key, pattern)]
+
+    def __scan(self, arguments: List[bytes]) -> list:
+        """SCAN cursor [MATCH pattern] [COUNT count], each cursor resuming after the last key its page held in the
+        sorted keys"""
+        cursor, pattern, count = int(arguments[0]), b"*", 10
+        options = [argument.upper() for argument in arguments[1::2]]
+        for option, value in zip(options, arguments[2::2]):
+            if option == b"MATCH":
+                pattern = value
+            elif option == b"COUNT":
+                count = int(value)
+
+        keys = sorted(self.data)
+        start = bisect.bisect_right(keys, self._scan_cursors.pop(cursor, b"")) if cursor else 0
+        page = keys[start : start + count]
+        next_cursor = 0
+        if start + count < len(keys):
+            next_cursor = len(self._scan_cursors) + 1
+            while next_cursor in self._scan_cursors:
+                next_cursor += 1
+            self._scan_cursors[next_cursor] = page[-1]
+        return [str(next_cursor).encode(), [key for key in page if fnmatch.fnmatchcase(key, pattern)]]
+
+
+def encode_reply(reply: Reply) -> bytes:
+    if reply is None:
+        return b"$-1\r\n"
+    if isinstance(reply, Exception):
+        return f"-{reply}\r\n".encode()
+    if isinstance(reply, str):
+        return f"+{reply}\r\n".encode()
+    if isinstance(reply, int):
+        return f":{reply}\r\n".encode()
+    if isinstance(reply, bytes):
+        return b"$%d\r\n%s\r\n" % (len(reply), reply)
+    return b"*%d\r\n" % len(reply) + b"".join(encode_reply(item) for item in reply)
@@ -0,0 +1,309 @@
+"""Load-tests the whole service over HTTP, with local stand-ins instead of the models and of Redis.
+
+Run from the ml folder with: python -m benchmarks.service_load --concurrency 16 --output report.json
+The app is created with create_app and served by uvicorn in-process. The sentence encoder is replaced by a
+deterministic hashing encoder (optionally spending a fixed time per text, like the real one), the classification
+head by a nearest-known-text lookup and Redis by an in-process stand-in, so it runs offline. The anomaly detector,
+the caches, the micro-batching and the HTTP layer are the real ones.
+
+/repairs and /repairs_batch are driven with the cache off, then with a cold cache, then again with the same texts
+once the cache is warm. The JSON report can be diffed between releases.
+"""
+
+import argparse
+import csv
+import hashlib
+import http.client
+import json
+import os
+import platform
+import socket
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import uvicorn
+
+from benchmarks.redis_standin import RedisStandIn
+from src.app import create_app
+from src.core.config import AppConfig, EmbeddingCacheConfig, load_config
+from src.core.interfaces import Candidate, EmbeddingProvider, RepairClassifier
+from src.similarity.searcher import SimilarityAnomalyDetector
+
+ENDPOINTS = ("/repairs", "/repairs_batch")
+
+
+class HashingEmbedder(EmbeddingProvider):
+    """Deterministic stand-in for the sentence encoder: signed, hashed word features, unit-norm"""
+
+    def __init__(self, dimension: int = 384, seconds_per_text: float = 0.0):
+        self.dimension = dimension
+        # Time spent per text, releasing the GIL like the real encoder's kernels
+        self.seconds_per_text = seconds_per_text
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        embeddings = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                hashed = int.from_bytes(hashlib.blake2b(word.encode(), digest_size=8).digest())
+                embeddings[row, hashed % self.dimension] += 1 if hashed >> 63 else -1
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        if self.seconds_per_text:
+            time.sleep(self.seconds_per_text * len(texts))
+        return embeddings / np.maximum(norms, 1e-12)
+
+    def get_dimension(self) -> int:
+        return self.dimension
+
+    def get_model_name(self) -> Optional[str]:
+        return "hashing-stand-in"
+
+
+class NearestKnownClassifier(RepairClassifier):
+    """Stand-in for the classification head: the label of the most similar known text"""
+
+    def __init__(self, embedder: EmbeddingProvider, texts: List[str], labels: List[Tuple[str, str]]):
+        self.embedder = embedder
+        self.known_embeddings = embedder.encode(texts)
+        self.labels = labels
+
+    def predict(
+        self, texts: str | List[str], embeddings: Optional[np.ndarray] = None
+    ) -> Tuple[str, str] | List[Tuple[str, str]]:
+        similarities = self.__similarities(texts, embeddings)
+        return [self.labels[i] for i in similarities.argmax(axis=1)]
+
+    def predict_top_k(
+        self, texts: List[str], k: int, embeddings: Optional[np.ndarray] = None
+    ) -> List[Tuple[Tuple[str, str], List[Candidate]]]:
+        similarities = self.__similarities(texts, embeddings)
+        results = []
+        for row in similarities:
+            top = np.argsort(-row)[:k]
+            candidates = [(*self.labels[i], float(row[i])) for i in top]
+            results.append((self.labels[top[0]], candidates))
+        return results
+
+    def get_labels(self) -> List[Tuple[str, str]]:
+        return sorted(set(self.labels))
+
+    def __similarities(self, texts: str | List[str], embeddings: Optional[np.ndarray]) -> np.ndarray:
+        if embeddings is None:
+            embeddings = self.embedder.encode([texts] if isinstance(texts, str) else texts)
+        return embeddings @ self.known_embeddings.T
+
+
+def read_corpus(path: Path) -> Tuple[List[str], List[Tuple[str, str]]]:
+    with open(path, newline="", encoding="utf-8") as corpus_file:
+        rows = [row for row in csv.DictReader(corpus_file) if row["title"].strip()]
+    return [row["title"].strip() for row in rows], [(row["section"], row["name"]) for row in rows]
+
+
+def workload(titles: List[str], count: int, tag: str) -> List[str]:
+    """count distinct texts, variations of the known titles, so no two requests share a cache key"""
+    return [f"{titles[i % len(titles)]} {tag} {i}" for i in range(count)]
+
+
+def percentile_ms(latencies: List[float], percentile: float) -> float:
+    return round(float(np.percentile(latencies, percentile)) * 1000, 3) if latencies else 0.0
+
+
+def drive(
+    port: int, path: str, bodies: List[bytes], concurrency: int, texts_per_request: int
+) -> Dict[str, float]:
+    """Posts all the bodies to the path from concurrency keep-alive connections, and summarizes the latencies"""
+    pending: Iterator[bytes] = iter(bodies)
+    lock = threading.Lock()
+    latencies: List[float] = []
+    errors = 0
+
+    def client() -> None:
+        nonlocal errors
+        connection = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        while True:
+            with lock:
+                body = next(pending, None)
+            if body is None:
+                break
+            start = time.perf_counter()
+            connection.request("POST", path, body, {"Content-Type": "application/json"})
+            response = connection.getresponse()
+            response.read()
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                errors += response.status != 200
+        connection.close()
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall_seconds = time.perf_counter() - start
+
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "p50_ms": percentile_ms(latencies, 50),
+        "p95_ms": percentile_ms(latencies, 95),
+        "p99_ms": percentile_ms(latencies, 99),
+        "mean_ms": round(float(np.mean(latencies)) * 1000, 3) if latencies else 0.0,
+        "requests_per_second": round(len(latencies) / wall_seconds, 1),
+        "texts_per_second": round(len(latencies) * texts_per_request / wall_seconds, 1),
+    }
+
+
+class InProcessServer:
+    """Serves an app with uvicorn on a thread of this process, on a free local port"""
+
+    def __init__(self, app):
+        self.socket = socket.socket()
+        self.socket.bind(("127.0.0.1", 0))
+        self.port = self.socket.getsockname()[1]
+        self.server = uvicorn.Server(uvicorn.Config(app, log_level="warning", lifespan="on"))
+        self.thread = threading.Thread(target=self.server.run, kwargs={"sockets": [self.socket]})
+
+    def __enter__(self) -> "InProcessServer":
+        self.thread.start()
+        self.wait_until_ready()
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.server.should_exit = True
+        self.thread.join()
+        self.socket.close()
+
+    def wait_until_ready(self, timeout: float = 120) -> None:
+        """Waits for /readyz, the models being loaded and warmed up in the background"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.server.started:
+                connection = http.client.HTTPConnection("127.0.0.1", self.port, timeout=5)
+                connection.request("GET", "/readyz")
+                status = connection.getresponse().status
+                connection.close()
+                if status == 200:
+                    return
+            time.sleep(0.05)
+        raise TimeoutError("The service didn't get ready in time")
+
+
+def benchmark_config(base: AppConfig, corpus_path: Path, cache_enabled: bool, redis_port: int) -> AppConfig:
+    """The configured app, with the known corpus given and the caches pointed at the stand-ins"""
+    cache = base.cache.model_copy(update={"enabled": cache_enabled})
+    if cache.redis is not None:
+        cache.redis = cache.redis.model_copy(update={"host": "127.0.0.1", "port": redis_port})
+    return base.model_copy(
+        update={
+            "similarity": base.similarity.model_copy(
+                update={"data_path": corpus_path, "artifact_dir": None}
+            ),
+            "cache": cache,
+            # Embeddings would otherwise be cached too, which is what the cache-off scenario must not have
+            "embedding_cache": EmbeddingCacheConfig(enabled=False),
+            "server": base.server.model_copy(update={"workers": 1}),
+        }
+    )
+
+
+def run_scenarios(args: argparse.Namespace) -> Dict[str, Dict[str, Dict[str, float]]]:
+    base = load_config(args.config)
+    if args.cache_type is not None:
+        base.cache.type = args.cache_type
+    titles, labels = read_corpus(args.corpus)
+
+    embedder = HashingEmbedder(seconds_per_text=args.encoder_ms_per_text / 1000)
+    classifier = NearestKnownClassifier(embedder, titles, labels)
+
+    single_texts = workload(titles, args.requests, "single")
+    batch_texts = workload(titles, args.requests * args.batch_size, "batch")
+    bodies = {
+        "/repairs": [json.dumps({"text": text}).encode() for text in single_texts],
+        "/repairs_batch": [
+            json.dumps({"texts": batch_texts[i : i + args.batch_size]}).encode()
+            for i in range(0, len(batch_texts), args.batch_size)
+        ],
+    }
+    texts_per_request = {"/repairs": 1, "/repairs_batch": args.batch_size}
+
+    redis = RedisStandIn()
+    redis_port = redis.start()
+    results: Dict[str, Dict[str, Dict[str, float]]] = {}
+    with tempfile.TemporaryDirectory() as corpus_dir:
+        # The detector reads one known text per line
+        corpus_path = Path(corpus_dir) / "known_texts.txt"
+        corpus_path.write_text("\n".join(titles), encoding="utf-8")
+
+        for cache_enabled, scenarios in ((False, ["cache_off"]), (True, ["cold_cache", "warm_cache"])):
+            if not set(scenarios) & set(args.scenarios):
+                continue
+            config = benchmark_config(base, corpus_path, cache_enabled, redis_port)
+            detector = SimilarityAnomalyDetector(config.similarity, embedder)
+            redis.flush()
+            with InProcessServer(create_app(config, (detector, classifier, embedder))) as server:
+                # The cold pass runs even when only warm_cache is asked for, it is what warms the cache
+                for scenario in scenarios:
+                    results.setdefault(scenario, {})
+                    for path in ENDPOINTS:
+                        summary = drive(
+                            server.port, path, bodies[path], args.concurrency, texts_per_request[path]
+                        )
+                        if scenario in args.scenarios:
+                            results[scenario][path] = summary
+                            print_summary(scenario, path, summary)
+    redis.stop()
+    return {scenario: result for scenario, result in results.items() if result}
+
+
+def print_summary(scenario: str, path: str, summary: Dict[str, float]) -> None:
+    print(
+        f"{scenario:<12}{path:<16}{summary['p50_ms']:>10.2f}{summary['p95_ms']:>10.2f}"
+        f"{summary['p99_ms']:>10.2f}{summary['requests_per_second']:>10.1f}{summary['texts_per_second']:>12.1f}"
+        f"{summary['errors']:>8}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--config", type=Path, default=Path("config.yaml"))
+    parser.add_argument("--corpus", type=Path, default=Path("dataset.csv"), help="CSV with title, section, name")
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per endpoint and scenario")
+    parser.add_argument("--batch-size", type=int, default=32, help="Texts per /repairs_batch request")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--encoder-ms-per-text", type=float, default=0.0)
+    parser.add_argument(
+        "--cache-type", choices=["redis", "redis_async", "memory", "tiered"], help="Defaults to the configured one"
+    )
+    parser.add_argument(
+        "--scenarios", nargs="+", choices=["cache_off", "cold_cache", "warm_cache"],
+        default=["cache_off", "cold_cache", "warm_cache"],
+    )
+    parser.add_argument("--output", type=Path, help="Where the JSON report is written")
+    args = parser.parse_args()
+
+    print(f"{'scenario':<12}{'endpoint':<16}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}{'texts/s':>12}{'errors':>8}")
+    scenarios = run_scenarios(args)
+
+    if args.output is not None:
+        report = {
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "environment": {
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "cpus": os.cpu_count(),
+            },
+            "settings": {name: str(value) if isinstance(value, Path) else value for name, value in vars(args).items()},
+            "scenarios": scenarios,
+        }
+        args.output.write_text(json.dumps(report, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+        print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
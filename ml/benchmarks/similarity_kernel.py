@@ -0,0 +1,68 @@
+"""Benchmarks the top-1 similarity kernel against the previous sklearn based path.
+
+Run from the ml folder with: python -m benchmarks.similarity_kernel --known 50000 --queries 2000
+"""
+
+import argparse
+import time
+from typing import Callable, List
+
+import numpy as np
+from sklearn.metrics.pairwise import cosine_similarity, euclidean_distances
+
+from src.similarity.kernel import Top1SimilarityKernel
+
+
+def sklearn_top1(queries: np.ndarray, known: np.ndarray, metric: str) -> List[float]:
+    """The previous detector path: full similarity matrix, then a Python max over each row"""
+    if metric == "cosine":
+        sims = cosine_similarity(queries, known)
+    else:
+        sims = 1 / (1 + euclidean_distances(queries, known))
+    return [float(np.max(row)) for row in sims]
+
+
+def best_time(fn: Callable[[], object], repeats: int) -> float:
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--known", type=int, default=20_000)
+    parser.add_argument("--queries", type=int, default=1_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--max-block-mb", type=float, default=64)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    known = rng.normal(size=(args.known, args.dim)).astype(np.float32)
+    known /= np.linalg.norm(known, axis=1, keepdims=True)  # MiniLM outputs are unit-norm
+    queries = rng.normal(size=(args.queries, args.dim)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    print(f"known={args.known} queries={args.queries} dim={args.dim}")
+    print(f"{'metric':<10}{'sklearn (s)':>14}{'kernel (s)':>14}{'speedup':>10}{'max |diff|':>14}")
+    for metric in ("cosine", "euclidean"):
+        kernel = Top1SimilarityKernel(
+            known, metric, max_block_bytes=int(args.max_block_mb * 2**20)
+        )
+        baseline_scores = np.array(sklearn_top1(queries, known, metric))
+        kernel_scores, _ = kernel.search(queries)
+
+        sklearn_time = best_time(lambda: sklearn_top1(queries, known, metric), args.repeats)
+        kernel_time = best_time(lambda: kernel.search(queries), args.repeats)
+        max_diff = float(np.max(np.abs(baseline_scores - kernel_scores)))
+        print(
+            f"{metric:<10}{sklearn_time:>14.4f}{kernel_time:>14.4f}"
+            f"{sklearn_time / kernel_time:>9.1f}x{max_diff:>14.2e}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+import secrets
+from typing import Any, Callable, Collection, Dict, List, Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import FileResponse
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.service.memory_report import memory_report, start_tracemalloc, stop_tracemalloc
+from src.service.profiling import RequestProfiler
+from src.service.repair_service import RepairService
+
+PROFILE_HEADER = "x-profile"
+ADMIN_TOKEN_HEADER = "x-admin-token"
+
+
+def is_admin(admin_token: Optional[str], given_token: Optional[str]) -> bool:
+    """Fails closed: without a configured token, nobody is an admin"""
+    return (
+        admin_token is not None
+        and given_token is not None
+        and secrets.compare_digest(admin_token, given_token)
+    )
+
+
+def create_admin_router(
+    get_service: Callable[[], Optional[RepairService]],
+    profiler: RequestProfiler,
+    admin_token: Optional[str] = None,
+) -> APIRouter:
+    def require_admin(x_admin_token: Optional[str] = Header(default=None)) -> None:
+        if not is_admin(admin_token, x_admin_token):
+            raise HTTPException(status_code=403, detail="Invalid admin token")
+
+    router = APIRouter(prefix="/admin", dependencies=[Depends(require_admin)])
+
+    @router.get("/profiles")
+    async def list_profiles() -> List[Dict[str, Any]]:
+        """The kept profiles, oldest first"""
+        return list(profiler.profiles.values())
+
+    @router.get("/profiles/{profile_id}")
+    async def download_profile(profile_id: str) -> FileResponse:
+        """The pstats file of a profile, to open with pstats or snakeviz"""
+        profile_path = profiler.get_path(profile_id)
+        if profile_path is None or not profile_path.exists():
+            raise HTTPException(status_code=404, detail="Unknown profile")
+        return FileResponse(
+            profile_path, media_type="application/octet-stream", filename=profile_path.name
+        )
+
+    @router.get("/memory")
+    async def memory(top: int = 10) -> Dict[str, Any]:
+        """RSS of this worker, the size of each component, and the top allocators of each component while
+        allocations are traced"""
+        return memory_report(get_service(), top)
+
+    @router.post("/memory/tracemalloc")
+    async def trace_allocations(enabled: bool, frames: int = 1) -> Dict[str, bool]:
+        """Starts or stops tracing allocations, which slows the worker down while enabled"""
+        changed = start_tracemalloc(frames) if enabled else stop_tracemalloc()
+        return {"tracing": enabled, "changed": changed}
+
+    return router
+
+
+class ProfilingMiddleware:
+    """Profiles the requests sent with an X-Profile: 1 header, or sampled, answering with the id of their profile
+    in an X-Profile-Id header"""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        profiler: RequestProfiler,
+        paths: Collection[str],
+        admin_token: Optional[str] = None,
+    ):
+        self.app = app
+        self.profiler = profiler
+        self.paths = set(paths)
+        self.admin_token = admin_token
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        requested = headers.get(PROFILE_HEADER) == "1" and is_admin(
+            self.admin_token, headers.get(ADMIN_TOKEN_HEADER)
+        )
+        if not self.profiler.should_profile(requested):
+            await self.app(scope, receive, send)
+            return
+
+        with self.profiler.profiling(scope["path"]) as request_profile:
+            if request_profile is None:
+                await self.app(scope, receive, send)
+                return
+
+            async def send_with_profile_id(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    headers = list(message.get("headers", []))
+                    headers.append((b"x-profile-id", request_profile.id.encode()))
+                    message = {**message, "headers": headers}
+                await send(message)
+
+            await self.app(scope, receive, send_with_profile_id)
@@ -0,0 +1,31 @@
+from typing import Any, Dict
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import JSONResponse
+
+from src.service.loader import ServiceLoader
+
+
+def create_health_router(loader: ServiceLoader) -> APIRouter:
+    router = APIRouter()
+
+    @router.get("/healthz")
+    async def liveness() -> Dict[str, Any]:
+        """The worker is alive as long as its event loop answers, unless its models failed to load for good"""
+        if loader.error is not None:
+            raise HTTPException(
+                status_code=500, detail=f"Loading the models failed: {loader.error}"
+            )
+        return {"status": "alive"}
+
+    @router.get("/readyz")
+    async def readiness() -> JSONResponse:
+        """Ready once the models are loaded and warmed up"""
+        if loader.ready:
+            return JSONResponse(
+                {"status": "ready", "phase_seconds": loader.phase_seconds}
+            )
+        status = "failed" if loader.error is not None else "loading"
+        return JSONResponse({"status": status}, status_code=503)
+
+    return router
@@ -0,0 +1,67 @@
+import time
+from typing import Collection, Dict
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.core.metrics import (
+    REGISTRY,
+    REQUEST_SECONDS,
+    REQUESTS_IN_FLIGHT,
+    request_timings,
+    server_timing,
+)
+
+PROMETHEUS_MEDIA_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def create_metrics_router() -> APIRouter:
+    router = APIRouter()
+
+    @router.get("/metrics", response_class=PlainTextResponse)
+    async def metrics() -> PlainTextResponse:
+        """Metrics of this worker, in the Prometheus text format"""
+        return PlainTextResponse(REGISTRY.render(), media_type=PROMETHEUS_MEDIA_TYPE)
+
+    return router
+
+
+class MetricsMiddleware:
+    """Tracks the requests in flight and their latency, and collects the seconds each one spends per stage into a
+    Server-Timing header.
+
+    A plain ASGI middleware rather than a BaseHTTPMiddleware, which would buffer the streamed responses. The
+    stages done by the time the response starts are the ones in the header, so a streamed response only gets the
+    ones before its first chunk.
+    """
+
+    def __init__(self, app: ASGIApp, paths: Collection[str]):
+        self.app = app
+        # Only these paths are tracked, so unknown ones can't grow the number of label values
+        self.paths = set(paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"]
+        timings: Dict[str, float] = {}
+
+        async def send_with_server_timing(message: Message) -> None:
+            if message["type"] == "http.response.start" and timings:
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", server_timing(timings).encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        token = request_timings.set(timings)
+        REQUESTS_IN_FLIGHT.inc(path=path)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_server_timing)
+        finally:
+            REQUEST_SECONDS.observe(time.perf_counter() - start, path=path)
+            REQUESTS_IN_FLIGHT.dec(path=path)
+            request_timings.reset(token)
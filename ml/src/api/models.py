@@ -1,19 +1,32 @@
-from typing import List
+from typing import List, Optional
 
-from pydantic import BaseModel, RootModel
+from pydantic import BaseModel, Field, RootModel
+
+# Number of alternative candidates which can be requested per text
+MAX_TOP_K = 20
 
 
 class RepairRequest(BaseModel):
     text: str
+    top_k: Optional[int] = Field(default=None, ge=1, le=MAX_TOP_K)
 
 
 class RepairBatchRequest(BaseModel):
     texts: List[str]
+    top_k: Optional[int] = Field(default=None, ge=1, le=MAX_TOP_K)
+
+
+class RepairCandidate(BaseModel):
+    section: str
+    name: str
+    probability: float
 
 
 class RepairResponse(BaseModel):
     section: str
     name: str
+    # Only set when top_k candidates were requested
+    candidates: Optional[List[RepairCandidate]] = None
 
 
 class RepairBatchResponse(RootModel):
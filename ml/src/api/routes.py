@@ -1,7 +1,7 @@
-from http.client import HTTPException
-from typing import Any
+import time
+from typing import Any, Callable, Optional
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, Header, HTTPException, Request
 
 from src.api.models import (
     RepairResponse,
@@ -9,24 +9,98 @@ from src.api.models import (
     RepairBatchResponse,
     RepairBatchRequest,
 )
+from src.api.streaming import (
+    NDJSON_MEDIA_TYPE,
+    DuplexStreamingResponse,
+    encode_stream_results,
+    parse_stream_texts,
+)
 from src.service.repair_service import RepairService
+from src.service.scheduler import DeadlineExceededError, QueueFullError
+
+
+# Seconds clients are asked to wait before retrying while the models are loading
+LOADING_RETRY_AFTER = 5
+# Seconds clients are asked to wait before retrying when the inference queue is full
+QUEUE_FULL_RETRY_AFTER = 1
+
+
+def request_deadline(
+    x_deadline_ms: Optional[float] = Header(default=None, gt=0),
+) -> Optional[float]:
+    """time.monotonic() deadline out of the X-Deadline-Ms header, the milliseconds the client waits for a result"""
+    if x_deadline_ms is None:
+        return None
+    return time.monotonic() + x_deadline_ms / 1000
 
 
-def create_router(service: RepairService) -> APIRouter:
+def overload_error(error: Exception) -> Optional[HTTPException]:
+    """The response to give to a request refused by admission control, None for any other error"""
+    if isinstance(error, QueueFullError):
+        return HTTPException(
+            status_code=429,
+            detail=str(error),
+            headers={"Retry-After": str(QUEUE_FULL_RETRY_AFTER)},
+        )
+    if isinstance(error, DeadlineExceededError):
+        return HTTPException(status_code=504, detail=str(error))
+    return None
+
+
+def create_router(get_service: Callable[[], Optional[RepairService]]) -> APIRouter:
+    """Creates the classification routes, which answer 503 as long as get_service has no service to give"""
     router = APIRouter()
 
-    @router.post("/repairs", response_model=RepairResponse)
-    async def classify_repair(request: RepairRequest) -> Any:
+    def ready_service() -> RepairService:
+        service = get_service()
+        if service is None:
+            raise HTTPException(
+                status_code=503,
+                detail="The models are still loading",
+                headers={"Retry-After": str(LOADING_RETRY_AFTER)},
+            )
+        return service
+
+    @router.post(
+        "/repairs", response_model=RepairResponse, response_model_exclude_none=True
+    )
+    async def classify_repair(
+        request: RepairRequest,
+        service: RepairService = Depends(ready_service),
+        deadline: Optional[float] = Depends(request_deadline),
+    ) -> Any:
         try:
-            return await service.classify_repair(request.text)
+            return await service.classify_repair(request.text, request.top_k, deadline)
         except Exception as e:
-            raise HTTPException(status_code=500, detail=str(e))
+            raise overload_error(e) or HTTPException(status_code=500, detail=str(e))
 
-    @router.post("/repairs_batch", response_model=RepairBatchResponse)
-    async def classify_batch_repair(request: RepairBatchRequest,) -> Any:
+    @router.post(
+        "/repairs_batch",
+        response_model=RepairBatchResponse,
+        response_model_exclude_none=True,
+    )
+    async def classify_batch_repair(
+        request: RepairBatchRequest,
+        service: RepairService = Depends(ready_service),
+        deadline: Optional[float] = Depends(request_deadline),
+    ) -> Any:
         try:
-            return await service.classify_batch_repair(request.texts)
+            return await service.classify_batch_repair(
+                request.texts, request.top_k, deadline
+            )
         except Exception as e:
-            raise HTTPException(status_code=500, detail=str(e))
+            raise overload_error(e) or HTTPException(status_code=500, detail=str(e))
+
+    @router.post("/repairs_stream")
+    async def classify_stream_repair(
+        request: Request, service: RepairService = Depends(ready_service)
+    ) -> DuplexStreamingResponse:
+        """Classifies a streamed body of NDJSON or plain text lines, streaming back NDJSON results"""
+        ndjson = request.headers.get("content-type", "").startswith(NDJSON_MEDIA_TYPE)
+        texts = parse_stream_texts(request.stream(), ndjson, service.stream_max_line_bytes)
+        return DuplexStreamingResponse(
+            encode_stream_results(service.classify_stream(texts)),
+            media_type=NDJSON_MEDIA_TYPE,
+        )
 
     return router
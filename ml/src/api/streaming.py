@@ -0,0 +1,99 @@
+import json
+import logging
+from typing import AsyncIterator, Optional, Tuple
+
+from starlette.requests import ClientDisconnect
+from starlette.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+from src.api.models import RepairBatchResponse
+
+logger = logging.getLogger(__name__)
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+class DuplexStreamingResponse(StreamingResponse):
+    """Streaming response whose content is produced while the request body is still being read.
+
+    Below ASGI spec 2.4, StreamingResponse listens for the client disconnecting by calling receive() next to the
+    content generator, which then steals the body messages the generator is waiting for. Here only the body reader
+    calls receive(), and a disconnect surfaces there (or on send) as a ClientDisconnect.
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await self.stream_response(send)
+        except OSError:
+            raise ClientDisconnect()
+
+        if self.background is not None:
+            await self.background()
+
+
+async def iter_lines(
+    chunks: AsyncIterator[bytes], max_line_bytes: Optional[int] = None
+) -> AsyncIterator[str]:
+    """Splits a stream of body chunks into lines, without waiting for the whole body.
+    A line longer than max_line_bytes raises a ValueError as soon as it gets that long, so it is never buffered"""
+    def check_length(line: bytes) -> None:
+        if max_line_bytes is not None and len(line) > max_line_bytes:
+            raise ValueError(f"A line is longer than the limit of {max_line_bytes} bytes")
+
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            check_length(line)
+            yield line.decode("utf-8")
+        check_length(buffer)
+    if buffer:
+        yield buffer.decode("utf-8")
+
+
+async def parse_stream_texts(
+    chunks: AsyncIterator[bytes], ndjson: bool, max_line_bytes: Optional[int] = None
+) -> AsyncIterator[str]:
+    """Reads repair texts out of a streamed body, blank lines being skipped.
+
+    NDJSON lines hold either a JSON string or an object with a "text" field, other bodies hold one plain text
+    per line. A line longer than max_line_bytes ends the stream with a ValueError.
+    """
+    async for line in iter_lines(chunks, max_line_bytes):
+        line = line.strip()
+        if not line:
+            continue
+        if not ndjson:
+            yield line
+            continue
+
+        record = json.loads(line)
+        if isinstance(record, dict):
+            record = record.get("text")
+        if not isinstance(record, str):
+            raise ValueError(
+                f"Expected a JSON string or an object with a text field, got: {line[:100]}"
+            )
+        yield record
+
+
+async def encode_stream_results(
+    results: AsyncIterator[Tuple[int, RepairBatchResponse]],
+) -> AsyncIterator[bytes]:
+    """Serializes each chunk of results as NDJSON lines.
+
+    The response status is already sent by then, so a failure ends the stream with an error line instead.
+    """
+    try:
+        async for start, responses in results:
+            yield "".join(
+                json.dumps(
+                    {"index": start + i, "section": resp.section, "name": resp.name}
+                )
+                + "\n"
+                for i, resp in enumerate(responses)
+            ).encode("utf-8")
+    except Exception as e:
+        logger.error("Unable to finish streaming the repair classifications", exc_info=e)
+        yield (json.dumps({"error": str(e)}) + "\n").encode("utf-8")
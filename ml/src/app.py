@@ -1,33 +1,195 @@
-from fastapi import FastAPI
+import hashlib
+import json
+import os
+from contextlib import asynccontextmanager
+from typing import Dict, Optional, Tuple
 
 from fastapi import FastAPI
 
-from core.config import AppConfig
+from src.api.admin import ProfilingMiddleware, create_admin_router
+from src.api.health import create_health_router
+from src.api.metrics import MetricsMiddleware, create_metrics_router
 from src.api.routes import create_router
 from src.cache.cache import get_cache_register
+from src.core.config import AppConfig, EmbeddingCacheConfig
+from src.core.metrics import register_stats
+from src.core.timing import timed
+from src.core.interfaces import (
+    AnomalyDetector,
+    EmbeddingProvider,
+    RepairClassifier,
+)
+from src.embeddings.embedding_cache import CachedEmbeddingProvider, DiskEmbeddingStore
+from src.embeddings.sentence_embedder import SentenceEmbeddingProvider
 from src.models.classifier import EmbeddingsRepairClassifier
+from src.models.label_table import LabelTable
 from src.models.local_model_repository import LocalModelRepository
+from src.models.torch_head import configure_torch_threads
+from src.service.loader import ServiceLoader
+from src.service.memory_report import start_tracemalloc
+from src.service.profiling import RequestProfiler
 from src.service.repair_service import RepairService
 from src.similarity.searcher import SimilarityAnomalyDetector
 
 
-def create_app(config: AppConfig) -> FastAPI:
-    # Loading the cache register
-    cache_register = get_cache_register(config.cache)
-    # Loading the detector
-    detector = SimilarityAnomalyDetector(config.similarity)
-    # Loading the model
-    model_repository = LocalModelRepository()
-    classifier = EmbeddingsRepairClassifier(
-        model_repository, config.model.weights_path, config.model.softmax_threshold
-    )
-    # Creating the service instance for the API
-    service_instance = RepairService(cache_register, detector, classifier)
+def create_app(
+    config: AppConfig,
+    models: Optional[Tuple[AnomalyDetector, RepairClassifier, EmbeddingProvider]] = None,
+) -> FastAPI:
+    """Creates the app, around already loaded models when given (e.g. stand-ins in the benchmarks).
+    The service is built and warmed up in the background once the app starts, /readyz telling when it's done"""
+
+    def build_service(phase_seconds: Dict[str, float]) -> RepairService:
+        # Loading the cache register
+        with timed(phase_seconds, "cache"):
+            cache_register = get_cache_register(
+                config.cache,
+                result_cache_version(config) if config.cache.enabled else None,
+            )
+        # Loading the models
+        detector, classifier, embedder = models or load_models(
+            config, timings=phase_seconds
+        )
+        # Exposing the hit counters the caches keep, on /metrics
+        register_stats("result", cache_register)
+        register_stats("embedding", embedder)
+        # Creating the service instance for the API
+        return RepairService(
+            cache_register,
+            detector,
+            classifier,
+            embedder,
+            config.batching,
+            config.streaming,
+            config.preprocessing,
+            # Maps the label ids held by the cache back to labels
+            LabelTable.from_labels(classifier.get_labels()) if cache_register else None,
+        )
+
+    loader = ServiceLoader(build_service, config.warmup.batch_sizes)
+
+    @asynccontextmanager
+    async def lifespan(_: FastAPI):
+        loader.start()
+        yield
+        await loader.close()
 
     app = FastAPI(
         title="Car Repair Classifier",
         description="Simple FastAPI app for serving a car repair section classification",
         version="0.1.0",
+        lifespan=lifespan,
     )
-    app.include_router(create_router(service_instance))
+    app.include_router(create_health_router(loader))
+    app.include_router(create_metrics_router())
+    classification_router = create_router(loader.get_service)
+    app.include_router(classification_router)
+    classification_paths = [route.path for route in classification_router.routes]
+
+    # Opt-in: the admin routes and request profiling only exist when enabled
+    profiling = config.profiling
+    if profiling.enabled:
+        profiler = RequestProfiler(
+            profiling.directory, profiling.max_profiles, profiling.sample_rate
+        )
+        app.include_router(
+            create_admin_router(loader.get_service, profiler, profiling.admin_token)
+        )
+        app.add_middleware(
+            ProfilingMiddleware,
+            profiler=profiler,
+            paths=classification_paths,
+            admin_token=profiling.admin_token,
+        )
+        if profiling.tracemalloc_frames > 0:
+            start_tracemalloc(profiling.tracemalloc_frames)
+
+    app.add_middleware(MetricsMiddleware, paths=classification_paths)
     return app
+
+
+def load_models(
+    config: AppConfig,
+    processes: Optional[int] = None,
+    timings: Optional[Dict[str, float]] = None,
+) -> Tuple[AnomalyDetector, RepairClassifier, EmbeddingProvider]:
+    """Loads the models of one worker process: the anomaly detector, the classifier, and the embedder the
+    incoming texts are encoded with. The cores are split evenly between the processes, by default the server
+    workers. When a timings dict is given, the seconds spent loading each model are added to it"""
+    # Sizing the thread pools of this worker, before any model runs
+    processes = processes or config.server.workers
+    intra_op_threads = config.model.intra_op_threads
+    if intra_op_threads is None and processes > 1:
+        intra_op_threads = max(1, (os.cpu_count() or 1) // processes)
+    configure_torch_threads(intra_op_threads, config.model.inter_op_threads)
+    # Loading the embedding model, shared by the detector and the classifier
+    with timed(timings, "encoder"):
+        embedder = SentenceEmbeddingProvider(
+            config.similarity.model_name,
+            config.similarity.backend,
+            config.similarity.onnx_dir,
+            config.similarity.onnx_quantization,
+            config.similarity.max_batch_tokens,
+        )
+    # Loading the detector, which indexes the known corpus
+    with timed(timings, "known_corpus"):
+        detector = SimilarityAnomalyDetector(config.similarity, embedder)
+    # Loading the model
+    with timed(timings, "classifier"):
+        model_repository = LocalModelRepository()
+        classifier = EmbeddingsRepairClassifier(
+            model_repository,
+            config.model.weights_path,
+            config.model.softmax_threshold,
+            embedder=embedder,
+            backend=config.model.backend,
+            compile_mode=config.model.compile_mode,
+            intra_op_threads=intra_op_threads,
+        )
+    return detector, classifier, create_cached_embedder(embedder, config.embedding_cache)
+
+
+def create_cached_embedder(
+    embedder: SentenceEmbeddingProvider, config: EmbeddingCacheConfig
+) -> EmbeddingProvider:
+    """Puts the embedding cache in front of the encoder used for incoming requests, if enabled"""
+    if not config.enabled:
+        return embedder
+
+    disk_store = None
+    if config.disk_path is not None:
+        # Embeddings of different models, or of differently quantized ones, must never be mixed
+        model_directory = embedder.model_name.replace("/", "__")
+        if embedder.backend != "torch":
+            model_directory += f"__{embedder.backend}"
+        disk_store = DiskEmbeddingStore(
+            config.disk_path / model_directory, embedder.get_dimension()
+        )
+    return CachedEmbeddingProvider(embedder, config.max_size, disk_store)
+
+
+def result_cache_version(config: AppConfig) -> str:
+    """Version of the cached results, unless pinned in the config: a digest of everything they depend on, i.e. the
+    classifier weights, the known corpus of the anomaly detector, and the settings of the models and preprocessing.
+    Workers and hosts deploying the same files and settings share it"""
+    if config.cache.version is not None:
+        return config.cache.version
+
+    digest = hashlib.blake2b(digest_size=8)
+    for path in (config.model.weights_path, config.similarity.data_path):
+        if path.is_file():
+            with open(path, "rb") as model_file:
+                digest.update(hashlib.file_digest(model_file, "blake2b").digest())
+        else:
+            digest.update(str(path).encode())
+    settings = {
+        "model": config.model.model_dump(
+            include={"softmax_threshold", "backend"}
+        ),
+        "similarity": config.similarity.model_dump(
+            include={"model_name", "distance_threshold", "metric", "index", "backend", "onnx_quantization"}
+        ),
+        "preprocessing": config.preprocessing.model_dump(),
+    }
+    digest.update(json.dumps(settings, sort_keys=True).encode())
+    return digest.hexdigest()
@@ -0,0 +1,253 @@
+"""Classifies a whole CSV or Parquet file offline, without going through the HTTP API.
+
+Run from the ml folder with: python -m src.bulk_classify --input orders.csv --output orders_classified
+Rows are read in fixed-size chunks and classified by a pool of worker processes, each chunk being written as one
+Parquet part of the output directory. Finished chunks are checkpointed, so running the same command again after
+an interruption resumes where it stopped.
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, FIRST_COMPLETED, wait
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+from src.app import load_models
+from src.core.config import AppConfig, PreprocessingConfig, load_config
+from src.core.timing import timed
+from src.service.pipeline import InferencePipeline
+from src.service.preprocessing import canonicalize_text
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_FILE = "_checkpoint.json"
+
+# Pipeline of the current worker process, loaded by init_worker or inherited from the parent when forked
+_worker_pipeline: Optional[InferencePipeline] = None
+_worker_preprocessing = PreprocessingConfig()
+
+
+def init_worker(config: AppConfig, processes: int) -> None:
+    """Loads the models of a worker process, the cores being split between the processes"""
+    global _worker_pipeline, _worker_preprocessing
+    _worker_pipeline = InferencePipeline(*load_models(config, processes))
+    _worker_preprocessing = config.preprocessing
+
+
+def classify_chunk(texts: List[str]) -> Tuple[List[str], List[str], Dict[str, float]]:
+    """Runs the sanitize -> anomaly -> classify pipeline of RepairService over one chunk of texts.
+    Returns the sections, the names and the seconds spent in each stage"""
+    timings: Dict[str, float] = {}
+    with timed(timings, "sanitize"):
+        sanitized_texts = [canonicalize_text(text, _worker_preprocessing) for text in texts]
+    labels = _worker_pipeline.run(sanitized_texts, timings)
+    return [section for section, _ in labels], [name for _, name in labels], timings
+
+
+def iter_chunks(path: Path, text_column: str, chunk_size: int) -> Iterator[List[str]]:
+    """Streams the text column of a CSV or Parquet file in chunks of chunk_size rows, the last one excepted"""
+    if path.suffix.lower() in (".parquet", ".pq"):
+        batches = pq.ParquetFile(path).iter_batches(
+            batch_size=chunk_size, columns=[text_column]
+        )
+    else:
+        batches = pa_csv.open_csv(
+            path,
+            convert_options=pa_csv.ConvertOptions(
+                include_columns=[text_column], column_types={text_column: pa.string()}
+            ),
+        )
+
+    # Batches don't line up with the chunks (row groups, CSV blocks), they are re-cut to keep chunk ids stable
+    chunk: List[str] = []
+    for batch in batches:
+        for text in batch.column(0).to_pylist():
+            chunk.append(text or "")
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+class Checkpoint:
+    """Chunks already written to the output directory, persisted next to them.
+
+    The input file, its text column and the chunk size are recorded too, since resuming is only valid when the
+    chunks are cut the same way.
+    """
+
+    def __init__(self, output_dir: Path, input_signature: Dict[str, Any]):
+        self.path = output_dir / CHECKPOINT_FILE
+        self.input_signature = input_signature
+        self.done: Dict[int, int] = {}
+
+        if self.path.exists():
+            state = json.loads(self.path.read_text())
+            if state["input"] != input_signature:
+                raise ValueError(
+                    f"{output_dir} holds the output of another input or chunk size, use another output directory"
+                )
+            self.done = {int(chunk_id): rows for chunk_id, rows in state["done"].items()}
+
+    @property
+    def done_chunks(self) -> Set[int]:
+        return set(self.done)
+
+    def mark_done(self, chunk_id: int, rows: int) -> None:
+        self.done[chunk_id] = rows
+        self.__write({"input": self.input_signature, "done": self.done})
+
+    def __write(self, state: Dict[str, Any]) -> None:
+        """Replaces the checkpoint atomically, an interruption never leaves it half written"""
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(state))
+        os.replace(tmp_path, self.path)
+
+
+def input_signature(path: Path, text_column: str, chunk_size: int) -> Dict[str, Any]:
+    stat = path.stat()
+    return {
+        "path": str(path.resolve()),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "text_column": text_column,
+        "chunk_size": chunk_size,
+    }
+
+
+def write_part(
+    output_dir: Path, chunk_id: int, start: int, texts: List[str], sections: List[str], names: List[str]
+) -> None:
+    """Writes the results of one chunk as a Parquet part, renamed into place once complete"""
+    table = pa.table(
+        {
+            "row": pa.array(range(start, start + len(texts)), type=pa.int64()),
+            "text": texts,
+            "section": sections,
+            "name": names,
+        }
+    )
+    part_path = output_dir / f"part-{chunk_id:06d}.parquet"
+    tmp_path = part_path.with_suffix(".tmp")
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, part_path)
+
+
+def classify_file(
+    input_path: Path,
+    output_dir: Path,
+    executor: Executor,
+    text_column: str = "title",
+    chunk_size: int = 10_000,
+    max_pending: int = 2,
+) -> Dict[str, Any]:
+    """Classifies the input file chunk by chunk on the executor, skipping the chunks of the checkpoint.
+    At most max_pending chunks are in flight, so memory stays bounded whatever the input size.
+    Returns a report with the throughput and the seconds spent in each stage"""
+    output_dir.mkdir(parents=True, exist_ok=True)
+    checkpoint = Checkpoint(output_dir, input_signature(input_path, text_column, chunk_size))
+    done_chunks = checkpoint.done_chunks
+    if done_chunks:
+        logger.info(f"Resuming, {len(done_chunks)} chunks were already classified")
+
+    stage_seconds: Dict[str, float] = {}
+    rows = 0
+    pending: Dict[Future, Tuple[int, int, List[str]]] = {}
+
+    def collect(futures: Set[Future]) -> None:
+        nonlocal rows
+        for future in futures:
+            chunk_id, start, texts = pending.pop(future)
+            sections, names, timings = future.result()
+            with timed(stage_seconds, "write"):
+                write_part(output_dir, chunk_id, start, texts, sections, names)
+            checkpoint.mark_done(chunk_id, len(texts))
+            for stage, seconds in timings.items():
+                stage_seconds[stage] = stage_seconds.get(stage, 0.0) + seconds
+            rows += len(texts)
+            logger.info(f"Chunk {chunk_id} done, {rows} rows classified in this run")
+
+    started_at = time.perf_counter()
+    start = 0
+    for chunk_id, texts in enumerate(iter_chunks(input_path, text_column, chunk_size)):
+        if chunk_id not in done_chunks:
+            if len(pending) >= max_pending:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(finished)
+            pending[executor.submit(classify_chunk, texts)] = (chunk_id, start, texts)
+        start += len(texts)
+    collect(set(pending))
+    elapsed = time.perf_counter() - started_at
+
+    return {
+        "input": str(input_path),
+        "output": str(output_dir),
+        "rows": rows,
+        "skipped_chunks": len(done_chunks),
+        "seconds": round(elapsed, 3),
+        "rows_per_second": round(rows / elapsed, 1) if elapsed > 0 else 0.0,
+        # Summed over the workers, so they can add up to more than the wall-clock time
+        "stage_seconds": {stage: round(seconds, 3) for stage, seconds in stage_seconds.items()},
+    }
+
+
+def create_executor(config: AppConfig, workers: int, share_models: bool) -> ProcessPoolExecutor:
+    """Creates the worker pool. With share_models, the models are loaded once in this process and the forked
+    workers read the same pages copy-on-write, otherwise each spawned worker loads its own copy"""
+    if share_models:
+        init_worker(config, workers)
+        return ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("fork"))
+    return ProcessPoolExecutor(
+        workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_worker,
+        initargs=(config, workers),
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--config", type=Path, default=Path(__file__).parent.parent / "config.yaml"
+    )
+    parser.add_argument("--input", type=Path, required=True, help="CSV or Parquet file")
+    parser.add_argument("--output", type=Path, required=True, help="Output directory of Parquet parts")
+    parser.add_argument("--text-column", default="title")
+    parser.add_argument("--chunk-size", type=int, default=10_000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument(
+        "--share-models",
+        action="store_true",
+        help="Load the models once and fork the workers, instead of one copy per worker",
+    )
+    parser.add_argument("--report", type=Path, help="Where to write the JSON report")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    config = load_config(args.config)
+
+    with create_executor(config, args.workers, args.share_models) as executor:
+        report = classify_file(
+            args.input,
+            args.output,
+            executor,
+            args.text_column,
+            args.chunk_size,
+            max_pending=2 * args.workers,
+        )
+    print(json.dumps(report, indent=2))
+    if args.report is not None:
+        args.report.write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+from typing import Any, Optional, override
+
+from redis import asyncio as aioredis
+
+from src.cache.redis_base import BaseRedisCache
+
+
+class AsyncRedisCache(BaseRedisCache):
+    """Redis cache implementation built on the asyncio client, so cache round-trips never block the event loop."""
+
+    def __init__(
+        self,
+        host: str = "localhost",
+        port: int = 6379,
+        db: int = 0,
+        password: Optional[str] = None,
+        default_ttl_hours: int = 24,
+        namespace: Optional[str] = None,
+        socket_connect_timeout: int = 5,
+        socket_timeout: int = 5,
+        retry_on_timeout: bool = True,
+        max_connections: int = 50,
+    ):
+        super().__init__(default_ttl_hours, namespace)
+
+        # Async Redis connection pool, connections are only opened on first use
+        self.connection_pool = aioredis.ConnectionPool(
+            host=host,
+            port=port,
+            db=db,
+            password=password,
+            socket_connect_timeout=socket_connect_timeout,
+            socket_timeout=socket_timeout,
+            retry_on_timeout=retry_on_timeout,
+            max_connections=max_connections,
+            # Keys and values are binary
+            decode_responses=False,
+        )
+
+        self.redis_client = aioredis.Redis(connection_pool=self.connection_pool)
+
+    @override
+    async def _reply(self, reply: Any) -> Any:
+        return await reply
+
+    async def close(self) -> None:
+        """Close the client and disconnect the pooled connections."""
+        await self.redis_client.aclose()
+        await self.connection_pool.disconnect()
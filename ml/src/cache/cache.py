@@ -1,20 +1,26 @@
 import logging
+from typing import Optional
 
+from src.cache.async_redis_cache import AsyncRedisCache
 from src.cache.memory_cache import MemoryCache
 from src.cache.redis_cache import RedisCache
+from src.cache.tiered_cache import TieredCache
 from src.core.config import CacheConfig
 from src.core.interfaces import CacheRegister
 
 logger = logging.getLogger(__name__)
 
 
-def get_cache_register(cache_config: CacheConfig) -> CacheRegister:
+def get_cache_register(
+    cache_config: CacheConfig, namespace: Optional[str] = None
+) -> CacheRegister:
+    """Creates the configured cache, Redis keys being put under the namespace when given"""
     if not cache_config.enabled:
         return None
 
-    if cache_config.type == "redis":
+    if cache_config.type in ("redis", "redis_async"):
         try:
-            return RedisCache(cache_config.redis.host, cache_config.redis.port)
+            return _create_redis_cache(cache_config, cache_config.type, namespace)
         except Exception as e:
             logger.error(
                 "Failed to initialise Redis cache, will fallback to in-memory cache",
@@ -24,4 +30,32 @@ def get_cache_register(cache_config: CacheConfig) -> CacheRegister:
                 cache_config.memory.max_size, cache_config.memory.ttl_hours
             )
 
+    if cache_config.type == "tiered":
+        tiered_config = cache_config.tiered
+        l1 = MemoryCache(tiered_config.l1_max_size, tiered_config.l1_ttl_seconds / 3600)
+        try:
+            l2 = _create_redis_cache(cache_config, tiered_config.l2_type, namespace)
+        except Exception as e:
+            logger.error(
+                "Failed to initialise Redis L2 cache, will fallback to in-memory cache",
+                exc_info=e,
+            )
+            return MemoryCache(
+                cache_config.memory.max_size, cache_config.memory.ttl_hours
+            )
+        return TieredCache(l1, l2, tiered_config.l1_ttl_seconds)
+
     return MemoryCache(cache_config.memory.max_size, cache_config.memory.ttl_hours)
+
+
+def _create_redis_cache(
+    cache_config: CacheConfig, cache_type: str, namespace: Optional[str] = None
+) -> CacheRegister:
+    """Creates the sync or asyncio based Redis cache out of the shared Redis settings"""
+    redis_cache_cls = AsyncRedisCache if cache_type == "redis_async" else RedisCache
+    return redis_cache_cls(
+        cache_config.redis.host,
+        cache_config.redis.port,
+        default_ttl_hours=cache_config.redis.ttl_hours,
+        namespace=namespace,
+    )
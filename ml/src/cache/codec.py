@@ -0,0 +1,30 @@
+import hashlib
+import struct
+
+from src.core.interfaces import CachedLabel
+
+# Little-endian label id, followed by the float32 confidence when there is one
+LABEL_FORMAT = struct.Struct("<H")
+LABEL_WITH_CONFIDENCE_FORMAT = struct.Struct("<Hf")
+DIGEST_SIZE = 16
+
+
+def digest_key(key: str) -> bytes:
+    """Fixed-width binary digest of a cache key, whatever the length of the text"""
+    return hashlib.blake2b(key.encode(), digest_size=DIGEST_SIZE).digest()
+
+
+def encode_label(value: CachedLabel) -> bytes:
+    """Packs a cached label into 2 bytes, or 6 with its confidence"""
+    if value.confidence is None:
+        return LABEL_FORMAT.pack(value.label_id)
+    return LABEL_WITH_CONFIDENCE_FORMAT.pack(value.label_id, value.confidence)
+
+
+def decode_label(data: bytes) -> CachedLabel:
+    """Unpacks a cached label, raising a ValueError when the data isn't one"""
+    if len(data) == LABEL_FORMAT.size:
+        return CachedLabel(LABEL_FORMAT.unpack(data)[0])
+    if len(data) == LABEL_WITH_CONFIDENCE_FORMAT.size:
+        return CachedLabel(*LABEL_WITH_CONFIDENCE_FORMAT.unpack(data))
+    raise ValueError(f"A cached label can't be {len(data)} bytes long")
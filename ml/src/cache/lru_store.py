@@ -0,0 +1,111 @@
+import time
+from collections import OrderedDict
+from itertools import islice
+from typing import Callable, Generic, Hashable, Iterator, Optional, Tuple, TypeVar
+
+V = TypeVar("V")
+
+
+class _Entry:
+    """A single cached value, kept compact with __slots__"""
+
+    __slots__ = ("value", "expires_at")
+
+    def __init__(self, value, expires_at: float):
+        self.value = value
+        self.expires_at = expires_at
+
+
+class LRUTTLStore(Generic[V]):
+    """Synchronous in-process key-value store with O(1) LRU eviction and per-entry TTLs.
+
+    Entries expire lazily when they are looked up. On top of that, every sweep_interval operations the
+    sweep_batch least recently used entries are checked, so expired entries which are never read again
+    get dropped too, without ever scanning the whole store. Times come from a monotonic clock.
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        default_ttl_seconds: Optional[float] = None,
+        sweep_interval: int = 64,
+        sweep_batch: int = 16,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_size = max_size
+        self.default_ttl_seconds = default_ttl_seconds
+        self.sweep_interval = sweep_interval
+        self.sweep_batch = sweep_batch
+        self.clock = clock
+
+        # Ordered from least to most recently used
+        self._data: OrderedDict[Hashable, _Entry] = OrderedDict()
+        self._ops_since_sweep = 0
+
+    def get(self, key: Hashable) -> Optional[V]:
+        """Returns the value and marks it as most recently used, or None if missing or expired."""
+        self.__tick()
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= self.clock():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return entry.value
+
+    def set(self, key: Hashable, value: V, ttl_seconds: Optional[float] = None) -> None:
+        """Stores the value, evicting the least recently used entry if the store is full."""
+        self.__tick()
+        ttl_seconds = self.default_ttl_seconds if ttl_seconds is None else ttl_seconds
+        expires_at = self.clock() + ttl_seconds if ttl_seconds is not None else float("inf")
+
+        entry = self._data.get(key)
+        if entry is not None:
+            entry.value = value
+            entry.expires_at = expires_at
+            self._data.move_to_end(key)
+            return
+
+        if len(self._data) >= self.max_size:
+            self._data.popitem(last=False)
+        self._data[key] = _Entry(value, expires_at)
+
+    def delete(self, key: Hashable) -> bool:
+        """Removes the key, returning whether it was present."""
+        return self._data.pop(key, None) is not None
+
+    def contains(self, key: Hashable) -> bool:
+        """Checks if the key holds a live value, without affecting the LRU order."""
+        entry = self._data.get(key)
+        return entry is not None and entry.expires_at > self.clock()
+
+    def clear(self) -> None:
+        self._data.clear()
+        self._ops_since_sweep = 0
+
+    def items(self) -> Iterator[Tuple[Hashable, V]]:
+        """Iterates over the live entries, from least to most recently used."""
+        now = self.clock()
+        for key, entry in list(self._data.items()):
+            if entry.expires_at > now:
+                yield key, entry.value
+
+    def sweep(self, max_entries: Optional[int] = None) -> int:
+        """Drops expired entries among the max_entries least recently used ones, returning how many."""
+        now = self.clock()
+        candidates = islice(self._data.items(), max_entries)
+        expired = [key for key, entry in candidates if entry.expires_at <= now]
+        for key in expired:
+            del self._data[key]
+        return len(expired)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __tick(self) -> None:
+        """Counts an operation, running a bounded sweep every sweep_interval operations"""
+        self._ops_since_sweep += 1
+        if self._ops_since_sweep >= self.sweep_interval:
+            self._ops_since_sweep = 0
+            self.sweep(self.sweep_batch)
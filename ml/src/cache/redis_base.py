@@ -0,0 +1,201 @@
+import logging
+from abc import abstractmethod
+from typing import Any, Dict, List, Optional
+
+from redis.exceptions import RedisError
+
+from src.cache.codec import decode_label, digest_key, encode_label
+from src.core.interfaces import CachedLabel, CacheRegister
+
+logger = logging.getLogger(__name__)
+
+
+class BaseRedisCache(CacheRegister):
+    """Redis cache logic shared by the sync and the asyncio clients: keys, serialization and error handling.
+
+    Keys are the prefix and the namespace, followed by a 16 bytes digest of the text, and values the 2 or 6 bytes
+    of a packed CachedLabel, so the clients work with bytes (no decode_responses). The namespace holds the version
+    of the results, so a new model or config starts from an empty namespace, the old one expiring with its TTL.
+    Subclasses create `redis_client` and only tell how a reply of their client is obtained, i.e. whether the
+    command has to be awaited or not.
+    """
+
+    CACHE_PREFIX = "repairs_classification"
+    # Keys scanned, then unlinked, per round-trip of clear(), so Redis never blocks on a large keyspace
+    CLEAR_BATCH_SIZE = 1000
+
+    def __init__(self, default_ttl_hours: int = 24, namespace: Optional[str] = None):
+        self.default_ttl_hours = default_ttl_hours
+        self.default_ttl_seconds = default_ttl_hours * 3600
+        self.namespace = namespace
+        self.key_prefix = (
+            f"{self.CACHE_PREFIX}:{namespace}:" if namespace else f"{self.CACHE_PREFIX}:"
+        ).encode()
+        self.redis_client: Any = None
+
+    @abstractmethod
+    async def _reply(self, reply: Any) -> Any:
+        """Resolves what a client command (or a pipeline execution) returned into the actual Redis reply"""
+        pass
+
+    def _make_key(self, key: str) -> bytes:
+        """Create Redis key with prefix."""
+        # A binary digest of the key handles long sentences and special characters, in a fixed width
+        return self.key_prefix + digest_key(key)
+
+    async def get(self, key: str) -> Optional[CachedLabel]:
+        """Get classification result from Redis cache."""
+        try:
+            value = await self._reply(self.redis_client.get(self._make_key(key)))
+
+            if value is not None:
+                logger.debug(f"Redis cache hit for key: {key}")
+                return self._deserialize_value(value)
+            else:
+                logger.debug(f"Redis cache miss for key: {key}")
+                return None
+
+        except RedisError as e:
+            logger.error(f"Redis get error for key {key}", exc_info=e)
+            return None
+        except ValueError as e:
+            logger.error(f"Decode error for key {key}", exc_info=e)
+            return None
+
+    async def set(
+        self, key: str, value: CachedLabel, ttl_hours: Optional[int] = None
+    ) -> bool:
+        """Store classification result in Redis cache."""
+        try:
+            ttl_seconds = (ttl_hours or self.default_ttl_hours) * 3600
+            result = await self._reply(
+                self.redis_client.setex(
+                    self._make_key(key), ttl_seconds, self._serialize_value(value)
+                )
+            )
+
+            if result:
+                logger.debug(f"Stored in Redis cache: {key} -> {value}")
+                return True
+            else:
+                return False
+
+        except RedisError as e:
+            logger.error(f"Redis set error for key {key}", exc_info=e)
+            return False
+        except Exception as e:
+            logger.error(f"Error for key {key}", exc_info=e)
+            return False
+
+    async def get_many(self, keys: List[str]) -> List[Optional[CachedLabel]]:
+        """Get classification results for several keys with a single MGET."""
+        if not keys:
+            return []
+        try:
+            redis_keys = [self._make_key(key) for key in keys]
+            values = await self._reply(self.redis_client.mget(redis_keys))
+        except RedisError as e:
+            logger.error(f"Redis mget error for {len(keys)} keys", exc_info=e)
+            return [None] * len(keys)
+
+        results: List[Optional[CachedLabel]] = []
+        for key, value in zip(keys, values):
+            try:
+                results.append(
+                    self._deserialize_value(value) if value is not None else None
+                )
+            except ValueError as e:
+                logger.error(f"Decode error for key {key}", exc_info=e)
+                results.append(None)
+
+        logger.debug(
+            f"Redis cache bulk lookup: {sum(r is not None for r in results)}/{len(keys)} hits"
+        )
+        return results
+
+    async def set_many(
+        self, items: Dict[str, CachedLabel], ttl_hours: Optional[int] = None
+    ) -> bool:
+        """Store several classification results with one pipelined round-trip of SETEX commands."""
+        if not items:
+            return True
+        try:
+            ttl_seconds = (ttl_hours or self.default_ttl_hours) * 3600
+            # Queuing commands on a pipeline is synchronous for both clients, only its execution differs
+            pipeline = self.redis_client.pipeline(transaction=False)
+            for key, value in items.items():
+                pipeline.setex(
+                    self._make_key(key), ttl_seconds, self._serialize_value(value)
+                )
+            results = await self._reply(pipeline.execute())
+
+            logger.debug(f"Stored {len(items)} entries in Redis cache")
+            return all(results)
+
+        except RedisError as e:
+            logger.error(
+                f"Redis pipelined set error for {len(items)} keys", exc_info=e
+            )
+            return False
+        except Exception as e:
+            logger.error(f"Error for {len(items)} keys", exc_info=e)
+            return False
+
+    async def delete(self, key: str) -> bool:
+        """Delete classification result from Redis cache."""
+        try:
+            result = await self._reply(self.redis_client.delete(self._make_key(key)))
+
+            if result > 0:
+                logger.debug(f"Deleted from Redis cache: {key}")
+                return True
+            else:
+                return False
+
+        except RedisError as e:
+            logger.error(f"Redis delete error for key {key}", exc_info=e)
+            return False
+
+    async def clear(self) -> bool:
+        """Clear all cached classification results of the namespace, incrementally: each SCAN page is unlinked
+        (freed in the background by Redis) before the next one is fetched."""
+        try:
+            cleared = 0
+            cursor = 0
+            while True:
+                cursor, keys = await self._reply(
+                    self.redis_client.scan(
+                        cursor, match=self.key_prefix + b"*", count=self.CLEAR_BATCH_SIZE
+                    )
+                )
+                if keys:
+                    cleared += await self._reply(self.redis_client.unlink(*keys))
+                if not cursor:
+                    break
+
+            logger.info(f"Cleared {cleared} entries from Redis cache")
+            return True
+
+        except RedisError as e:
+            logger.error(f"Redis clear error", exc_info=e)
+            return False
+
+    async def exists(self, key: str) -> bool:
+        """Check if key exists in Redis cache."""
+        try:
+            result = await self._reply(self.redis_client.exists(self._make_key(key)))
+            return bool(result)
+
+        except RedisError as e:
+            logger.error(f"Redis exists error for key {key}", exc_info=e)
+            return False
+
+    @staticmethod
+    def _serialize_value(value: CachedLabel) -> bytes:
+        """Serialize classification result to its packed bytes."""
+        return encode_label(value)
+
+    @staticmethod
+    def _deserialize_value(value: bytes) -> CachedLabel:
+        """Deserialize packed bytes to classification result."""
+        return decode_label(value)
@@ -0,0 +1,114 @@
+import logging
+from typing import Dict, List, Optional
+
+from src.cache.memory_cache import MemoryCache
+from src.core.interfaces import CachedLabel, CacheRegister
+
+logger = logging.getLogger(__name__)
+
+
+class TieredCache(CacheRegister):
+    """Two-tier cache: a small in-process L1 in front of a shared L2 (usually Redis).
+
+    Writes go through to both tiers and L2 hits are promoted into L1. L1 entries use their own, shorter TTL,
+    so the L1 copies of a fleet of workers converge back to L2 quickly.
+    """
+
+    def __init__(self, l1: MemoryCache, l2: CacheRegister, l1_ttl_seconds: float):
+        self.l1 = l1
+        self.l2 = l2
+        self.l1_ttl_hours = l1_ttl_seconds / 3600
+
+        self.l1_hits = 0
+        self.l1_misses = 0
+        self.l2_hits = 0
+        self.l2_misses = 0
+
+    async def get(self, key: str) -> Optional[CachedLabel]:
+        """Get classification result from L1, falling back to L2."""
+        value = await self.l1.get(key)
+        if value is not None:
+            self.l1_hits += 1
+            return value
+        self.l1_misses += 1
+
+        value = await self.l2.get(key)
+        if value is None:
+            self.l2_misses += 1
+            return None
+
+        self.l2_hits += 1
+        await self.l1.set(key, value, self.l1_ttl_hours)
+        return value
+
+    async def set(
+        self, key: str, value: CachedLabel, ttl_hours: Optional[float] = None
+    ) -> bool:
+        """Store classification result in both tiers."""
+        stored = await self.l2.set(key, value, ttl_hours)
+        await self.l1.set(key, value, self.__l1_ttl(ttl_hours))
+        return stored
+
+    async def get_many(self, keys: List[str]) -> List[Optional[CachedLabel]]:
+        """Get classification results from L1, looking up only the L1 misses in L2."""
+        results = await self.l1.get_many(keys)
+        missing = [i for i, value in enumerate(results) if value is None]
+        self.l1_hits += len(keys) - len(missing)
+        self.l1_misses += len(missing)
+        if not missing:
+            return results
+
+        l2_values = await self.l2.get_many([keys[i] for i in missing])
+        promoted: Dict[str, CachedLabel] = {}
+        for i, value in zip(missing, l2_values):
+            if value is not None:
+                results[i] = value
+                promoted[keys[i]] = value
+        self.l2_hits += len(promoted)
+        self.l2_misses += len(missing) - len(promoted)
+
+        if promoted:
+            await self.l1.set_many(promoted, self.l1_ttl_hours)
+        return results
+
+    async def set_many(
+        self, items: Dict[str, CachedLabel], ttl_hours: Optional[float] = None
+    ) -> bool:
+        """Store several classification results in both tiers."""
+        stored = await self.l2.set_many(items, ttl_hours)
+        await self.l1.set_many(items, self.__l1_ttl(ttl_hours))
+        return stored
+
+    async def delete(self, key: str) -> bool:
+        """Delete classification result from both tiers."""
+        l1_deleted = await self.l1.delete(key)
+        l2_deleted = await self.l2.delete(key)
+        return l1_deleted or l2_deleted
+
+    async def clear(self) -> bool:
+        """Clear all cached classification results from both tiers."""
+        await self.l1.clear()
+        return await self.l2.clear()
+
+    async def exists(self, key: str) -> bool:
+        """Check if key exists in either tier."""
+        return await self.l1.exists(key) or await self.l2.exists(key)
+
+    async def close(self) -> None:
+        await self.l1.close()
+        await self.l2.close()
+
+    def get_stats(self) -> Dict[str, int]:
+        """Gets the hit and miss counters of each tier"""
+        return {
+            "l1_hits": self.l1_hits,
+            "l1_misses": self.l1_misses,
+            "l2_hits": self.l2_hits,
+            "l2_misses": self.l2_misses,
+        }
+
+    def __l1_ttl(self, ttl_hours: Optional[float]) -> float:
+        """L1 entries never outlive their L2 copy, nor the L1 TTL"""
+        if ttl_hours is None:
+            return self.l1_ttl_hours
+        return min(ttl_hours, self.l1_ttl_hours)
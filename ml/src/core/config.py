@@ -1,5 +1,5 @@
 from pathlib import Path
-from typing import Literal, Optional
+from typing import List, Literal, Optional
 
 import yaml
 from pydantic import BaseModel
@@ -8,6 +8,23 @@ from pydantic import BaseModel
 class ModelConfig(BaseModel):
     weights_path: Path
     softmax_threshold: float
+    # onnx runs the classification head through ONNX Runtime, exported next to the weights
+    backend: Literal["torch", "onnx"] = "torch"
+    # torch only: serve a TorchScript-traced or torch.compile'd head
+    compile_mode: Literal["none", "torchscript", "compile"] = "none"
+    # Per-worker thread pools, by default the cores are split evenly between the server workers
+    intra_op_threads: Optional[int] = None
+    inter_op_threads: Optional[int] = None
+
+
+class SimilarityIndexConfig(BaseModel):
+    type: Literal["flat", "ivf"] = "flat"
+    # Queries are searched in chunks of at most this size, whose similarity matrix fits in max_block_mb
+    chunk_size: int = 1024
+    max_block_mb: float = 64
+    # IVF only: number of clusters, and how many of the closest ones are searched per query
+    n_lists: int = 256
+    n_probe: int = 8
 
 
 class SimilarityConfig(BaseModel):
@@ -15,6 +32,16 @@ class SimilarityConfig(BaseModel):
     model_name: str
     distance_threshold: float
     metric: Literal["cosine", "euclidean"]
+    index: SimilarityIndexConfig = SimilarityIndexConfig()
+    # Where the known-corpus embeddings are persisted, they are re-encoded at each start when missing
+    artifact_dir: Optional[Path] = None
+    # Encoder inference backend, the ONNX ones are exported once into onnx_dir
+    backend: Literal["torch", "onnx", "onnx-int8"] = "torch"
+    onnx_dir: Optional[Path] = None
+    # onnx-int8 only: instruction set the dynamic quantization targets
+    onnx_quantization: Literal["arm64", "avx2", "avx512", "avx512_vnni"] = "avx2"
+    # Texts are encoded in length-bucketed sub-batches of at most this many padded tokens, None disables it
+    max_batch_tokens: Optional[int] = 8192
 
 
 class RedisCacheConfig(BaseModel):
@@ -25,26 +52,94 @@ class RedisCacheConfig(BaseModel):
 
 class MemoryCacheConfig(BaseModel):
     max_size: int
-    ttl_hours: int
+    ttl_hours: float
+
+
+class TieredCacheConfig(BaseModel):
+    l1_max_size: int
+    l1_ttl_seconds: float
+    l2_type: Literal["redis", "redis_async"] = "redis_async"
 
 
 class CacheConfig(BaseModel):
     enabled: bool
-    type: Literal["redis", "memory"]
+    type: Literal["redis", "redis_async", "memory", "tiered"]
+    # Namespace of the results in Redis, by default a digest of the models and settings they depend on, so that
+    # a deploy changing any of them starts from an empty namespace
+    version: Optional[str] = None
     redis: Optional[RedisCacheConfig] = None
     memory: Optional[MemoryCacheConfig] = None
+    tiered: Optional[TieredCacheConfig] = None
+
+
+class EmbeddingCacheConfig(BaseModel):
+    enabled: bool = False
+    max_size: int = 100_000
+    disk_path: Optional[Path] = None
+
+
+class BatchingConfig(BaseModel):
+    # Coalesces concurrent single requests, inference runs on its own thread within the queue bound either way
+    enabled: bool = False
+    max_batch_size: int = 32
+    max_wait_ms: float = 5.0
+    # Texts waiting for the inference thread, batching or not, beyond which requests are refused with a 429,
+    # None is unbounded
+    max_queue_size: Optional[int] = 1024
+
+
+class PreprocessingConfig(BaseModel):
+    # Canonical form of the texts, both their cache key and what the models see, so it has to match the
+    # preprocessing of the training data (the sentence encoder is uncased)
+    unicode_form: Optional[Literal["NFC", "NFKC", "NFD", "NFKD"]] = "NFKC"
+    collapse_whitespace: bool = True
+    casefold: bool = True
+
+
+class StreamingConfig(BaseModel):
+    # Streamed texts are classified in chunks of this size
+    chunk_size: int = 256
+    # Longest line read out of a streamed body, a longer one ends the stream with an error record
+    max_line_bytes: int = 16384
+
+
+class WarmupConfig(BaseModel):
+    # A batch of each size goes through the models before the service reports ready
+    batch_sizes: List[int] = [1, 8, 32]
+
+
+class ProfilingConfig(BaseModel):
+    # Off by default: no admin routes, and requests are never profiled
+    enabled: bool = False
+    # Fraction of requests profiled without being asked to, on top of the ones sent with an X-Profile header
+    sample_rate: float = 0.0
+    # Only the latest profiles are kept, as .prof files in directory (a temporary one by default)
+    max_profiles: int = 20
+    directory: Optional[Path] = None
+    # Admin routes and X-Profile headers need an X-Admin-Token header of this value, and are refused without one
+    admin_token: Optional[str] = None
+    # Allocations are traced from the start with this many frames, 0 leaves it to the admin endpoint
+    tracemalloc_frames: int = 0
 
 
 class ServerConfig(BaseModel):
     host: str
     port: int
     workers: int
+    # Pins each worker to its own slice of the CPUs
+    cpu_affinity: bool = False
 
 
 class AppConfig(BaseModel):
     model: ModelConfig
     similarity: SimilarityConfig
     cache: CacheConfig
+    embedding_cache: EmbeddingCacheConfig = EmbeddingCacheConfig()
+    preprocessing: PreprocessingConfig = PreprocessingConfig()
+    batching: BatchingConfig = BatchingConfig()
+    streaming: StreamingConfig = StreamingConfig()
+    warmup: WarmupConfig = WarmupConfig()
+    profiling: ProfilingConfig = ProfilingConfig()
     server: ServerConfig
 
 
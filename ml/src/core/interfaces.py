@@ -1,5 +1,18 @@
 from abc import abstractmethod, ABC
-from typing import Any, Dict, List, Tuple, Optional
+from typing import Any, Dict, List, NamedTuple, Tuple, Optional
+
+import numpy as np
+
+# A (section, name, probability) classification candidate
+Candidate = Tuple[str, str, float]
+
+
+class CachedLabel(NamedTuple):
+    """A cached classification result: the id of its label in the classifier's label table, and the probability of
+    that label when it is known"""
+
+    label_id: int
+    confidence: Optional[float] = None
 
 
 class ModelRepository(ABC):
@@ -16,12 +29,61 @@ class ModelRepository(ABC):
         pass
 
 
+class EmbeddingProvider(ABC):
+    """Abstract class for turning pieces of text into sentence embeddings"""
+
+    @abstractmethod
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Encodes the texts into a (len(texts), embedding_dim) matrix."""
+        pass
+
+    @abstractmethod
+    def get_dimension(self) -> int:
+        """Gets the size of the produced embeddings"""
+        pass
+
+    def get_model_name(self) -> Optional[str]:
+        """Gets the name of the model producing the embeddings, if known"""
+        return None
+
+
+class SimilarityIndex(ABC):
+    """Abstract class for nearest-neighbour search over known embeddings"""
+
+    @abstractmethod
+    def build(self, embeddings: np.ndarray) -> None:
+        """Indexes the known embeddings, one row per known text."""
+        pass
+
+    @abstractmethod
+    def search(self, queries: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Finds the most similar known embedding of each query.
+
+        Args:
+            queries: Query embeddings, one row per query
+
+        Returns:
+            The best similarity of each query, scaled to (0, 1] for distances, and the row of the matching
+            known embedding
+        """
+        pass
+
+
 class AnomalyDetector(ABC):
     """Abstract class for anomaly detection"""
 
     @abstractmethod
-    def is_anomaly(self, query: str | List[str]) -> bool | List[bool]:
-        """Determines if query/queries are anomalies based on similarity threshold."""
+    def is_anomaly(
+        self, query: str | List[str], embeddings: Optional[np.ndarray] = None
+    ) -> bool | List[bool]:
+        """
+        Determines if query/queries are anomalies based on similarity threshold.
+
+        Args:
+            query: Single text string or list of text strings
+            embeddings: Optional precomputed embeddings of the query/queries, one row per text
+        """
         pass
 
 
@@ -30,35 +92,70 @@ class RepairClassifier(ABC):
 
     @abstractmethod
     def predict(
-        self, texts: str | List[str]
+        self, texts: str | List[str], embeddings: Optional[np.ndarray] = None
     ) -> Tuple[str, str] | List[Tuple[str, str]]:
         """
         Predict section and name for input text(s).
 
         Args:
             texts: Single text string or list of text strings
+            embeddings: Optional precomputed embeddings of the text(s), one row per text
 
         Returns:
             Single (section, name) tuple or list of (section, name) tuples
         """
         pass
 
+    @abstractmethod
+    def predict_top_k(
+        self, texts: List[str], k: int, embeddings: Optional[np.ndarray] = None
+    ) -> List[Tuple[Tuple[str, str], List[Candidate]]]:
+        """
+        Predict section and name for input texts, along with the k most probable candidates.
+
+        Args:
+            texts: List of text strings
+            k: Number of candidates returned per text
+            embeddings: Optional precomputed embeddings of the texts, one row per text
+
+        Returns:
+            List of ((section, name), candidates) pairs, the candidates being sorted by decreasing probability
+        """
+        pass
+
+    @abstractmethod
+    def get_labels(self) -> List[Tuple[str, str]]:
+        """(section, name) of each class the classifier predicts, indexed by class id"""
+        pass
+
 
 class CacheRegister(ABC):
     """Abstract class for caching classification results."""
 
     @abstractmethod
-    async def get(self, key: str) -> Optional[Dict[str, str]]:
+    async def get(self, key: str) -> Optional[CachedLabel]:
         """Get classification result from cache."""
         pass
 
     @abstractmethod
     async def set(
-        self, key: str, value: Dict[str, str], ttl_hours: Optional[int] = None
+        self, key: str, value: CachedLabel, ttl_hours: Optional[int] = None
     ) -> bool:
         """Store classification result in cache."""
         pass
 
+    @abstractmethod
+    async def get_many(self, keys: List[str]) -> List[Optional[CachedLabel]]:
+        """Get classification results for several keys in one go, with None for each miss."""
+        pass
+
+    @abstractmethod
+    async def set_many(
+        self, items: Dict[str, CachedLabel], ttl_hours: Optional[int] = None
+    ) -> bool:
+        """Store several classification results, given as a key -> result mapping, in one go."""
+        pass
+
     @abstractmethod
     async def delete(self, key: str) -> bool:
         """Delete classification result from cache."""
@@ -73,3 +170,7 @@ class CacheRegister(ABC):
     async def exists(self, key: str) -> bool:
         """Check if key exists in cache."""
         pass
+
+    async def close(self) -> None:
+        """Release the connections held by the cache, if any."""
+        pass
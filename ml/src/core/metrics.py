@@ -0,0 +1,259 @@
+import bisect
+import threading
+from abc import ABC, abstractmethod
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Seconds, from sub-millisecond cache lookups up to multi-second batches
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+LabelValues = Tuple[str, ...]
+
+
+class Metric(ABC):
+    """A named metric with labels, rendered in the Prometheus text exposition format.
+
+    Metrics are per process: with several server workers, each one exposes its own values.
+    """
+
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        for suffix, labels, value in self.samples():
+            lines.append(f"{self.name}{suffix}{format_labels(labels)} {format_value(value)}")
+        return lines
+
+    @abstractmethod
+    def samples(self) -> List[Tuple[str, Dict[str, str], float]]:
+        """(name suffix, labels, value) of each sample"""
+        pass
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+
+class Counter(Metric):
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[Tuple[str, Dict[str, str], float]]:
+        with self._lock:
+            values = list(self._values.items())
+        return [("", dict(zip(self.labelnames, key)), value) for key, value in values]
+
+
+class Gauge(Counter):
+    type_name = "gauge"
+
+    def dec(self, amount: float = 1, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+
+class CallbackCounter(Metric):
+    """Counter whose values are read at scrape time, out of counters kept elsewhere (e.g. a cache's stats)"""
+
+    type_name = "counter"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str],
+        callback: Callable[[], Dict[LabelValues, float]],
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def samples(self) -> List[Tuple[str, Dict[str, str], float]]:
+        return [
+            ("", dict(zip(self.labelnames, key)), value)
+            for key, value in self.callback().items()
+        ]
+
+
+class Histogram(Metric):
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label values: the count of each bucket (not cumulative, +Inf last), then the sum
+        self._counts: Dict[LabelValues, List[int]] = {}
+        self._sums: Dict[LabelValues, float] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        bucket = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._counts.setdefault(key, [0] * (len(self.buckets) + 1))
+            counts[bucket] += 1
+            self._sums[key] = self._sums.get(key, 0.0) + value
+
+    def count(self, **labels: str) -> int:
+        return sum(self._counts.get(self._key(labels), []))
+
+    def samples(self) -> List[Tuple[str, Dict[str, str], float]]:
+        with self._lock:
+            snapshot = [(key, list(counts), self._sums[key]) for key, counts in self._counts.items()]
+
+        samples = []
+        for key, counts, total in snapshot:
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for upper_bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                samples.append(("_bucket", {**labels, "le": format_value(upper_bound)}, cumulative))
+            samples.append(("_sum", labels, total))
+            samples.append(("_count", labels, cumulative))
+        return samples
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        """Registers the metric, replacing a previous one of the same name"""
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+def format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    pairs = (f'{name}="{escape_label_value(value)}"' for name, value in labels.items())
+    return "{" + ",".join(pairs) + "}"
+
+
+def escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.register(
+    Histogram(
+        "repair_stage_seconds",
+        "Seconds spent in each stage of the classification pipeline",
+        ["stage"],
+    )
+)
+REQUEST_SECONDS = REGISTRY.register(
+    Histogram("repair_request_seconds", "Seconds spent serving each request", ["path"])
+)
+REQUESTS_IN_FLIGHT = REGISTRY.register(
+    Gauge("repair_requests_in_flight", "Requests currently being served", ["path"])
+)
+BATCH_SIZE = REGISTRY.register(
+    Histogram(
+        "repair_pipeline_batch_size",
+        "Number of texts per run of the models",
+        buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024),
+    )
+)
+OUTCOMES = REGISTRY.register(
+    Counter(
+        "repair_outcomes_total",
+        "Texts run through the models, by outcome: anomaly, unknown (below the threshold) or classified",
+        ["outcome"],
+    )
+)
+INFERENCE_QUEUE_DEPTH = REGISTRY.register(
+    Gauge("repair_inference_queue_depth", "Texts waiting for the inference thread")
+)
+REJECTED_REQUESTS = REGISTRY.register(
+    Counter(
+        "repair_rejected_total",
+        "Requests refused because the inference queue was full, or dropped because their deadline passed",
+        ["reason"],
+    )
+)
+CACHE_LOOKUPS = REGISTRY.register(
+    Counter(
+        "repair_cache_lookups_total",
+        "Result cache lookups, by cache backend and result",
+        ["backend", "result"],
+    )
+)
+
+# Objects whose get_stats() counters are exposed, by the name of the cache they belong to
+_stats_sources: Dict[str, Any] = {}
+REGISTRY.register(
+    CallbackCounter(
+        "repair_cache_stats_total",
+        "Counters kept by the caches themselves, e.g. the hits of each tier",
+        ["cache", "counter"],
+        lambda: {
+            (cache, counter): value
+            for cache, source in list(_stats_sources.items())
+            for counter, value in source.get_stats().items()
+        },
+    )
+)
+
+# Seconds spent in each stage while serving the current request, set by the metrics middleware
+request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_timings", default=None)
+
+
+def register_stats(cache: str, source: Any) -> None:
+    """Exposes the get_stats() counters of the source, if it has any, under the given cache name"""
+    if callable(getattr(source, "get_stats", None)):
+        _stats_sources[cache] = source
+
+
+def server_timing(timings: Dict[str, float]) -> str:
+    """Server-Timing header value, in milliseconds"""
+    return ", ".join(f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in timings.items())
+
+
+@contextmanager
+def timed_stage(stage: str, timings: Optional[Dict[str, float]] = None) -> Iterator[None]:
+    """Observes the seconds spent in the block in the stage histogram, and adds them to timings[stage] if given"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + elapsed
@@ -0,0 +1,17 @@
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+
+@contextmanager
+def timed(timings: Optional[Dict[str, float]], stage: str) -> Iterator[None]:
+    """Adds the seconds spent in the block to timings[stage], doing nothing when no timings are collected"""
+    if timings is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start
@@ -0,0 +1,213 @@
+import fcntl
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, override
+
+import numpy as np
+
+from src.cache.lru_store import LRUTTLStore
+from src.core.interfaces import EmbeddingProvider
+
+logger = logging.getLogger(__name__)
+
+DIGEST_SIZE = 16
+
+
+def text_digest(text: str) -> bytes:
+    """Fixed-width binary key of a piece of text"""
+    return hashlib.blake2b(text.encode(), digest_size=DIGEST_SIZE).digest()
+
+
+class DiskEmbeddingStore:
+    """Append-only, memory-mapped store of float32 embeddings, keyed by text digest.
+
+    Vectors are appended to `vectors.f32` and their digests, in the same row order, to `keys.bin`. A vector is
+    always written before its key, and a row only counts once both its vector and its key are complete. Before
+    appending, whatever a crashed write left past the last complete row is truncated from both files, so rows
+    never get out of step. Appends are guarded by a file lock, which lets several worker processes share the
+    same store. Files are not fsynced, it's a cache: an OS crash may only lose the latest rows.
+    """
+
+    def __init__(self, directory: Path, dimension: int):
+        self.directory = Path(directory)
+        self.dimension = dimension
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        self.row_bytes = dimension * np.dtype(np.float32).itemsize
+        self.vectors_path = self.directory / "vectors.f32"
+        self.keys_path = self.directory / "keys.bin"
+        self.__check_metadata()
+        self.vectors_path.touch(exist_ok=True)
+        self.keys_path.touch(exist_ok=True)
+
+        self._index: Dict[bytes, int] = {}
+        self._rows = 0
+        self._vectors: Optional[np.memmap] = None
+        self.__refresh_index()
+        logger.info(f"Opened embedding store at {self.directory} with {self._rows} vectors")
+
+    def __len__(self) -> int:
+        return self._rows
+
+    def get_many(self, digests: List[bytes]) -> List[Optional[np.ndarray]]:
+        """Gets the stored vector of each digest, or None when missing."""
+        if any(digest not in self._index for digest in digests):
+            # Other processes may have appended in the meantime
+            self.__refresh_index()
+        return [self.__read(self._index.get(digest)) for digest in digests]
+
+    def put_many(self, digests: List[bytes], vectors: np.ndarray) -> None:
+        """Appends the vectors of the digests which are not stored yet."""
+        with open(self.keys_path, "ab") as keys_file:
+            fcntl.flock(keys_file, fcntl.LOCK_EX)
+            try:
+                self.__refresh_index()
+                new_rows = [
+                    i for i, digest in enumerate(digests) if digest not in self._index
+                ]
+                if not new_rows:
+                    return
+
+                # Drop an orphan vector or a partial key left by a crashed append
+                os.truncate(self.vectors_path, self._rows * self.row_bytes)
+                os.ftruncate(keys_file.fileno(), self._rows * DIGEST_SIZE)
+
+                with open(self.vectors_path, "ab") as vectors_file:
+                    new_vectors = np.ascontiguousarray(vectors[new_rows], dtype=np.float32)
+                    vectors_file.write(new_vectors.tobytes())
+                keys_file.write(b"".join(digests[i] for i in new_rows))
+                keys_file.flush()
+            finally:
+                fcntl.flock(keys_file, fcntl.LOCK_UN)
+
+        self.__refresh_index()
+
+    def __read(self, row: Optional[int]) -> Optional[np.ndarray]:
+        if row is None:
+            return None
+        return self._vectors[row]
+
+    def __refresh_index(self) -> None:
+        """Indexes the rows completed since the last refresh and re-maps the vectors file if it grew"""
+        # A key only counts once its vector is fully written
+        vector_rows = os.path.getsize(self.vectors_path) // self.row_bytes
+        with open(self.keys_path, "rb") as keys_file:
+            keys_file.seek(self._rows * DIGEST_SIZE)
+            new_keys = keys_file.read(max(0, vector_rows - self._rows) * DIGEST_SIZE)
+
+        # Ignore a partially written trailing key
+        usable = len(new_keys) - len(new_keys) % DIGEST_SIZE
+        for offset in range(0, usable, DIGEST_SIZE):
+            self._index.setdefault(new_keys[offset : offset + DIGEST_SIZE], self._rows)
+            self._rows += 1
+
+        if self._rows and (self._vectors is None or len(self._vectors) < self._rows):
+            self._vectors = np.memmap(
+                self.vectors_path,
+                dtype=np.float32,
+                mode="r",
+                shape=(self._rows, self.dimension),
+            )
+
+    def __check_metadata(self) -> None:
+        """Makes sure an existing store was written with embeddings of the same size"""
+        metadata_path = self.directory / "metadata.json"
+        if metadata_path.exists():
+            metadata = json.loads(metadata_path.read_text())
+            if metadata["dimension"] != self.dimension:
+                raise ValueError(
+                    f"Embedding store at {self.directory} holds vectors of size "
+                    f"{metadata['dimension']}, expected {self.dimension}"
+                )
+        else:
+            metadata_path.write_text(json.dumps({"dimension": self.dimension}))
+
+
+class CachedEmbeddingProvider(EmbeddingProvider):
+    """Embedding provider which remembers the embeddings of already seen texts.
+
+    Lookups go through an in-memory LRU tier, then an optional disk tier, and only the remaining texts are
+    sent to the wrapped encoder. Since the embeddings don't depend on the thresholds or on the classifier
+    head, they survive config changes and head retrains.
+    """
+
+    def __init__(
+        self,
+        embedder: EmbeddingProvider,
+        max_size: int = 100_000,
+        disk_store: Optional[DiskEmbeddingStore] = None,
+    ):
+        self.embedder = embedder
+        self.disk_store = disk_store
+        self._memory: LRUTTLStore[np.ndarray] = LRUTTLStore(max_size)
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @override
+    def encode(self, texts: List[str]) -> np.ndarray:
+        embeddings = np.empty((len(texts), self.get_dimension()), dtype=np.float32)
+        digests = [text_digest(text) for text in texts]
+
+        missing: List[int] = []
+        for i, digest in enumerate(digests):
+            vector = self._memory.get(digest)
+            if vector is None:
+                missing.append(i)
+            else:
+                embeddings[i] = vector
+        self.memory_hits += len(texts) - len(missing)
+
+        if missing and self.disk_store is not None:
+            stored = self.disk_store.get_many([digests[i] for i in missing])
+            still_missing: List[int] = []
+            for i, vector in zip(missing, stored):
+                if vector is None:
+                    still_missing.append(i)
+                else:
+                    embeddings[i] = vector
+                    self._memory.set(digests[i], embeddings[i].copy())
+            self.disk_hits += len(missing) - len(still_missing)
+            missing = still_missing
+
+        if missing:
+            # Encode each distinct text only once
+            positions: Dict[bytes, List[int]] = {}
+            for i in missing:
+                positions.setdefault(digests[i], []).append(i)
+            unique_digests = list(positions)
+            unique_texts = [texts[positions[digest][0]] for digest in unique_digests]
+
+            encoded = np.asarray(self.embedder.encode(unique_texts), dtype=np.float32)
+            for digest, vector in zip(unique_digests, encoded):
+                embeddings[positions[digest]] = vector
+                self._memory.set(digest, vector.copy())
+            if self.disk_store is not None:
+                self.disk_store.put_many(unique_digests, encoded)
+            self.misses += len(unique_texts)
+
+        return embeddings
+
+    @override
+    def get_dimension(self) -> int:
+        return self.embedder.get_dimension()
+
+    @override
+    def get_model_name(self) -> Optional[str]:
+        return self.embedder.get_model_name()
+
+    def get_stats(self) -> Dict[str, int]:
+        """Gets the hit counters of each tier and the number of encoded texts"""
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+        }
+
+    def __len__(self) -> int:
+        """Number of embeddings held in memory"""
+        return len(self._memory)
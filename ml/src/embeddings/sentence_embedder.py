@@ -0,0 +1,129 @@
+import logging
+from pathlib import Path
+from typing import List, Literal, Optional, override
+
+import numpy as np
+from sentence_transformers import SentenceTransformer
+
+from src.core.interfaces import EmbeddingProvider
+
+logger = logging.getLogger(__name__)
+
+EncoderBackend = Literal["torch", "onnx", "onnx-int8"]
+QuantizationTarget = Literal["arm64", "avx2", "avx512", "avx512_vnni"]
+
+
+class SentenceEmbeddingProvider(EmbeddingProvider):
+    """Embedding provider backed by a single sentence transformer instance,
+    meant to be shared by the anomaly detector and the classifier"""
+
+    def __init__(
+        self,
+        model_name: str,
+        backend: EncoderBackend = "torch",
+        export_dir: Optional[Path] = None,
+        quantization: QuantizationTarget = "avx2",
+        max_batch_tokens: Optional[int] = None,
+    ):
+        self.model_name = model_name
+        self.backend = backend
+        self.max_batch_tokens = max_batch_tokens
+        self.model = load_sentence_transformer(
+            model_name, backend, export_dir, quantization
+        )
+
+    @override
+    def encode(self, texts: List[str]) -> np.ndarray:
+        if self.max_batch_tokens is None or len(texts) <= 1:
+            return self.model.encode(texts, convert_to_numpy=True)
+
+        # Texts of similar length are encoded together, in sub-batches whose padded size fits the token budget
+        embeddings = np.empty((len(texts), self.get_dimension()), dtype=np.float32)
+        for positions in token_budget_batches(
+            self.__token_lengths(texts), self.max_batch_tokens
+        ):
+            embeddings[positions] = self.model.encode(
+                [texts[i] for i in positions],
+                batch_size=len(positions),
+                convert_to_numpy=True,
+            )
+        return embeddings
+
+    @override
+    def get_dimension(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+    @override
+    def get_model_name(self) -> Optional[str]:
+        return self.model_name
+
+    def __token_lengths(self, texts: List[str]) -> np.ndarray:
+        """Number of tokens of each text, as seen by the model after truncation"""
+        input_ids = self.model.tokenizer(
+            texts, truncation=True, max_length=self.model.max_seq_length
+        )["input_ids"]
+        return np.fromiter((len(ids) for ids in input_ids), dtype=np.int64, count=len(texts))
+
+
+def token_budget_batches(lengths: np.ndarray, max_batch_tokens: int) -> List[np.ndarray]:
+    """Groups text positions into sub-batches of similar token lengths.
+
+    Positions are sorted by length, and each sub-batch grows while its padded size, i.e. its number of rows
+    times its longest length, stays within max_batch_tokens. A text longer than the budget gets a batch of its
+    own.
+    """
+    order = np.argsort(lengths, kind="stable")
+    batches: List[np.ndarray] = []
+    start = 0
+    for end in range(1, len(order) + 1):
+        # Sorted, so the last length of the candidate sub-batch is its longest one
+        if end < len(order) and (end + 1 - start) * lengths[order[end]] <= max_batch_tokens:
+            continue
+        batches.append(order[start:end])
+        start = end
+    return batches
+
+
+def load_sentence_transformer(
+    model_name: str,
+    backend: EncoderBackend = "torch",
+    export_dir: Optional[Path] = None,
+    quantization: QuantizationTarget = "avx2",
+) -> SentenceTransformer:
+    """Loads the sentence transformer on the requested inference backend.
+
+    The ONNX backends export the model once into export_dir/<model name>, optionally with a dynamically
+    int8-quantized copy of the graph, and load the exported files on the next starts.
+    """
+    if backend == "torch":
+        return SentenceTransformer(model_name)
+
+    if export_dir is None:
+        raise ValueError(f"The {backend} encoder backend needs an export directory")
+
+    model_dir = Path(export_dir) / model_name.replace("/", "__")
+    if not (model_dir / "onnx" / "model.onnx").exists():
+        logger.info(f"Exporting {model_name} to ONNX at {model_dir}")
+        SentenceTransformer(model_name, backend="onnx").save(str(model_dir))
+
+    if backend == "onnx":
+        return SentenceTransformer(
+            str(model_dir), backend="onnx", model_kwargs={"file_name": "onnx/model.onnx"}
+        )
+
+    quantized_file = f"onnx/model_int8_{quantization}.onnx"
+    if not (model_dir / quantized_file).exists():
+        # Imported lazily, it needs the optional optimum dependency
+        from sentence_transformers import export_dynamic_quantized_onnx_model
+
+        logger.info(f"Quantizing the ONNX export of {model_name} for {quantization}")
+        export_dynamic_quantized_onnx_model(
+            SentenceTransformer(str(model_dir), backend="onnx"),
+            quantization,
+            str(model_dir),
+            file_suffix=f"int8_{quantization}",
+        )
+
+    return SentenceTransformer(
+        str(model_dir), backend="onnx", model_kwargs={"file_name": quantized_file}
+    )
@@ -1,10 +1,8 @@
 import logging
 from pathlib import Path
 
-import uvicorn
-
-from core.config import load_config
-from src.app import create_app
+from src.core.config import load_config
+from src.server import serve
 
 if __name__ == "__main__":
     # Set-up logging
@@ -13,11 +11,5 @@ if __name__ == "__main__":
     config_path = Path(__file__).parent.parent / "config.yaml"
     config = load_config(config_path)
 
-    # Start the FastAPI app
-    app = create_app(config)
-    uvicorn.run(
-        app,
-        host=config.server.host,
-        port=config.server.port,
-        workers=config.server.workers,
-    )
+    # Start the FastAPI app, the workers being forked before any of them loads the models
+    serve(config)
@@ -0,0 +1,150 @@
+"""Checks that the ONNX backends configured in config.yaml agree with the reference torch backend.
+
+Run from the ml folder with: python -m src.models.backend_parity --report parity.json
+The exit code is non-zero when the drift goes beyond the tolerances.
+"""
+
+import argparse
+import json
+import logging
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from src.core.config import AppConfig, load_config
+from src.embeddings.sentence_embedder import SentenceEmbeddingProvider
+from src.models.classifier import EmbeddingsRepairClassifier
+from src.models.local_model_repository import LocalModelRepository
+from src.similarity.searcher import SimilarityAnomalyDetector
+
+
+def embedding_drift(reference: np.ndarray, candidate: np.ndarray) -> Dict[str, float]:
+    """Cosine similarity and largest absolute difference between two sets of embeddings, row by row"""
+    reference = np.asarray(reference, dtype=np.float32)
+    candidate = np.asarray(candidate, dtype=np.float32)
+    norms = np.linalg.norm(reference, axis=1) * np.linalg.norm(candidate, axis=1)
+    cosine = np.einsum("ij,ij->i", reference, candidate) / np.maximum(
+        norms, np.finfo(np.float32).tiny
+    )
+    return {
+        "min_cosine": float(cosine.min()),
+        "mean_cosine": float(cosine.mean()),
+        "max_abs_diff": float(np.abs(reference - candidate).max()),
+    }
+
+
+def agreement(reference: List[Any], candidate: List[Any]) -> float:
+    """Share of the positions where both lists hold the same value"""
+    if not reference:
+        return 1.0
+    return sum(a == b for a, b in zip(reference, candidate)) / len(reference)
+
+
+def check_parity(
+    config: AppConfig,
+    texts: List[str],
+    min_cosine: float = 0.99,
+    min_label_agreement: float = 0.99,
+    min_anomaly_agreement: float = 0.99,
+) -> Dict[str, Any]:
+    """Runs the texts through the torch backend and through the configured one, and compares the embeddings,
+    the predicted labels and the anomaly decisions."""
+    similarity = config.similarity
+    reference_embedder = SentenceEmbeddingProvider(similarity.model_name)
+    candidate_embedder = SentenceEmbeddingProvider(
+        similarity.model_name,
+        similarity.backend,
+        similarity.onnx_dir,
+        similarity.onnx_quantization,
+        similarity.max_batch_tokens,
+    )
+
+    reference_embeddings = reference_embedder.encode(texts)
+    candidate_embeddings = candidate_embedder.encode(texts)
+
+    # Each detector indexes the known corpus as encoded by its own backend, like it would when serving
+    reference_anomalies = SimilarityAnomalyDetector(
+        similarity.model_copy(update={"backend": "torch"}), reference_embedder
+    ).is_anomaly(texts, reference_embeddings)
+    candidate_anomalies = SimilarityAnomalyDetector(
+        similarity, candidate_embedder
+    ).is_anomaly(texts, candidate_embeddings)
+
+    repository = LocalModelRepository()
+    model = config.model
+    reference_labels = EmbeddingsRepairClassifier(
+        repository, model.weights_path, model.softmax_threshold, reference_embedder
+    ).predict(texts, reference_embeddings)
+    candidate_labels = EmbeddingsRepairClassifier(
+        repository,
+        model.weights_path,
+        model.softmax_threshold,
+        candidate_embedder,
+        backend=model.backend,
+    ).predict(texts, candidate_embeddings)
+
+    drift = embedding_drift(reference_embeddings, candidate_embeddings)
+    label_agreement = agreement(reference_labels, candidate_labels)
+    anomaly_agreement = agreement(reference_anomalies, candidate_anomalies)
+    return {
+        "encoder_backend": similarity.backend,
+        "head_backend": model.backend,
+        "samples": len(texts),
+        "embeddings": drift,
+        "label_agreement": label_agreement,
+        "anomaly_agreement": anomaly_agreement,
+        "tolerances": {
+            "min_cosine": min_cosine,
+            "min_label_agreement": min_label_agreement,
+            "min_anomaly_agreement": min_anomaly_agreement,
+        },
+        "passed": drift["min_cosine"] >= min_cosine
+        and label_agreement >= min_label_agreement
+        and anomaly_agreement >= min_anomaly_agreement,
+    }
+
+
+def load_texts(path: Path, limit: Optional[int]) -> List[str]:
+    with open(path, "r") as texts_file:
+        texts = [line.strip() for line in texts_file if line.strip()]
+    return texts[:limit] if limit else texts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--config",
+        type=Path,
+        default=Path(__file__).parent.parent.parent / "config.yaml",
+    )
+    parser.add_argument(
+        "--texts", type=Path, help="One text per line, defaults to the known corpus"
+    )
+    parser.add_argument("--limit", type=int, default=1000)
+    parser.add_argument("--min-cosine", type=float, default=0.99)
+    parser.add_argument("--min-label-agreement", type=float, default=0.99)
+    parser.add_argument("--min-anomaly-agreement", type=float, default=0.99)
+    parser.add_argument("--report", type=Path, help="Where to write the JSON report")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    config = load_config(args.config)
+    texts = load_texts(args.texts or config.similarity.data_path, args.limit)
+
+    report = check_parity(
+        config,
+        texts,
+        args.min_cosine,
+        args.min_label_agreement,
+        args.min_anomaly_agreement,
+    )
+    print(json.dumps(report, indent=2))
+    if args.report is not None:
+        args.report.write_text(json.dumps(report, indent=2))
+    sys.exit(0 if report["passed"] else 1)
+
+
+if __name__ == "__main__":
+    main()
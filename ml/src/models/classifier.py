@@ -1,6 +1,16 @@
-from typing import List, Tuple
+from pathlib import Path
+from typing import List, Literal, Optional, Tuple
 
-from src.core.interfaces import RepairClassifier, ModelRepository
+import numpy as np
+
+from src.core.interfaces import (
+    Candidate,
+    EmbeddingProvider,
+    RepairClassifier,
+    ModelRepository,
+)
+from src.models.onnx_head import OnnxClassifierHead
+from src.models.torch_head import CompileMode, TorchClassifierHead
 from src.models.trained_classifier import TrainingRepairClassifier
 
 
@@ -8,13 +18,32 @@ class EmbeddingsRepairClassifier(RepairClassifier):
     """Simple classifier based on sentence embeddings"""
 
     def __init__(
-        self, model_repository: ModelRepository, model_id: str, threshold: float = 0.5
+        self,
+        model_repository: ModelRepository,
+        model_id: str,
+        threshold: float = 0.5,
+        embedder: Optional[EmbeddingProvider] = None,
+        backend: Literal["torch", "onnx"] = "torch",
+        compile_mode: CompileMode = "none",
+        intra_op_threads: Optional[int] = None,
     ):
         checkpoint = model_repository.load_model(model_id)
 
         config = checkpoint["model_config"]
         self.label_encoder = checkpoint["label_encoder"]
 
+        # The head only makes sense on embeddings of the model it was trained on
+        if (
+            embedder is not None
+            and embedder.get_model_name() != config["embedding_model_name"]
+        ):
+            raise ValueError(
+                f"Classifier was trained on {config['embedding_model_name']} embeddings, "
+                f"but was given the {embedder.get_model_name()} embedder"
+            )
+        # When shared, raw texts are encoded by the embedder and the model loads no transformer of its own
+        self.embedder = embedder
+
         # Recreate model
         self.model = TrainingRepairClassifier(
             embedding_model_name=config["embedding_model_name"],
@@ -23,12 +52,38 @@ class EmbeddingsRepairClassifier(RepairClassifier):
             dropout=config["dropout"],
             threshold=threshold,
             label_encoder=self.label_encoder,
+            embedding_dim=embedder.get_dimension() if embedder is not None else None,
         )
 
         # Load weights
-        self.model.load_state_dict(checkpoint["model_state_dict"])
+        state_dict = checkpoint["model_state_dict"]
+        if embedder is None:
+            self.model.load_state_dict(state_dict)
+        else:
+            # The embeddings come from the shared embedder, so only the classification head is loaded
+            head_prefix = "classifier."
+            self.model.classifier.load_state_dict(
+                {
+                    key.removeprefix(head_prefix): value
+                    for key, value in state_dict.items()
+                    if key.startswith(head_prefix)
+                }
+            )
         self.model.eval()
 
+        # Serving copy of the head, the torch model is still used to encode raw texts
+        if backend == "onnx":
+            self.head = OnnxClassifierHead(
+                self.model.classifier,
+                self.model.embedding_dim,
+                Path(model_id),
+                intra_op_threads,
+            )
+        else:
+            self.head = TorchClassifierHead(
+                self.model.classifier, self.model.embedding_dim, compile_mode
+            )
+
         print(
             f"Model loaded with {config['num_classes']} classes, threshold: {threshold}"
         )
@@ -38,7 +93,28 @@ class EmbeddingsRepairClassifier(RepairClassifier):
         self.model.threshold = threshold
 
     def predict(
-        self, texts: str | List[str]
+        self, texts: str | List[str], embeddings: Optional[np.ndarray] = None
     ) -> Tuple[str, str] | List[Tuple[str, str]]:
         """Predict section and name for input text(s)"""
-        return self.model.predict(texts)
+        single_input = isinstance(texts, str)
+        if single_input:
+            texts = [texts]
+        results = self.model.decode_logits(self.__logits(texts, embeddings))
+        return results[0] if single_input else results
+
+    def predict_top_k(
+        self, texts: List[str], k: int, embeddings: Optional[np.ndarray] = None
+    ) -> List[Tuple[Tuple[str, str], List[Candidate]]]:
+        """Predict section and name for input texts, along with their k most probable candidates"""
+        return self.model.decode_top_k(self.__logits(texts, embeddings), k)
+
+    def get_labels(self) -> List[Tuple[str, str]]:
+        """(section, name) of each class, indexed by class id"""
+        return self.model.get_labels()
+
+    def __logits(self, texts: List[str], embeddings: Optional[np.ndarray]) -> np.ndarray:
+        if embeddings is None and self.embedder is not None:
+            embeddings = self.embedder.encode(texts)
+        elif embeddings is None:
+            embeddings = self.model.sentence_transformer.encode(texts, convert_to_numpy=True)
+        return self.head(embeddings)
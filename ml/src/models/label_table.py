@@ -0,0 +1,83 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from src.core.interfaces import Candidate
+
+UNKNOWN = "unknown"
+# Id of the unknown label (anomalies and predictions below the threshold), out of the range of the class ids
+UNKNOWN_LABEL_ID = 0xFFFF
+
+
+class LabelTable:
+    """Section and name of every class id, split once out of the combined "section|name" labels.
+
+    Decoding a batch is then a single gather over the two arrays, instead of a label encoder call and a string
+    split per row. The class ids also stand for the labels in the result cache, shared by every worker serving the
+    same model.
+    """
+
+    def __init__(self, sections: np.ndarray, names: np.ndarray):
+        self.sections = sections
+        self.names = names
+        self._ids: Optional[Dict[Tuple[str, str], int]] = None
+
+    @classmethod
+    def from_label_encoder(cls, label_encoder) -> "LabelTable":
+        return cls.from_labels(label.split("|") for label in label_encoder.classes_)
+
+    @classmethod
+    def from_labels(cls, labels: Iterable[Tuple[str, str]]) -> "LabelTable":
+        sections, names = zip(*labels)
+        return cls(np.array(sections, dtype=object), np.array(names, dtype=object))
+
+    def __len__(self) -> int:
+        return len(self.sections)
+
+    def labels(self) -> List[Tuple[str, str]]:
+        """(section, name) of each class, indexed by class id"""
+        return list(zip(self.sections.tolist(), self.names.tolist()))
+
+    def label_id(self, section: str, name: str) -> Optional[int]:
+        """Id of a label, None for a label the table doesn't hold"""
+        if section == UNKNOWN and name == UNKNOWN:
+            return UNKNOWN_LABEL_ID
+        if self._ids is None:
+            self._ids = {label: class_id for class_id, label in enumerate(self.labels())}
+        return self._ids.get((section, name))
+
+    def label(self, label_id: int) -> Optional[Tuple[str, str]]:
+        """(section, name) of a label id, None for an id out of the table"""
+        if label_id == UNKNOWN_LABEL_ID:
+            return UNKNOWN, UNKNOWN
+        if not 0 <= label_id < len(self.sections):
+            return None
+        return self.sections[label_id], self.names[label_id]
+
+    def decode(
+        self, probs: np.ndarray, threshold: float
+    ) -> List[Tuple[str, str]]:
+        """(section, name) of the most probable class of each row, unknown below the threshold"""
+        class_ids = np.argmax(probs, axis=1)
+        confident = probs[np.arange(len(probs)), class_ids] >= threshold
+        sections = np.where(confident, self.sections[class_ids], UNKNOWN)
+        names = np.where(confident, self.names[class_ids], UNKNOWN)
+        return list(zip(sections.tolist(), names.tolist()))
+
+    def top_k(self, probs: np.ndarray, k: int) -> List[List[Candidate]]:
+        """The k most probable (section, name, probability) candidates of each row, best first"""
+        k = min(k, probs.shape[1])
+        class_ids = np.argpartition(-probs, k - 1, axis=1)[:, :k]
+        top_probs = np.take_along_axis(probs, class_ids, axis=1)
+        order = np.argsort(-top_probs, axis=1, kind="stable")
+        class_ids = np.take_along_axis(class_ids, order, axis=1)
+        top_probs = np.take_along_axis(top_probs, order, axis=1)
+
+        sections = self.sections[class_ids].tolist()
+        names = self.names[class_ids].tolist()
+        return [
+            list(zip(row_sections, row_names, row_probs))
+            for row_sections, row_names, row_probs in zip(
+                sections, names, top_probs.tolist()
+            )
+        ]
@@ -0,0 +1,85 @@
+import logging
+import os
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+logger = logging.getLogger(__name__)
+
+
+def head_export_path(weights_path: Path) -> Path:
+    """Where the ONNX export of the classification head is cached, next to the weights it comes from"""
+    weights_path = Path(weights_path)
+    return weights_path.with_name(f"{weights_path.stem}.head.onnx")
+
+
+class OnnxClassifierHead:
+    """Classification head exported to ONNX and run through ONNX Runtime on CPU.
+
+    The head is exported once next to its weights, and exported again whenever the weights are newer than the
+    cached graph.
+    """
+
+    INPUT_NAME = "embeddings"
+    OUTPUT_NAME = "logits"
+
+    def __init__(
+        self,
+        head: nn.Module,
+        embedding_dim: int,
+        weights_path: Path,
+        intra_op_threads: Optional[int] = None,
+    ):
+        # Imported lazily, onnxruntime is an optional dependency
+        import onnxruntime as ort
+
+        self.onnx_path = head_export_path(weights_path)
+        if self.__is_stale(Path(weights_path)):
+            self.__export(head, embedding_dim)
+
+        options = ort.SessionOptions()
+        if intra_op_threads is not None:
+            options.intra_op_num_threads = intra_op_threads
+        self.session = ort.InferenceSession(
+            str(self.onnx_path), options, providers=["CPUExecutionProvider"]
+        )
+
+    def __call__(self, embeddings: np.ndarray) -> np.ndarray:
+        """Computes the logits of a batch of embeddings"""
+        inputs = np.ascontiguousarray(np.atleast_2d(embeddings), dtype=np.float32)
+        return self.session.run([self.OUTPUT_NAME], {self.INPUT_NAME: inputs})[0]
+
+    def __is_stale(self, weights_path: Path) -> bool:
+        if not self.onnx_path.exists():
+            return True
+        return (
+            weights_path.exists()
+            and weights_path.stat().st_mtime > self.onnx_path.stat().st_mtime
+        )
+
+    def __export(self, head: nn.Module, embedding_dim: int) -> None:
+        """Exports the head with a dynamic batch axis, through a temporary file so workers never load a
+        partial graph"""
+        logger.info(f"Exporting the classification head to {self.onnx_path}")
+        head.eval()
+        self.onnx_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.onnx_path.parent, suffix=".onnx.tmp")
+        os.close(fd)
+        try:
+            torch.onnx.export(
+                head,
+                (torch.zeros(1, embedding_dim),),
+                temp_path,
+                input_names=[self.INPUT_NAME],
+                output_names=[self.OUTPUT_NAME],
+                dynamic_axes={self.INPUT_NAME: {0: "batch"}, self.OUTPUT_NAME: {0: "batch"}},
+                dynamo=False,
+            )
+            os.replace(temp_path, self.onnx_path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
@@ -0,0 +1,59 @@
+import logging
+from typing import Literal, Optional
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+logger = logging.getLogger(__name__)
+
+CompileMode = Literal["none", "torchscript", "compile"]
+
+
+class TorchClassifierHead:
+    """Classification head run in serving mode.
+
+    Inference runs under torch.inference_mode, without any autograd bookkeeping. The head can be traced with
+    TorchScript and frozen, or compiled with torch.compile, which fuses its small layers.
+    """
+
+    def __init__(
+        self, head: nn.Module, embedding_dim: int, compile_mode: CompileMode = "none"
+    ):
+        head.eval()
+        self.compile_mode = compile_mode
+        if compile_mode == "torchscript":
+            with torch.no_grad():
+                traced = torch.jit.trace(head, torch.zeros(1, embedding_dim))
+            self.module = torch.jit.freeze(traced)
+        elif compile_mode == "compile":
+            self.module = torch.compile(head, dynamic=True)
+        else:
+            self.module = head
+
+    def __call__(self, embeddings: np.ndarray) -> np.ndarray:
+        """Computes the logits of a batch of embeddings"""
+        inputs = torch.as_tensor(np.atleast_2d(embeddings), dtype=torch.float32)
+        with torch.inference_mode():
+            return self.module(inputs).numpy()
+
+
+def configure_torch_threads(
+    intra_op_threads: Optional[int], inter_op_threads: Optional[int]
+) -> None:
+    """Sets the torch thread pools of this process, so several workers on a host don't oversubscribe its cores"""
+    if intra_op_threads is not None:
+        torch.set_num_threads(intra_op_threads)
+    if inter_op_threads is not None:
+        try:
+            torch.set_num_interop_threads(inter_op_threads)
+        except RuntimeError:
+            # Only allowed once, before any inter-op parallel work started
+            logger.warning(
+                f"Could not set {inter_op_threads} inter-op threads, keeping "
+                f"{torch.get_num_interop_threads()}"
+            )
+    logger.info(
+        f"Torch uses {torch.get_num_threads()} intra-op and "
+        f"{torch.get_num_interop_threads()} inter-op threads"
+    )
@@ -1,11 +1,13 @@
-from typing import List, override, Tuple
+from typing import List, Optional, override, Tuple
 
+import numpy as np
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
 from sentence_transformers import SentenceTransformer
 
-from src.core.interfaces import RepairClassifier
+from src.core.interfaces import Candidate, RepairClassifier
+from src.models.label_table import LabelTable
 
 
 class TrainingRepairClassifier(nn.Module, RepairClassifier):
@@ -19,43 +21,48 @@ class TrainingRepairClassifier(nn.Module, RepairClassifier):
         dropout=0.3,
         threshold=0.7,
         label_encoder=None,
+        sentence_transformer: Optional[SentenceTransformer] = None,
+        embedding_dim: Optional[int] = None,
     ):
         super(TrainingRepairClassifier, self).__init__()
 
-        # Load pre-trained sentence transformer
-        self.sentence_transformer = SentenceTransformer(embedding_model_name)
+        # Load pre-trained sentence transformer, unless an already loaded one is shared with us, or the
+        # embeddings are computed elsewhere and only their dimension is given
+        self.sentence_transformer = sentence_transformer
+        if sentence_transformer is None and embedding_dim is None:
+            self.sentence_transformer = SentenceTransformer(embedding_model_name)
 
-        # Freeze embeddings
-        for param in self.sentence_transformer.parameters():
-            param.requires_grad = False
+        if self.sentence_transformer is not None:
+            # Freeze embeddings
+            for param in self.sentence_transformer.parameters():
+                param.requires_grad = False
 
-        # Get embedding dimension
-        self.embedding_dim = (
-            self.sentence_transformer.get_sentence_embedding_dimension()
-        )
+            # Get embedding dimension
+            embedding_dim = self.sentence_transformer.get_sentence_embedding_dimension()
+        self.embedding_dim = embedding_dim
 
         # Single classification head
-        self.classifier = nn.Sequential(
-            nn.Linear(self.embedding_dim, hidden_dim),
-            nn.ReLU(),
-            nn.Dropout(dropout),
-            nn.Linear(hidden_dim, hidden_dim // 2),
-            nn.ReLU(),
-            nn.Dropout(dropout),
-            nn.Linear(hidden_dim // 2, num_classes),
+        self.classifier = build_classification_head(
+            self.embedding_dim, hidden_dim, dropout, num_classes
         )
 
         self.threshold = threshold
         self.label_encoder = label_encoder
+        self._label_table: Optional[LabelTable] = None
 
     def forward(self, texts):
         # Generate embeddings
         if isinstance(texts, list):
+            if self.sentence_transformer is None:
+                raise ValueError(
+                    "This classifier has no sentence transformer, it only classifies precomputed embeddings"
+                )
             embeddings = self.sentence_transformer.encode(
                 texts, convert_to_tensor=True, device=next(self.parameters()).device
             )
-            # Clone to make it a normal tensor for autograd, otherwise it causes errors
-            embeddings = embeddings.clone().detach().requires_grad_(True)
+            if torch.is_grad_enabled():
+                # Clone to make it a normal tensor for autograd, otherwise it causes errors
+                embeddings = embeddings.clone().detach().requires_grad_(True)
         else:
             embeddings = texts
 
@@ -65,28 +72,75 @@ class TrainingRepairClassifier(nn.Module, RepairClassifier):
 
     @override
     def predict(
-        self, texts: str | List[str]
+        self, texts: str | List[str], embeddings: Optional[np.ndarray] = None
     ) -> Tuple[str, str] | List[Tuple[str, str]]:
         """Predict section and name for input text(s)"""
         single_input = isinstance(texts, str)
         if single_input:
             texts = [texts]
 
+        results = self.decode_logits(self.__logits(texts, embeddings).numpy())
+        return results[0] if single_input else results
+
+    @override
+    def predict_top_k(
+        self, texts: List[str], k: int, embeddings: Optional[np.ndarray] = None
+    ) -> List[Tuple[Tuple[str, str], List[Candidate]]]:
+        """Predict section and name for input texts, along with their k most probable candidates"""
+        return self.decode_top_k(self.__logits(texts, embeddings).numpy(), k)
+
+    def decode_logits(self, logits: np.ndarray) -> List[Tuple[str, str]]:
+        """Turns a batch of logits into (section, name) labels, unknown below the confidence threshold"""
+        return self.label_table.decode(self.__softmax(logits), self.threshold)
+
+    def decode_top_k(
+        self, logits: np.ndarray, k: int
+    ) -> List[Tuple[Tuple[str, str], List[Candidate]]]:
+        """Turns a batch of logits into labels, along with the k most probable candidates of each row"""
+        probs = self.__softmax(logits)
+        return list(
+            zip(
+                self.label_table.decode(probs, self.threshold),
+                self.label_table.top_k(probs, k),
+            )
+        )
+
+    @override
+    def get_labels(self) -> List[Tuple[str, str]]:
+        return self.label_table.labels()
+
+    @property
+    def label_table(self) -> LabelTable:
+        """Section/name lookup table of the classes, built once from the label encoder"""
+        if self._label_table is None:
+            self._label_table = LabelTable.from_label_encoder(self.label_encoder)
+        return self._label_table
+
+    def __logits(self, texts: List[str], embeddings: Optional[np.ndarray]) -> torch.Tensor:
         self.eval()
-        with torch.no_grad():
-            logits = self.forward(texts)
-            probs = F.softmax(logits, dim=1)
-            max_probs, predictions = torch.max(probs, dim=1)
-
-            results = []
-            for i in range(len(texts)):
-                if max_probs[i].item() < self.threshold:
-                    results.append(("unknown", "unknown"))
-                else:
-                    combined_label = self.label_encoder.inverse_transform(
-                        [predictions[i].cpu().numpy()]
-                    )[0]
-                    section, name = combined_label.split("|")
-                    results.append((section, name))
+        with torch.inference_mode():
+            if embeddings is None:
+                return self.forward(texts)
+            # Skip the sentence transformer, the embeddings were already computed
+            return self.forward(
+                torch.as_tensor(np.atleast_2d(embeddings), dtype=torch.float32)
+            )
 
-        return results[0] if single_input else results
+    @staticmethod
+    def __softmax(logits: np.ndarray) -> np.ndarray:
+        return F.softmax(torch.as_tensor(logits), dim=1).numpy()
+
+
+def build_classification_head(
+    embedding_dim: int, hidden_dim: int, dropout: float, num_classes: int
+) -> nn.Sequential:
+    """The MLP which maps sentence embeddings to the combined section|name classes"""
+    return nn.Sequential(
+        nn.Linear(embedding_dim, hidden_dim),
+        nn.ReLU(),
+        nn.Dropout(dropout),
+        nn.Linear(hidden_dim, hidden_dim // 2),
+        nn.ReLU(),
+        nn.Dropout(dropout),
+        nn.Linear(hidden_dim // 2, num_classes),
+    )
@@ -0,0 +1,156 @@
+import gc
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+from multiprocessing.connection import wait
+from multiprocessing.process import BaseProcess
+from typing import Callable, Dict, List, Optional
+
+import uvicorn
+from fastapi import FastAPI
+
+from src.app import create_app
+from src.core.config import AppConfig
+
+logger = logging.getLogger(__name__)
+
+
+def serve(config: AppConfig) -> None:
+    """Serves the app with config.server.workers processes.
+
+    Several workers are forked from this process once it bound the socket, and before anything loads the models:
+    forking copies only the calling thread, so the locks held by the thread pools torch, ONNX Runtime or OpenMP
+    start on first use would stay locked for good in the workers, and no model may ever run in this process.
+    Each worker then creates its own app, which loads the models in the background with the worker's share of the
+    cores while /readyz reports it loading, and gets its own cache connections and inference thread. The workers
+    share the known-corpus embeddings through the page cache, as a memory-mapped artifact.
+    """
+    server_config = config.server
+    if server_config.workers <= 1:
+        uvicorn.run(create_app(config), host=server_config.host, port=server_config.port)
+        return
+
+    PreforkSupervisor(
+        lambda: create_app(config),
+        server_config.host,
+        server_config.port,
+        server_config.workers,
+        server_config.cpu_affinity,
+    ).run()
+
+
+def worker_cpus(worker: int, workers: int, cpus: List[int]) -> List[int]:
+    """The CPUs a worker is pinned to, the available ones being split in contiguous, even slices"""
+    if workers >= len(cpus):
+        return [cpus[worker % len(cpus)]]
+    per_worker = len(cpus) // workers
+    return cpus[worker * per_worker : (worker + 1) * per_worker]
+
+
+def running_threads() -> int:
+    """Number of threads of the current process, native ones included where the platform tells"""
+    try:
+        return len(os.listdir("/proc/self/task"))
+    except OSError:
+        return threading.active_count()
+
+
+class PreforkSupervisor:
+    """Forks the uvicorn workers out of the current process and replaces the ones which die.
+
+    The current process has to be single-threaded, so nothing a worker inherits can be locked by a thread it
+    doesn't have: it refuses to fork otherwise. SIGTERM and SIGINT are forwarded to the workers, which then shut
+    down gracefully.
+    """
+
+    def __init__(
+        self,
+        create_worker_app: Callable[[], FastAPI],
+        host: str,
+        port: int,
+        workers: int,
+        cpu_affinity: bool = False,
+    ):
+        self.create_worker_app = create_worker_app
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.cpus: Optional[List[int]] = (
+            sorted(os.sched_getaffinity(0)) if cpu_affinity else None
+        )
+
+        self._context = multiprocessing.get_context("fork")
+        self._processes: Dict[int, BaseProcess] = {}
+        self._socket: Optional[socket.socket] = None
+        self._stopping = False
+
+    def run(self) -> None:
+        threads = running_threads()
+        if threads > 1:
+            raise RuntimeError(
+                f"Can't fork the workers safely with {threads} threads running, "
+                "nothing may start threads (e.g. run a model) before serving"
+            )
+        self._socket = uvicorn.Config(None, host=self.host, port=self.port).bind_socket()
+        # Objects created so far are never collected nor touched by the cyclic GC of the workers, which keeps
+        # the pages holding them shared
+        gc.collect()
+        gc.freeze()
+
+        previous_handlers = {
+            sig: signal.signal(sig, self.__stop) for sig in (signal.SIGTERM, signal.SIGINT)
+        }
+        try:
+            for worker in range(self.workers):
+                self.__fork(worker)
+            logger.info(f"Started {self.workers} workers on {self.host}:{self.port}")
+            self.__supervise()
+        finally:
+            for sig, handler in previous_handlers.items():
+                signal.signal(sig, handler)
+            self._socket.close()
+
+    def __fork(self, worker: int) -> None:
+        process = self._context.Process(
+            target=self.__serve_worker, args=(worker,), name=f"worker-{worker}"
+        )
+        process.start()
+        self._processes[worker] = process
+
+    def __serve_worker(self, worker: int) -> None:
+        """Runs in the forked worker: pins it to its CPUs and serves the app on the inherited socket"""
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, signal.SIG_DFL)
+        if self.cpus is not None:
+            cpus = worker_cpus(worker, self.workers, self.cpus)
+            os.sched_setaffinity(0, cpus)
+            logger.info(f"Worker {worker} pinned to CPUs {cpus}")
+
+        app = self.create_worker_app()
+        uvicorn.Server(uvicorn.Config(app, host=self.host, port=self.port)).run(
+            sockets=[self._socket]
+        )
+
+    def __supervise(self) -> None:
+        """Waits for the workers to exit, replacing the ones which died while the server is not stopping"""
+        while self._processes:
+            sentinels = {process.sentinel: worker for worker, process in self._processes.items()}
+            for sentinel in wait(list(sentinels)):
+                worker = sentinels[sentinel]
+                process = self._processes.pop(worker)
+                process.join()
+                if not self._stopping:
+                    logger.warning(
+                        f"Worker {worker} exited with code {process.exitcode}, starting a new one"
+                    )
+                    self.__fork(worker)
+
+    def __stop(self, signum: int, _frame) -> None:
+        logger.info(f"Received signal {signum}, stopping the workers")
+        self._stopping = True
+        for process in self._processes.values():
+            if process.is_alive():
+                os.kill(process.pid, signal.SIGTERM)
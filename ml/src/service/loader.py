@@ -0,0 +1,90 @@
+import asyncio
+import logging
+import time
+from typing import Callable, Dict, List, Optional
+
+from src.core.timing import timed
+from src.embeddings.embedding_cache import CachedEmbeddingProvider
+from src.service.pipeline import InferencePipeline
+from src.service.repair_service import RepairService
+
+logger = logging.getLogger(__name__)
+
+# Texts of a typical length, only used to run the models once per batch shape
+WARMUP_TEXTS = [
+    "Replace front brake pads and resurface rotors",
+    "Oil and filter change",
+    "Replacing two rubber mounts (rear) for rear axle carrier",
+    "Diagnose check engine light",
+]
+
+
+class ServiceLoader:
+    """Builds the RepairService in a background thread, so the server can bind and answer health checks meanwhile.
+
+    The service is only handed out once it has been warmed up: a batch of each of the warmup_batch_sizes goes
+    through the pipeline first, so lazy kernel and allocator initialization isn't paid for by real requests.
+    """
+
+    def __init__(
+        self,
+        build_service: Callable[[Dict[str, float]], RepairService],
+        warmup_batch_sizes: List[int],
+    ):
+        # Builds the service, adding the seconds spent in each of its loading phases to the given dict
+        self.build_service = build_service
+        self.warmup_batch_sizes = warmup_batch_sizes
+
+        self.service: Optional[RepairService] = None
+        self.error: Optional[BaseException] = None
+        self.phase_seconds: Dict[str, float] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.service is not None
+
+    def get_service(self) -> Optional[RepairService]:
+        """The service, or None while it is still loading or warming up"""
+        return self.service
+
+    def start(self) -> None:
+        """Starts loading in the background, from the running event loop"""
+        self._task = asyncio.get_running_loop().create_task(self.__load())
+
+    async def close(self) -> None:
+        if self._task is not None and not self._task.done():
+            # The loading thread itself can't be interrupted, it is only not waited for
+            self._task.cancel()
+        if self.service is not None:
+            await self.service.close()
+
+    async def __load(self) -> None:
+        started_at = time.perf_counter()
+        try:
+            service = await asyncio.to_thread(self.__build_and_warm_up)
+        except Exception as e:
+            logger.error("Unable to load the repair service", exc_info=e)
+            self.error = e
+            return
+
+        self.service = service
+        phases = ", ".join(f"{phase} {seconds:.2f}s" for phase, seconds in self.phase_seconds.items())
+        logger.info(f"Service ready after {time.perf_counter() - started_at:.2f}s ({phases})")
+
+    def __build_and_warm_up(self) -> RepairService:
+        service = self.build_service(self.phase_seconds)
+        with timed(self.phase_seconds, "warmup"):
+            # Straight through the models: results must not end up in the caches, cached embeddings would spare
+            # the encoder every batch shape after the first one, and the runs must not count as traffic in /metrics
+            pipeline = service.pipeline
+            embedder = pipeline.embedder
+            if isinstance(embedder, CachedEmbeddingProvider):
+                embedder = embedder.embedder
+            warmup_pipeline = InferencePipeline(
+                pipeline.anomaly_detector, pipeline.classifier, embedder, record_metrics=False
+            )
+            for batch_size in self.warmup_batch_sizes:
+                texts = [WARMUP_TEXTS[i % len(WARMUP_TEXTS)] for i in range(batch_size)]
+                warmup_pipeline.run(texts)
+        return service
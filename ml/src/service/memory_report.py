@@ -0,0 +1,136 @@
+import resource
+import tracemalloc
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from src.embeddings.embedding_cache import CachedEmbeddingProvider
+from src.service.repair_service import RepairService
+
+# Allocations are attributed to the first component one of whose modules is in the allocating file's path
+COMPONENT_MODULES = [
+    ("embedding_cache", ("src/embeddings/embedding_cache",)),
+    ("encoder", ("src/embeddings", "sentence_transformers", "transformers", "tokenizers", "onnxruntime", "optimum")),
+    ("known_embeddings", ("src/similarity", "sklearn")),
+    ("classifier_head", ("src/models", "torch")),
+    ("result_cache", ("src/cache", "redis")),
+    ("numpy", ("numpy",)),
+]
+
+
+def memory_report(service: Optional[RepairService], top: int = 10) -> Dict[str, Any]:
+    """Resident memory of the process, the size of each component of the service, and when tracemalloc is
+    tracing, the top allocating lines of each component"""
+    report: Dict[str, Any] = {
+        "rss_bytes": current_rss(),
+        "peak_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        "components": component_sizes(service) if service is not None else {},
+        "tracemalloc": None,
+    }
+    if tracemalloc.is_tracing():
+        traced, peak = tracemalloc.get_traced_memory()
+        report["tracemalloc"] = {
+            "traced_bytes": traced,
+            "peak_traced_bytes": peak,
+            "top_allocators": top_allocators(tracemalloc.take_snapshot(), top),
+        }
+    return report
+
+
+def current_rss() -> Optional[int]:
+    """Resident set size of the process, only known on Linux"""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * resource.getpagesize()
+    except OSError:
+        return None
+
+
+def component_sizes(service: RepairService) -> Dict[str, Dict[str, Any]]:
+    pipeline = service.pipeline
+    components: Dict[str, Dict[str, Any]] = {}
+
+    embedder = pipeline.embedder
+    if isinstance(embedder, CachedEmbeddingProvider):
+        components["embedding_cache"] = {
+            "entries": len(embedder),
+            "bytes": len(embedder) * embedder.get_dimension() * np.dtype(np.float32).itemsize,
+        }
+        embedder = embedder.embedder
+    # The detector and the classifier share this encoder
+    components["encoder"] = {"parameter_bytes": parameter_bytes(getattr(embedder, "model", None))}
+    components["classifier_head"] = {
+        "parameter_bytes": parameter_bytes(getattr(pipeline.classifier, "model", None))
+    }
+
+    known_embeddings = getattr(pipeline.anomaly_detector, "known_embeddings", None)
+    if known_embeddings is not None:
+        components["known_embeddings"] = {
+            "bytes": known_embeddings.nbytes,
+            # Memory-mapped pages are shared with the other workers, and only resident once read
+            "memory_mapped": isinstance(known_embeddings, np.memmap)
+            or isinstance(getattr(known_embeddings, "base", None), np.memmap),
+        }
+
+    cache = service.cache
+    if cache is not None:
+        # A tiered cache only holds its L1 in process
+        in_process = getattr(cache, "l1", cache)
+        components["result_cache"] = {
+            "type": type(cache).__name__,
+            "entries": len(in_process) if hasattr(in_process, "__len__") else None,
+        }
+    return components
+
+
+def parameter_bytes(model: Any) -> Optional[int]:
+    """Bytes held by the parameters and buffers of a torch module, None for anything else"""
+    if not callable(getattr(model, "parameters", None)) or not callable(getattr(model, "buffers", None)):
+        return None
+    tensors = list(model.parameters()) + list(model.buffers())
+    return sum(tensor.numel() * tensor.element_size() for tensor in tensors)
+
+
+def component_of(filename: str) -> str:
+    path = filename.replace("\\", "/")
+    for component, modules in COMPONENT_MODULES:
+        if any(f"/{module}" in path or path.startswith(module) for module in modules):
+            return component
+    return "other"
+
+
+def top_allocators(snapshot: tracemalloc.Snapshot, top: int) -> Dict[str, List[Dict[str, Any]]]:
+    """The top allocating lines of each component, by size of the memory they still hold"""
+    snapshot = snapshot.filter_traces(
+        [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, "<frozen *>")]
+    )
+    by_component: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for statistic in snapshot.statistics("lineno"):
+        frame = statistic.traceback[0]
+        allocators = by_component[component_of(frame.filename)]
+        if len(allocators) < top:
+            allocators.append(
+                {
+                    "location": f"{frame.filename}:{frame.lineno}",
+                    "bytes": statistic.size,
+                    "count": statistic.count,
+                }
+            )
+    return dict(by_component)
+
+
+def start_tracemalloc(frames: int = 1) -> bool:
+    """Starts tracing the allocations, which slows down every allocation until stopped"""
+    if tracemalloc.is_tracing():
+        return False
+    tracemalloc.start(frames)
+    return True
+
+
+def stop_tracemalloc() -> bool:
+    if not tracemalloc.is_tracing():
+        return False
+    tracemalloc.stop()
+    return True
+
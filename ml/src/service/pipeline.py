@@ -0,0 +1,123 @@
+from contextlib import AbstractContextManager
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.core.interfaces import (
+    AnomalyDetector,
+    Candidate,
+    RepairClassifier,
+    EmbeddingProvider,
+)
+from src.core.metrics import BATCH_SIZE, OUTCOMES, timed_stage
+from src.core.timing import timed
+
+UNKNOWN_LABEL = ("unknown", "unknown")
+
+
+class InferencePipeline:
+    """Synchronous anomaly detection + classification over already sanitized texts"""
+
+    def __init__(
+        self,
+        anomaly_detector: AnomalyDetector,
+        classifier: RepairClassifier,
+        embedder: Optional[EmbeddingProvider] = None,
+        record_metrics: bool = True,
+    ):
+        self.anomaly_detector = anomaly_detector
+        self.classifier = classifier
+        # When set, texts are encoded once and shared by the detector and the classifier
+        self.embedder = embedder
+        # Off for runs which aren't traffic, e.g. the warmup, so they stay out of /metrics
+        self.record_metrics = record_metrics
+
+    def run(
+        self, texts: List[str], timings: Optional[Dict[str, float]] = None
+    ) -> List[Tuple[str, str]]:
+        """Returns a (section, name) tuple for each text, anomalies being marked as 'unknown'.
+        When a timings dict is given, the seconds spent in each stage are added to it"""
+        results: List[Tuple[str, str]] = [UNKNOWN_LABEL] * len(texts)
+        normal_positions, normal_embeddings = self.__detect(texts, timings)
+        if not normal_positions:
+            return results
+
+        with self.__stage("classifier", timings):
+            predictions = self.classifier.predict(
+                [texts[i] for i in normal_positions], embeddings=normal_embeddings
+            )
+        if isinstance(predictions[0], str):
+            # single tuple returned if the batch has only one element
+            predictions = [predictions]
+        for i, (section, name) in zip(normal_positions, predictions):
+            results[i] = (section, name)
+
+        self.__count_outcomes([results[i] for i in normal_positions])
+        return results
+
+    def run_top_k(
+        self, texts: List[str], k: int, timings: Optional[Dict[str, float]] = None
+    ) -> List[Tuple[Tuple[str, str], List[Candidate]]]:
+        """Returns the (section, name) tuple of each text along with its k most probable candidates.
+        Anomalies are marked as 'unknown' and get no candidates"""
+        results: List[Tuple[Tuple[str, str], List[Candidate]]] = [
+            (UNKNOWN_LABEL, [])
+        ] * len(texts)
+        normal_positions, normal_embeddings = self.__detect(texts, timings)
+        if not normal_positions:
+            return results
+
+        with self.__stage("classifier", timings):
+            predictions = self.classifier.predict_top_k(
+                [texts[i] for i in normal_positions], k, embeddings=normal_embeddings
+            )
+        for i, prediction in zip(normal_positions, predictions):
+            results[i] = prediction
+
+        self.__count_outcomes([results[i][0] for i in normal_positions])
+        return results
+
+    def __detect(
+        self, texts: List[str], timings: Optional[Dict[str, float]]
+    ) -> Tuple[List[int], Optional[np.ndarray]]:
+        """Runs the anomaly detection, returning the positions of the normal texts and their embeddings"""
+        if not texts:
+            return [], None
+
+        if self.record_metrics:
+            BATCH_SIZE.observe(len(texts))
+        with self.__stage("embedding", timings):
+            embeddings = self.__encode(texts)
+        with self.__stage("similarity", timings):
+            anomalies = self.anomaly_detector.is_anomaly(texts, embeddings=embeddings)
+        if isinstance(anomalies, bool):
+            anomalies = [anomalies] * len(texts)
+
+        normal_positions = [i for i, is_anomaly in enumerate(anomalies) if not is_anomaly]
+        if len(normal_positions) < len(texts) and self.record_metrics:
+            OUTCOMES.inc(len(texts) - len(normal_positions), outcome="anomaly")
+        if embeddings is None or not normal_positions:
+            return normal_positions, None
+        return normal_positions, embeddings[normal_positions]
+
+    def __stage(self, stage: str, timings: Optional[Dict[str, float]]) -> AbstractContextManager:
+        """Times a stage into timings, and into the stage histogram when recording metrics"""
+        if self.record_metrics:
+            return timed_stage(stage, timings)
+        return timed(timings, stage)
+
+    def __count_outcomes(self, labels: List[Tuple[str, str]]) -> None:
+        """Counts the texts which made it past the anomaly detection, by whether the classifier was confident"""
+        if not self.record_metrics:
+            return
+        unknown = sum(1 for label in labels if tuple(label) == UNKNOWN_LABEL)
+        if unknown:
+            OUTCOMES.inc(unknown, outcome="unknown")
+        if len(labels) > unknown:
+            OUTCOMES.inc(len(labels) - unknown, outcome="classified")
+
+    def __encode(self, texts: List[str]) -> Optional[np.ndarray]:
+        """Encodes the texts with the shared embedder, if there is one"""
+        if self.embedder is None:
+            return None
+        return self.embedder.encode(texts)
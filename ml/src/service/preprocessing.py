@@ -0,0 +1,30 @@
+import re
+import unicodedata
+from typing import Optional
+
+from src.core.config import PreprocessingConfig
+
+UNWANTED_CHARS_PATTERN = re.compile(r"[<>&?:\\[\]]")
+WHITESPACE_PATTERN = re.compile(r"\s+")
+MAX_CHARACTERS_LIMIT = 256
+
+
+def sanitize_text(text: str) -> str:
+    """Sanitize the text by removing unwanted characters and trailing whitespace"""
+    sanitized_text = UNWANTED_CHARS_PATTERN.sub("", text)
+    return sanitized_text.strip()[:MAX_CHARACTERS_LIMIT]
+
+
+def canonicalize_text(text: str, config: Optional[PreprocessingConfig] = None) -> str:
+    """Sanitize the text, then bring it to its canonical form, so that texts only differing by their Unicode forms,
+    spacing or case are classified and cached as one"""
+    config = config or PreprocessingConfig()
+    if config.unicode_form is not None:
+        # Before sanitizing, since e.g. NFKC turns full-width brackets into the unwanted ASCII ones
+        text = unicodedata.normalize(config.unicode_form, text)
+    text = sanitize_text(text)
+    if config.collapse_whitespace:
+        text = WHITESPACE_PATTERN.sub(" ", text)
+    if config.casefold:
+        text = text.casefold()
+    return text
@@ -0,0 +1,98 @@
+import cProfile
+import logging
+import pstats
+import random
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class RequestProfile:
+    """Profile of a single request"""
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex[:16]
+        self.profile = cProfile.Profile()
+
+
+# Profile of the request being served, if it is profiled
+current_profile: ContextVar[Optional[RequestProfile]] = ContextVar("current_profile", default=None)
+
+
+class RequestProfiler:
+    """Captures cProfile traces of sampled or explicitly requested requests, kept as .prof files for download.
+
+    A single request is profiled at a time, so the overhead stays bounded. The profiler sees every thread of the
+    process (Python 3.12+), so the trace covers the request's inference on the inference thread, which it runs on
+    its own instead of in a micro-batch, but also the work of the requests served concurrently.
+    """
+
+    def __init__(self, directory: Optional[Path] = None, max_profiles: int = 20, sample_rate: float = 0.0):
+        self.directory = Path(directory or Path(tempfile.gettempdir()) / "repair_profiles")
+        self.max_profiles = max_profiles
+        self.sample_rate = sample_rate
+
+        # Profile id -> metadata, oldest first
+        self.profiles: OrderedDict[str, Dict[str, Any]] = OrderedDict()
+        self._active = threading.Lock()
+
+    def should_profile(self, requested: bool) -> bool:
+        return requested or (self.sample_rate > 0 and random.random() < self.sample_rate)
+
+    @contextmanager
+    def profiling(self, path: str) -> Iterator[Optional[RequestProfile]]:
+        """Profiles the block as the current request, yielding None when another request is being profiled"""
+        if not self._active.acquire(blocking=False):
+            yield None
+            return
+
+        request_profile = RequestProfile()
+        try:
+            request_profile.profile.enable()
+        except ValueError:
+            # Another profiler is active in the process, e.g. a debugger's
+            self._active.release()
+            yield None
+            return
+
+        token = current_profile.set(request_profile)
+        started_at = time.time()
+        start = time.perf_counter()
+        try:
+            yield request_profile
+        finally:
+            request_profile.profile.disable()
+            current_profile.reset(token)
+            try:
+                self.__save(request_profile, path, started_at, time.perf_counter() - start)
+            finally:
+                self._active.release()
+
+    def get_path(self, profile_id: str) -> Optional[Path]:
+        profile = self.profiles.get(profile_id)
+        return Path(profile["file"]) if profile is not None else None
+
+    def __save(self, request_profile: RequestProfile, path: str, started_at: float, seconds: float) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        profile_path = self.directory / f"{request_profile.id}.prof"
+        pstats.Stats(request_profile.profile).dump_stats(profile_path)
+        self.profiles[request_profile.id] = {
+            "id": request_profile.id,
+            "path": path,
+            "started_at": started_at,
+            "seconds": round(seconds, 6),
+            "file": str(profile_path),
+        }
+        logger.info(f"Saved the profile of a {path} request to {profile_path}")
+
+        while len(self.profiles) > self.max_profiles:
+            _, oldest = self.profiles.popitem(last=False)
+            Path(oldest["file"]).unlink(missing_ok=True)
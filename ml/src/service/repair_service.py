@@ -1,9 +1,26 @@
 import logging
-import re
-from typing import Optional, List
+from functools import partial
+from typing import Any, AsyncIterator, Callable, Dict, Optional, List, Tuple
 
-from src.api.models import RepairResponse, RepairBatchResponse
-from src.core.interfaces import CacheRegister, AnomalyDetector, RepairClassifier
+from src.api.models import RepairCandidate, RepairResponse, RepairBatchResponse
+from src.core.config import BatchingConfig, PreprocessingConfig, StreamingConfig
+from src.core.metrics import CACHE_LOOKUPS, request_timings, timed_stage
+from src.core.interfaces import (
+    CacheRegister,
+    CachedLabel,
+    AnomalyDetector,
+    RepairClassifier,
+    EmbeddingProvider,
+)
+from src.models.label_table import LabelTable
+from src.service.pipeline import InferencePipeline
+from src.service.preprocessing import canonicalize_text
+from src.service.profiling import current_profile
+from src.service.scheduler import (
+    DeadlineExceededError,
+    MicroBatchScheduler,
+    QueueFullError,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -14,43 +31,100 @@ class RepairService:
         cache: Optional[CacheRegister],
         anomaly_detector: AnomalyDetector,
         classifier: RepairClassifier,
+        embedder: Optional[EmbeddingProvider] = None,
+        batching: Optional[BatchingConfig] = None,
+        streaming: Optional[StreamingConfig] = None,
+        preprocessing: Optional[PreprocessingConfig] = None,
+        label_table: Optional[LabelTable] = None,
     ):
         self.cache = cache
-        self.anomaly_detector = anomaly_detector
-        self.classifier = classifier
+        # The cache only holds label ids, which this table maps back to labels
+        if cache is not None and label_table is None:
+            raise ValueError("Caching results needs the label table of the classifier")
+        self.label_table = label_table
+        self.preprocessing = preprocessing or PreprocessingConfig()
+        streaming = streaming or StreamingConfig()
+        self.stream_chunk_size = streaming.chunk_size
+        self.stream_max_line_bytes = streaming.max_line_bytes
+        self.pipeline = InferencePipeline(anomaly_detector, classifier, embedder)
 
-    async def classify_repair(self, text: str) -> RepairResponse:
+        # Inference always runs on the scheduler's dedicated thread, so the queue bound and the deadlines hold
+        # whether or not batching is enabled. With it, concurrent single requests also get coalesced into
+        # batches, each of them getting its label along with the stage timings of the whole batch
+        batching = batching or BatchingConfig()
+        self.micro_batching = batching.enabled
+        self.scheduler: MicroBatchScheduler[str, Tuple[Tuple[str, str], Dict[str, float]]] = (
+            MicroBatchScheduler(
+                self.__run_timed,
+                batching.max_batch_size,
+                batching.max_wait_ms,
+                batching.max_queue_size,
+            )
+        )
+
+    async def classify_repair(
+        self, text: str, top_k: Optional[int] = None, deadline: Optional[float] = None
+    ) -> RepairResponse:
         """Classifiers the received piece of repair text into a section and a name.
-        If the text is an anomaly, both will be marked as 'unknown'"""
+        If the text is an anomaly, both will be marked as 'unknown'.
+        When top_k is given, the top_k most probable candidates are returned as well.
+        The text is dropped if its time.monotonic() deadline passes while it is queued"""
         logger.info(
             f"Requesting classify_repair with 1 pieces of text of length {len(text)}"
         )
 
-        sanitized_text = self.__sanitize_text(text)
+        timings = request_timings.get()
+        with timed_stage("sanitize", timings):
+            sanitized_text = canonicalize_text(text, self.preprocessing)
         try:
             cache_key = sanitized_text
-            # Check if the item is in cache
-            if self.cache:
-                cached = await self.cache.get(cache_key)
+            # Check if the item is in cache, which only holds the labels, not the candidates
+            if self.cache and top_k is None:
+                with timed_stage("cache_lookup", timings):
+                    cached = self.__cached_response(await self.cache.get(cache_key))
+                self.__count_cache_lookups(hits=1 if cached else 0, total=1)
                 if cached:
-                    return RepairResponse(**cached)
+                    return cached
 
             # Anomaly detection, followed by actual model prediction
-            if self.anomaly_detector.is_anomaly(sanitized_text):
-                result = RepairResponse(section="unknown", name="unknown")
+            if top_k is not None:
+                result = (
+                    await self.__predict_top_k([sanitized_text], top_k, deadline, timings)
+                )[0]
             else:
-                section, name = self.classifier.predict(sanitized_text)
-                result = RepairResponse(section=section, name=name)
+                # A profiled request runs on its own, so its trace only holds its own inference
+                if self.micro_batching and current_profile.get() is None:
+                    (section, name), batch_timings = await self.scheduler.submit(
+                        sanitized_text, deadline, timings
+                    )
+                    if timings is not None:
+                        timings.update(batch_timings)
+                else:
+                    section, name = (
+                        await self.__run_pipeline(
+                            partial(self.pipeline.run, timings=timings),
+                            [sanitized_text],
+                            deadline,
+                            timings,
+                        )
+                    )[0]
+                result = RepairResponse.model_construct(section=section, name=name)
 
             # Save the item in cache at the end
             if self.cache:
-                await self.cache.set(cache_key, result.model_dump())
+                cache_value = self.__cache_value(result)
+                if cache_value is not None:
+                    with timed_stage("cache_write", timings):
+                        await self.cache.set(cache_key, cache_value)
 
             logger.info(
                 f"Done classify_repair with 1 pieces of text of length {len(sanitized_text)}"
             )
             return result
 
+        except (QueueFullError, DeadlineExceededError):
+            # Expected under overload, and answered as such
+            raise
         except Exception as e:
             logger.error(
                 f"Unable to classify_repair on piece of text of length {len(sanitized_text)}",
@@ -58,72 +132,94 @@ class RepairService:
             )
             raise
 
-    async def classify_batch_repair(self, texts: List[str]) -> RepairBatchResponse:
+    async def classify_batch_repair(
+        self,
+        texts: List[str],
+        top_k: Optional[int] = None,
+        deadline: Optional[float] = None,
+    ) -> RepairBatchResponse:
         """Classifiers each of the received pieces of repair text into a section and a name.
-        If the text is an anomaly, both will be marked as 'unknown'"""
+        If the text is an anomaly, both will be marked as 'unknown'.
+        When top_k is given, the top_k most probable candidates are returned as well.
+        The batch is dropped if its time.monotonic() deadline passes while it is queued"""
         logger.info(
             f"Requesting classify_batch_repair with {len(texts)} pieces of text"
         )
 
+        timings = request_timings.get()
         try:
             results: RepairBatchResponse = [None] * len(texts)
             to_predict: List[str] = []
-            predict_indices: List[int] = []
 
-            # Check if some of the items are in cache
-            if self.cache:
+            # Texts sharing a canonical form are looked up and classified once, their result going to each of
+            # their positions
+            with timed_stage("sanitize", timings):
+                positions: Dict[str, List[int]] = {}
                 for i, text in enumerate(texts):
-                    sanitized_text = self.__sanitize_text(text)
-                    cache_key = sanitized_text
-                    cached = await self.cache.get(cache_key)
-                    if cached:
-                        results[i] = RepairResponse(**cached)
-                    else:
-                        to_predict.append(sanitized_text)
-                        predict_indices.append(i)
+                    positions.setdefault(
+                        canonicalize_text(text, self.preprocessing), []
+                    ).append(i)
+            distinct_texts = list(positions)
+
+            # Check if some of the items are in cache, with a single bulk lookup
+            if self.cache and top_k is None:
+                with timed_stage("cache_lookup", timings):
+                    cached_values = [
+                        self.__cached_response(cached)
+                        for cached in await self.cache.get_many(distinct_texts)
+                    ]
+                self.__count_cache_lookups(
+                    hits=sum(1 for cached in cached_values if cached),
+                    total=len(distinct_texts),
+                )
             else:
-                to_predict = texts
-                predict_indices = list(range(len(texts)))
+                cached_values = [None] * len(distinct_texts)
+
+            for sanitized_text, cached in zip(distinct_texts, cached_values):
+                if cached:
+                    for i in positions[sanitized_text]:
+                        results[i] = cached
+                else:
+                    to_predict.append(sanitized_text)
 
-            # Anomaly detection
+            # Anomaly detection, followed by actual model prediction
             if to_predict:
-                anomalies = self.anomaly_detector.is_anomaly(to_predict)
-                if isinstance(anomalies, bool):
-                    anomalies = [anomalies] * len(to_predict)
-
-                normal_texts: List[str] = []
-                normal_indices: List[int] = []
-
-                for idx, (text, is_anomaly) in enumerate(zip(to_predict, anomalies)):
-                    sanitized_text = self.__sanitize_text(text)
-                    if is_anomaly:
-                        resp = RepairResponse(section="unknown", name="unknown")
-                        results[predict_indices[idx]] = resp
-                        if self.cache:
-                            await self.cache.set(f"{sanitized_text}", resp.model_dump())
-                    else:
-                        normal_texts.append(sanitized_text)
-                        normal_indices.append(predict_indices[idx])
-
-                # Model prediction
-                if normal_texts:
-                    predictions = self.classifier.predict(normal_texts)
-                    if isinstance(predictions[0], str):
-                        # single tuple returned if the batch has only one element
-                        predictions = [predictions]
-                    for idx, (section, name) in zip(normal_indices, predictions):
-                        resp = RepairResponse(section=section, name=name)
-                        results[idx] = resp
-
-                        # Save the items in cache at the end
-                        if self.cache:
-                            await self.cache.set(
-                                f"{normal_texts.pop(0)}", resp.model_dump()
-                            )
+                if top_k is not None:
+                    predictions = await self.__predict_top_k(
+                        to_predict, top_k, deadline, timings
+                    )
+                else:
+                    labels = await self.__run_pipeline(
+                        partial(self.pipeline.run, timings=timings),
+                        to_predict,
+                        deadline,
+                        timings,
+                    )
+                    predictions = [
+                        RepairResponse.model_construct(section=section, name=name)
+                        for section, name in labels
+                    ]
+
+                for sanitized_text, resp in zip(to_predict, predictions):
+                    for i in positions[sanitized_text]:
+                        results[i] = resp
+
+                # Save the items in cache at the end, with a single bulk write
+                if self.cache:
+                    to_cache: Dict[str, CachedLabel] = {}
+                    for sanitized_text, resp in zip(to_predict, predictions):
+                        cache_value = self.__cache_value(resp)
+                        if cache_value is not None:
+                            to_cache[sanitized_text] = cache_value
+                    with timed_stage("cache_write", timings):
+                        await self.cache.set_many(to_cache)
 
             logger.info(f"Done classify_batch_repair with {len(texts)} pieces of text")
             return results
 
+        except (QueueFullError, DeadlineExceededError):
+            # Expected under overload, and answered as such
+            raise
         except Exception as e:
             logger.error(
                 f"Unable to classify_batch_repair on batch with {len(texts)} pieces of text",
@@ -131,12 +227,100 @@ class RepairService:
             )
             raise
 
-    @staticmethod
-    def __sanitize_text(text: str) -> str:
-        """Sanitize the text by removing unwanted characters and trailing whitespace"""
-        unwanted_chars_pattern = r"[<>&?:\\[\]]"
-        max_characters_limit = 256
-        sanitized_text = re.sub(unwanted_chars_pattern, "", text)
-        sanitized_text = sanitized_text.strip()[:max_characters_limit]
+    async def classify_stream(
+        self, texts: AsyncIterator[str]
+    ) -> AsyncIterator[Tuple[int, RepairBatchResponse]]:
+        """Classifies a stream of repair texts in fixed-size chunks, yielding the results of each chunk along
+        with the index of its first text. Only one chunk is held at a time, and the next texts are only
+        pulled from the stream once the current chunk is done"""
+        start = 0
+        chunk: List[str] = []
+        async for text in texts:
+            chunk.append(text)
+            if len(chunk) >= self.stream_chunk_size:
+                yield start, await self.classify_batch_repair(chunk)
+                start += len(chunk)
+                chunk = []
+
+        if chunk:
+            yield start, await self.classify_batch_repair(chunk)
+
+    async def __predict_top_k(
+        self,
+        texts: List[str],
+        k: int,
+        deadline: Optional[float] = None,
+        timings: Optional[Dict[str, float]] = None,
+    ) -> List[RepairResponse]:
+        """Runs the pipeline with top-k candidates"""
+        predictions = await self.__run_pipeline(
+            partial(self.pipeline.run_top_k, k=k, timings=timings),
+            texts,
+            deadline,
+            timings,
+        )
+
+        return [
+            RepairResponse(
+                section=section,
+                name=name,
+                candidates=[
+                    RepairCandidate(section=c_section, name=c_name, probability=prob)
+                    for c_section, c_name, prob in candidates
+                ],
+            )
+            for (section, name), candidates in predictions
+        ]
+
+    async def __run_pipeline(
+        self,
+        pipeline_fn: Callable[[List[str]], List[Any]],
+        texts: List[str],
+        deadline: Optional[float] = None,
+        timings: Optional[Dict[str, float]] = None,
+    ) -> List[Any]:
+        """Runs an already formed batch through a pipeline function on the inference thread"""
+        return await self.scheduler.run_batch(texts, pipeline_fn, deadline, timings)
+
+    def __run_timed(
+        self, texts: List[str]
+    ) -> List[Tuple[Tuple[str, str], Dict[str, float]]]:
+        """Runs the pipeline on a micro-batch, pairing each label with the stage timings of the batch"""
+        timings: Dict[str, float] = {}
+        return [(label, timings) for label in self.pipeline.run(texts, timings)]
+
+    def __count_cache_lookups(self, hits: int, total: int) -> None:
+        backend = type(self.cache).__name__
+        if hits:
+            CACHE_LOOKUPS.inc(hits, backend=backend, result="hit")
+        if total > hits:
+            CACHE_LOOKUPS.inc(total - hits, backend=backend, result="miss")
+
+    def __cache_value(self, result: RepairResponse) -> Optional[CachedLabel]:
+        """Only the label id is cached, along with its probability when known, the candidates depend on the
+        requested top_k. None for a label out of the label table, which isn't cached"""
+        label_id = self.label_table.label_id(result.section, result.name)
+        if label_id is None:
+            return None
+        confidence = None
+        if result.candidates and (result.candidates[0].section, result.candidates[0].name) == (
+            result.section,
+            result.name,
+        ):
+            confidence = result.candidates[0].probability
+        return CachedLabel(label_id, confidence)
+
+    def __cached_response(self, cached: Optional[CachedLabel]) -> Optional[RepairResponse]:
+        """The response of a cached label, None on a miss or for an id out of the label table"""
+        if cached is None:
+            return None
+        label = self.label_table.label(cached.label_id)
+        if label is None:
+            return None
+        return RepairResponse.model_construct(section=label[0], name=label[1])
 
-        return sanitized_text
+    async def close(self) -> None:
+        """Releases the resources held by the service"""
+        await self.scheduler.close()
+        if self.cache:
+            await self.cache.close()
@@ -0,0 +1,274 @@
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Generic,
+    List,
+    NamedTuple,
+    Optional,
+    TypeVar,
+)
+
+from src.core.metrics import INFERENCE_QUEUE_DEPTH, REJECTED_REQUESTS, STAGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class QueueFullError(RuntimeError):
+    """Raised when the inference queue has no room left for the submitted items"""
+
+
+class DeadlineExceededError(TimeoutError):
+    """Raised when the deadline of queued items passed before their inference started"""
+
+
+class _Queued(NamedTuple):
+    item: Any
+    future: asyncio.Future
+    queued_at: float
+    # time.monotonic() deadline, if any
+    deadline: Optional[float]
+    # Where the seconds spent waiting for the inference thread are added, if given
+    timings: Optional[Dict[str, float]]
+
+
+class MicroBatchScheduler(Generic[T, R]):
+    """Coalesces concurrent single-item requests into batches which are run on a dedicated inference thread.
+
+    A batch is dispatched once it reaches max_batch_size items, or max_wait_ms after its first item arrived.
+    At most max_queue_size items wait for the inference thread at any time, singles and whole batches alike,
+    and items are refused with a QueueFullError beyond that. Items whose deadline passed before their inference
+    started are dropped with a DeadlineExceededError.
+    """
+
+    def __init__(
+        self,
+        batch_fn: Callable[[List[T]], List[R]],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+        max_queue_size: Optional[int] = None,
+    ):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait_seconds = max_wait_ms / 1000
+        self.max_queue_size = max_queue_size
+
+        # A single thread, so the models only ever see one batch at a time and the event loop stays free
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="inference"
+        )
+        self._queue: Optional[asyncio.Queue[_Queued]] = None
+        self._worker: Optional[asyncio.Task] = None
+        # Batch being formed or dispatched, whose callers close() has to fail along with the queued ones
+        self._batch: List[_Queued] = []
+        self._closed = False
+        # Items admitted whose inference didn't start yet, updated from the inference thread too
+        self._waiting = 0
+        self._waiting_lock = threading.Lock()
+
+    @property
+    def waiting(self) -> int:
+        """Number of items waiting for the inference thread"""
+        return self._waiting
+
+    async def submit(
+        self,
+        item: T,
+        deadline: Optional[float] = None,
+        timings: Optional[Dict[str, float]] = None,
+    ) -> R:
+        """Queues a single item and waits for its result from the batch it ends up in."""
+        self.__ensure_open()
+        self.__admit(1)
+        self.__ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait(_Queued(item, future, time.monotonic(), deadline, timings))
+        return await future
+
+    async def run_batch(
+        self,
+        items: List[T],
+        batch_fn: Optional[Callable[[List[T]], List[Any]]] = None,
+        deadline: Optional[float] = None,
+        timings: Optional[Dict[str, float]] = None,
+    ) -> List[Any]:
+        """Runs an already formed batch on the inference thread, without waiting for other requests.
+        A different batch function than the scheduler's one can be given, e.g. for a request variant."""
+        self.__ensure_open()
+        if not items:
+            return []
+        self.__admit(len(items))
+        queued_at = time.monotonic()
+        # Set once the batch left the queue, by starting or by being given up
+        released = threading.Event()
+
+        def run() -> List[Any]:
+            self.__release(len(items), released)
+            started_at = time.monotonic()
+            self.__record_wait(queued_at, started_at, timings)
+            if deadline is not None and started_at > deadline:
+                REJECTED_REQUESTS.inc(reason="deadline")
+                raise DeadlineExceededError("The deadline passed while the batch was queued")
+            return (batch_fn or self.batch_fn)(items)
+
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._executor, run)
+        finally:
+            # The batch never started when the caller gave up or the scheduler was closed meanwhile
+            self.__release(len(items), released)
+
+    async def close(self) -> None:
+        """Stops collecting batches and releases the inference thread.
+        Callers still waiting for a result get a RuntimeError, and new items are refused."""
+        self._closed = True
+        pending = [queued.future for queued in self._batch]
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+        while self._queue is not None and not self._queue.empty():
+            pending.append(self._queue.get_nowait().future)
+        for future in pending:
+            if not future.done():
+                future.set_exception(RuntimeError("The scheduler was closed"))
+        self._batch = []
+
+    def __ensure_open(self) -> None:
+        if self._closed:
+            raise RuntimeError("The scheduler is closed")
+
+    def __admit(self, count: int) -> None:
+        """Reserves room for count items, a batch larger than the whole queue being let in when nothing waits"""
+        with self._waiting_lock:
+            if (
+                self.max_queue_size is not None
+                and self._waiting > 0
+                and self._waiting + count > self.max_queue_size
+            ):
+                REJECTED_REQUESTS.inc(reason="queue_full")
+                raise QueueFullError(
+                    f"{self._waiting} items are already waiting for inference"
+                )
+            self._waiting += count
+            INFERENCE_QUEUE_DEPTH.inc(count)
+
+    def __release(self, count: int, released: Optional[threading.Event] = None) -> None:
+        """Frees the room of count items, once per released event when given"""
+        with self._waiting_lock:
+            if released is not None:
+                if released.is_set():
+                    return
+                released.set()
+            self._waiting -= count
+            INFERENCE_QUEUE_DEPTH.dec(count)
+
+    @staticmethod
+    def __record_wait(
+        queued_at: float, started_at: float, timings: Optional[Dict[str, float]]
+    ) -> None:
+        """Records the seconds spent waiting for the inference thread, apart from the inference itself"""
+        wait = started_at - queued_at
+        STAGE_SECONDS.observe(wait, stage="queue_wait")
+        if timings is not None:
+            timings["queue_wait"] = timings.get("queue_wait", 0.0) + wait
+
+    def __ensure_started(self) -> None:
+        """Lazily starts the batch collector, since it needs to live on the running event loop"""
+        if self._worker is None or self._worker.done():
+            # Admission already keeps it within max_queue_size, the bound only backs it up
+            self._queue = asyncio.Queue(maxsize=self.max_queue_size or 0)
+            self._worker = asyncio.get_running_loop().create_task(self.__collect())
+
+    async def __collect(self) -> None:
+        """Forms batches out of the queued items and dispatches them, forever"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = self._batch = [await self._queue.get()]
+            dispatch_at = loop.time() + self.max_wait_seconds
+
+            while len(batch) < self.max_batch_size:
+                # Items which queued up while the previous batch was running are taken right away
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                remaining = dispatch_at - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            await self.__dispatch(batch)
+            self._batch = []
+
+    async def __dispatch(self, batch: List[_Queued]) -> None:
+        """Runs one batch and resolves the future of each of its callers"""
+        # Callers which gave up in the meantime don't need a result anymore
+        live: List[_Queued] = []
+        for queued in batch:
+            if queued.future.done():
+                self.__release(1)
+            else:
+                live.append(queued)
+        if not live:
+            return
+
+        logger.debug(f"Dispatching micro-batch of {len(live)} items")
+        loop = asyncio.get_running_loop()
+        released = threading.Event()
+        try:
+            results: List[Any] = await loop.run_in_executor(
+                self._executor, self.__run_queued, live, released
+            )
+        except Exception as e:
+            for queued in live:
+                if not queued.future.done():
+                    queued.future.set_exception(e)
+            return
+        finally:
+            self.__release(len(live), released)
+
+        for queued, result in zip(live, results):
+            if queued.future.done():
+                continue
+            if isinstance(result, DeadlineExceededError):
+                queued.future.set_exception(result)
+            else:
+                queued.future.set_result(result)
+
+    def __run_queued(self, batch: List[_Queued], released: threading.Event) -> List[Any]:
+        """Runs on the inference thread: records how long each item waited, then runs the batch without the
+        items past their deadline, which get a DeadlineExceededError as result instead"""
+        started_at = time.monotonic()
+        self.__release(len(batch), released)
+
+        results: List[Any] = [None] * len(batch)
+        live_positions: List[int] = []
+        for i, queued in enumerate(batch):
+            self.__record_wait(queued.queued_at, started_at, queued.timings)
+            if queued.deadline is not None and started_at > queued.deadline:
+                REJECTED_REQUESTS.inc(reason="deadline")
+                results[i] = DeadlineExceededError("The deadline passed while the item was queued")
+            else:
+                live_positions.append(i)
+
+        if live_positions:
+            live_results = self.batch_fn([batch[i].item for i in live_positions])
+            for i, result in zip(live_positions, live_results):
+                results[i] = result
+        return results
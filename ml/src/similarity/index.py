@@ -0,0 +1,150 @@
+import logging
+from typing import Tuple, override
+
+import numpy as np
+from sklearn.cluster import MiniBatchKMeans
+
+from src.core.config import SimilarityIndexConfig
+from src.core.interfaces import SimilarityIndex
+from src.similarity.kernel import (
+    Metric,
+    Top1SimilarityKernel,
+    prepare_embeddings,
+    rank_scores,
+    top1_block,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class FlatIndex(SimilarityIndex):
+    """Exact brute-force search, done over memory-bounded chunks of queries by the top-1 kernel"""
+
+    def __init__(
+        self, metric: Metric, chunk_size: int = 1024, max_block_bytes: int = 64 * 2**20
+    ):
+        self.metric = metric
+        self.chunk_size = chunk_size
+        self.max_block_bytes = max_block_bytes
+        self.kernel = None
+
+    @override
+    def build(self, embeddings: np.ndarray) -> None:
+        self.kernel = Top1SimilarityKernel(
+            embeddings, self.metric, self.chunk_size, self.max_block_bytes
+        )
+
+    @override
+    def search(self, queries: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        return self.kernel.search(queries)
+
+
+class IVFIndex(SimilarityIndex):
+    """Approximate search with an inverted file index.
+
+    The known embeddings are clustered with k-means and each query is only compared to the members of its
+    n_probe closest clusters. Raising n_probe towards n_lists trades latency for recall, n_probe == n_lists
+    being an exact search.
+    """
+
+    def __init__(
+        self,
+        metric: Metric,
+        n_lists: int = 256,
+        n_probe: int = 8,
+        chunk_size: int = 1024,
+        random_state: int = 0,
+    ):
+        self.metric = metric
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.chunk_size = chunk_size
+        self.random_state = random_state
+
+    @override
+    def build(self, embeddings: np.ndarray) -> None:
+        known, known_sq_norms = prepare_embeddings(embeddings, self.metric)
+        n_lists = max(1, min(self.n_lists, len(known)))
+
+        # Spherical k-means for cosine (the rows are normalized), plain k-means for euclidean
+        kmeans = MiniBatchKMeans(
+            n_clusters=n_lists, random_state=self.random_state, n_init=3
+        ).fit(known)
+        self.centroids, self.centroid_sq_norms = prepare_embeddings(
+            kmeans.cluster_centers_, self.metric
+        )
+        assignments = kmeans.labels_
+
+        # Members of each list are stored contiguously, list i spanning offsets[i]:offsets[i + 1]
+        self.list_members = np.argsort(assignments, kind="stable")
+        self.list_offsets = np.searchsorted(
+            assignments[self.list_members], np.arange(n_lists + 1)
+        )
+        self.sorted_known = np.ascontiguousarray(known[self.list_members])
+        self.sorted_sq_norms = (
+            known_sq_norms[self.list_members] if known_sq_norms is not None else None
+        )
+        logger.info(
+            f"Built IVF index over {len(known)} embeddings with {n_lists} lists"
+        )
+
+    @override
+    def search(self, queries: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        queries, query_sq_norms = prepare_embeddings(queries, self.metric)
+        best_scores = np.full(len(queries), -np.inf, dtype=np.float32)
+        best_indices = np.zeros(len(queries), dtype=np.int64)
+
+        for start in range(0, len(queries), self.chunk_size):
+            chunk = slice(start, start + self.chunk_size)
+            self.__search_chunk(
+                queries[chunk],
+                query_sq_norms[chunk] if query_sq_norms is not None else None,
+                best_scores[chunk],
+                best_indices[chunk],
+            )
+
+        return best_scores, best_indices
+
+    def __search_chunk(
+        self,
+        queries: np.ndarray,
+        query_sq_norms: np.ndarray,
+        best_scores: np.ndarray,
+        best_indices: np.ndarray,
+    ) -> None:
+        """Searches a chunk of queries, writing the results into the given output views"""
+        n_probe = min(self.n_probe, len(self.centroids))
+        centroid_scores = rank_scores(
+            queries, self.centroids, self.centroid_sq_norms, self.metric
+        )
+        probed = np.argpartition(-centroid_scores, n_probe - 1, axis=1)[:, :n_probe]
+
+        # Visit each probed list once, comparing it with all the queries which probe it
+        for list_id in np.unique(probed):
+            query_rows = np.flatnonzero((probed == list_id).any(axis=1))
+            start, end = self.list_offsets[list_id], self.list_offsets[list_id + 1]
+            if start == end:
+                continue
+
+            list_scores, list_best = top1_block(
+                queries[query_rows],
+                query_sq_norms[query_rows] if query_sq_norms is not None else None,
+                self.sorted_known[start:end],
+                self.sorted_sq_norms[start:end] if self.sorted_sq_norms is not None else None,
+                self.metric,
+            )
+
+            improved = list_scores > best_scores[query_rows]
+            best_scores[query_rows[improved]] = list_scores[improved]
+            best_indices[query_rows[improved]] = self.list_members[
+                start + list_best[improved]
+            ]
+
+
+def create_similarity_index(
+    metric: Metric, config: SimilarityIndexConfig
+) -> SimilarityIndex:
+    """Creates the configured similarity index"""
+    if config.type == "ivf":
+        return IVFIndex(metric, config.n_lists, config.n_probe, config.chunk_size)
+    return FlatIndex(metric, config.chunk_size, int(config.max_block_mb * 2**20))
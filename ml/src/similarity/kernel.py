@@ -0,0 +1,114 @@
+from typing import Literal, Optional, Tuple
+
+import numpy as np
+
+Metric = Literal["cosine", "euclidean"]
+
+# Norms within this tolerance of 1 are considered already normalized, e.g. MiniLM outputs
+UNIT_NORM_TOLERANCE = 1e-3
+
+
+def prepare_embeddings(
+    embeddings: np.ndarray, metric: Metric
+) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """Turns embeddings into the float32 layout used by the kernel.
+
+    For cosine, rows are L2-normalized, without any copy when the input already is float32 and unit-norm, so
+    memory-mapped embeddings stay shared. For euclidean, the squared norms of the rows are returned as well.
+    """
+    if metric not in ("cosine", "euclidean"):
+        raise ValueError(f"Unsupported metric: {metric}")
+
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    if embeddings.ndim == 1:
+        embeddings = embeddings[None, :]
+
+    if metric == "euclidean":
+        return embeddings, np.einsum("ij,ij->i", embeddings, embeddings)
+
+    norms = np.linalg.norm(embeddings, axis=1)
+    if np.all(np.abs(norms - 1) <= UNIT_NORM_TOLERANCE):
+        return embeddings, None
+    # Zero vectors stay zero, giving them a similarity of 0 to everything
+    return embeddings / np.maximum(norms, np.finfo(np.float32).tiny)[:, None], None
+
+
+def rank_scores(
+    queries: np.ndarray,
+    known: np.ndarray,
+    known_sq_norms: Optional[np.ndarray],
+    metric: Metric,
+) -> np.ndarray:
+    """Scores which rank the known embeddings per query, the higher the more similar, using one matmul.
+
+    Cosine scores are the similarities themselves. Euclidean scores are 2q.k - |k|^2, i.e. |q|^2 - d^2, which
+    saves computing distances for every pair.
+    """
+    scores = queries @ known.T
+    if metric == "euclidean":
+        scores *= 2
+        scores -= known_sq_norms
+    return scores
+
+
+def to_similarity(
+    best_scores: np.ndarray, query_sq_norms: Optional[np.ndarray], metric: Metric
+) -> np.ndarray:
+    """Converts rank scores into similarities, distances being scaled to (0, 1]"""
+    if metric == "cosine":
+        return best_scores
+    distances = np.sqrt(np.maximum(query_sq_norms - best_scores, 0))
+    return 1 / (1 + distances)
+
+
+def top1_block(
+    queries: np.ndarray,
+    query_sq_norms: Optional[np.ndarray],
+    known: np.ndarray,
+    known_sq_norms: Optional[np.ndarray],
+    metric: Metric,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Best similarity and matching known row of each prepared query, against one block of prepared known rows"""
+    scores = rank_scores(queries, known, known_sq_norms, metric)
+    best_indices = np.argmax(scores, axis=1)
+    best_scores = scores[np.arange(len(queries)), best_indices]
+    return to_similarity(best_scores, query_sq_norms, metric), best_indices
+
+
+class Top1SimilarityKernel:
+    """Exact top-1 similarity search against a fixed set of known embeddings.
+
+    The known set is prepared once. Queries are then handled in chunks, each costing a single float32 matmul
+    and a vectorized argmax, with chunks sized so the score matrix stays under max_block_bytes.
+    """
+
+    def __init__(
+        self,
+        known: np.ndarray,
+        metric: Metric,
+        chunk_size: int = 1024,
+        max_block_bytes: int = 64 * 2**20,
+    ):
+        self.metric = metric
+        self.known, self.known_sq_norms = prepare_embeddings(known, metric)
+
+        bytes_per_query = max(1, self.known.shape[0]) * np.dtype(np.float32).itemsize
+        self.chunk_size = max(1, min(chunk_size, max_block_bytes // bytes_per_query))
+
+    def search(self, queries: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns the best similarity of each query and the row of the matching known embedding."""
+        queries, query_sq_norms = prepare_embeddings(queries, self.metric)
+        best_scores = np.empty(len(queries), dtype=np.float32)
+        best_indices = np.empty(len(queries), dtype=np.int64)
+
+        for start in range(0, len(queries), self.chunk_size):
+            chunk = slice(start, start + self.chunk_size)
+            best_scores[chunk], best_indices[chunk] = top1_block(
+                queries[chunk],
+                query_sq_norms[chunk] if query_sq_norms is not None else None,
+                self.known,
+                self.known_sq_norms,
+                self.metric,
+            )
+
+        return best_scores, best_indices
@@ -1,30 +1,45 @@
-from typing import List, Literal, override
+import hashlib
+import logging
+import os
+import tempfile
+from pathlib import Path
+from typing import List, Literal, Optional, override
 
 import numpy as np
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity, euclidean_distances
 
 from src.core.config import SimilarityConfig
-from src.core.interfaces import AnomalyDetector
+from src.core.interfaces import AnomalyDetector, EmbeddingProvider
+from src.similarity.index import create_similarity_index
+
+logger = logging.getLogger(__name__)
 
 
 class SimilarityAnomalyDetector(AnomalyDetector):
     """Anomaly detector based on semantic similarity to known training examples."""
 
-    def __init__(self, config: SimilarityConfig):
+    # Bumped whenever the layout of the persisted embeddings changes
+    ARTIFACT_VERSION = 1
+
+    def __init__(self, config: SimilarityConfig, embedder: EmbeddingProvider):
         self.model_name = config.model_name
+        self.backend = config.backend
         self.threshold = config.distance_threshold
         self.data_path = config.data_path
+        self.artifact_dir = config.artifact_dir
         self.metric: Literal["cosine", "euclidean"] = config.metric
 
-        # Load model
-        self.embedder = SentenceTransformer(self.model_name)
+        # Shared embedding model
+        self.embedder = embedder
+        # Nearest-neighbour search over the known embeddings
+        self.index = create_similarity_index(self.metric, config.index)
 
         # Load data
         self.__load_training_data()
 
     @override
-    def is_anomaly(self, query: str | List[str]) -> bool | List[bool]:
+    def is_anomaly(
+        self, query: str | List[str], embeddings: Optional[np.ndarray] = None
+    ) -> bool | List[bool]:
         """Determines if query/queries are anomalies based on similarity threshold."""
         if isinstance(query, str):
             queries = [query]
@@ -33,30 +48,65 @@ class SimilarityAnomalyDetector(AnomalyDetector):
             queries = query
             single_input = False
 
-        query_embs = self.embedder.encode(queries, convert_to_numpy=True)
-        sims = self.__compute_similarity(query_embs)
+        if embeddings is None:
+            query_embs = self.embedder.encode(queries)
+        else:
+            query_embs = np.atleast_2d(embeddings)
+        best_scores, _ = self.index.search(query_embs)
 
         # For each query, check if max similarity >= threshold
-        results = [float(np.max(row)) < self.threshold for row in sims]
+        results = [bool(score < self.threshold) for score in best_scores]
 
         return results[0] if single_input else results
 
     def __load_training_data(self) -> None:
-        """Reads dataset and precomputes embeddings for known samples."""
+        """Reads dataset, precomputes embeddings for known samples and indexes them."""
         with open(self.data_path, "r") as training_data_file:
             self.known_texts = [
                 line_data.strip() for line_data in training_data_file.readlines()
             ]
-        self.known_embeddings = self.embedder.encode(
-            self.known_texts, convert_to_numpy=True
+        self.known_embeddings = self.__load_known_embeddings()
+        self.index.build(self.known_embeddings)
+
+    def __load_known_embeddings(self) -> np.ndarray:
+        """Loads the persisted embeddings of the known texts, only encoding them when they changed.
+
+        The artifact is memory-mapped read-only, so the workers of a host share the same page-cache pages
+        instead of each holding a private copy.
+        """
+        if self.artifact_dir is None:
+            return self.embedder.encode(self.known_texts)
+
+        artifact_name = f"known_embeddings_{self.__artifact_key()}.npy"
+        artifact_path = Path(self.artifact_dir) / artifact_name
+        if artifact_path.exists():
+            logger.info(f"Loading known embeddings from {artifact_path}")
+            return np.load(artifact_path, mmap_mode="r")
+
+        logger.info(
+            f"Encoding {len(self.known_texts)} known texts, to be saved at {artifact_path}"
         )
+        embeddings = np.asarray(self.embedder.encode(self.known_texts), dtype=np.float32)
 
-    def __compute_similarity(self, query_embedding: np.ndarray) -> np.ndarray:
-        """Computes similarity or distance to known embeddings."""
-        if self.metric == "cosine":
-            return cosine_similarity(query_embedding, self.known_embeddings)
-        elif self.metric == "euclidean":
-            distances = euclidean_distances(query_embedding, self.known_embeddings)
-            return 1 / (1 + distances)  # scale to (0, 1]
-        else:
-            raise ValueError(f"Unsupported metric: {self.metric}")
+        # Written to a temporary file first, so concurrent workers never read a partial artifact
+        artifact_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=artifact_path.parent, suffix=".npy.tmp")
+        try:
+            with os.fdopen(fd, "wb") as temp_file:
+                np.save(temp_file, embeddings)
+            os.replace(temp_path, artifact_path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+        return np.load(artifact_path, mmap_mode="r")
+
+    def __artifact_key(self) -> str:
+        """Hash of everything the known embeddings depend on: the data, the model, its backend and the
+        artifact layout"""
+        digest = hashlib.sha256()
+        digest.update(
+            f"v{self.ARTIFACT_VERSION}|{self.model_name}|{self.backend}|".encode()
+        )
+        digest.update("\n".join(self.known_texts).encode())
+        return digest.hexdigest()[:16]
@@ -0,0 +1,86 @@
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from redis.exceptions import RedisError
+
+from src.cache.codec import encode_label
+from src.cache.async_redis_cache import AsyncRedisCache
+from src.core.interfaces import CachedLabel
+
+
+class TestAsyncRedisCache(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        # Mock the async Redis client
+        patcher = patch("src.cache.async_redis_cache.aioredis.Redis")
+        self.addCleanup(patcher.stop)
+        self.mock_redis_cls = patcher.start()
+        self.mock_redis_client = AsyncMock()
+        self.mock_redis_cls.return_value = self.mock_redis_client
+
+        self.cache = AsyncRedisCache()
+
+    async def test_get_hit(self):
+        value = CachedLabel(3, 0.75)
+        self.mock_redis_client.get.return_value = encode_label(value)
+        result = await self.cache.get("abc")
+        self.assertEqual(result, value)
+        self.mock_redis_client.get.assert_awaited_once()
+
+    async def test_get_miss(self):
+        self.mock_redis_client.get.return_value = None
+        result = await self.cache.get("abc")
+        self.assertIsNone(result)
+
+    async def test_get_error_is_a_miss(self):
+        self.mock_redis_client.get.side_effect = RedisError("timeout")
+        result = await self.cache.get("abc")
+        self.assertIsNone(result)
+
+    async def test_set_success(self):
+        self.mock_redis_client.setex.return_value = True
+        result = await self.cache.set("abc", CachedLabel(1), ttl_hours=2)
+        self.assertTrue(result)
+        _, ttl_seconds, _ = self.mock_redis_client.setex.await_args[0]
+        self.assertEqual(ttl_seconds, 2 * 3600)
+
+    async def test_set_failure(self):
+        self.mock_redis_client.setex.return_value = False
+        result = await self.cache.set("abc", CachedLabel(1))
+        self.assertFalse(result)
+
+    async def test_delete_found(self):
+        self.mock_redis_client.delete.return_value = 1
+        result = await self.cache.delete("abc")
+        self.assertTrue(result)
+
+    async def test_clear_unlinks_each_scanned_page(self):
+        self.mock_redis_client.scan.side_effect = [(7, [b"k1", b"k2"]), (0, [b"k3"])]
+        self.mock_redis_client.unlink.side_effect = [2, 1]
+        result = await self.cache.clear()
+        self.assertTrue(result)
+        self.assertEqual(
+            [call.args for call in self.mock_redis_client.unlink.await_args_list],
+            [(b"k1", b"k2"), (b"k3",)],
+        )
+        self.mock_redis_client.keys.assert_not_called()
+
+    async def test_exists_true(self):
+        self.mock_redis_client.exists.return_value = 1
+        result = await self.cache.exists("abc")
+        self.assertTrue(result)
+
+    async def test_get_many_uses_single_mget(self):
+        self.mock_redis_client.mget.return_value = [None, encode_label(CachedLabel(1))]
+        result = await self.cache.get_many(["abc", "def"])
+        self.assertEqual(result, [None, CachedLabel(1)])
+        self.mock_redis_client.mget.assert_awaited_once()
+
+    async def test_set_many_pipelines_setex(self):
+        mock_pipeline = MagicMock()
+        mock_pipeline.execute = AsyncMock(return_value=[True, True])
+        self.mock_redis_client.pipeline = MagicMock(return_value=mock_pipeline)
+        result = await self.cache.set_many({"abc": CachedLabel(1), "def": CachedLabel(2)})
+        self.assertTrue(result)
+        self.assertEqual(mock_pipeline.setex.call_count, 2)
+        mock_pipeline.execute.assert_awaited_once()
@@ -0,0 +1,103 @@
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from src import bulk_classify
+from src.bulk_classify import classify_file, iter_chunks
+
+
+class TestIterChunks(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.texts = [f"text {i}" for i in range(7)]
+
+    def test_csv_is_cut_in_fixed_size_chunks(self):
+        path = Path(self.temp_dir.name) / "input.csv"
+        path.write_text("id,title\n" + "".join(f"{i},{t}\n" for i, t in enumerate(self.texts)))
+
+        chunks = list(iter_chunks(path, "title", chunk_size=3))
+
+        self.assertEqual(chunks, [self.texts[:3], self.texts[3:6], self.texts[6:]])
+
+    def test_parquet_chunks_ignore_row_groups(self):
+        path = Path(self.temp_dir.name) / "input.parquet"
+        pq.write_table(pa.table({"title": self.texts}), path, row_group_size=2)
+
+        chunks = list(iter_chunks(path, "title", chunk_size=3))
+
+        self.assertEqual([len(chunk) for chunk in chunks], [3, 3, 1])
+        self.assertEqual(sum(chunks, []), self.texts)
+
+
+class TestClassifyFile(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.input_path = Path(self.temp_dir.name) / "input.csv"
+        self.input_path.write_text(
+            "title\n" + "".join(f"repair <{i}>\n" for i in range(10))
+        )
+        self.output_dir = Path(self.temp_dir.name) / "output"
+
+        self.pipeline = MagicMock()
+        self.pipeline.run.side_effect = lambda texts, timings: [
+            ("section", text) for text in texts
+        ]
+        patcher = patch.object(bulk_classify, "_worker_pipeline", self.pipeline)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def classify(self):
+        with ThreadPoolExecutor(2) as executor:
+            return classify_file(
+                self.input_path, self.output_dir, executor, chunk_size=4
+            )
+
+    def test_writes_sanitized_results_as_parquet(self):
+        report = self.classify()
+
+        table = pq.read_table(self.output_dir).sort_by("row")
+        self.assertEqual(report["rows"], 10)
+        self.assertEqual(table.column("row").to_pylist(), list(range(10)))
+        self.assertEqual(table.column("text").to_pylist()[2], "repair <2>")
+        self.assertEqual(table.column("name").to_pylist()[2], "repair 2")
+        self.assertIn("sanitize", report["stage_seconds"])
+
+    def test_resumes_after_an_interruption(self):
+        self.pipeline.run.side_effect = [
+            [("section", "name")] * 4,
+            RuntimeError("interrupted"),
+        ]
+        with self.assertRaises(RuntimeError):
+            with ThreadPoolExecutor(1) as executor:
+                classify_file(
+                    self.input_path, self.output_dir, executor, chunk_size=4, max_pending=1
+                )
+
+        self.pipeline.run.side_effect = lambda texts, timings: [
+            ("section", "name") for _ in texts
+        ]
+        report = self.classify()
+
+        self.assertEqual(report["skipped_chunks"], 1)
+        self.assertEqual(report["rows"], 6)
+        self.assertEqual(pq.read_table(self.output_dir).num_rows, 10)
+
+    def test_refuses_to_resume_another_input(self):
+        self.classify()
+        self.input_path.write_text("title\nsomething else\n")
+
+        with self.assertRaises(ValueError):
+            self.classify()
+
+
+if __name__ == "__main__":
+    unittest.main()
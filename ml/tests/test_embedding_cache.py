@@ -0,0 +1,107 @@
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+
+import numpy as np
+
+from src.embeddings.embedding_cache import (
+    CachedEmbeddingProvider,
+    DiskEmbeddingStore,
+    text_digest,
+)
+
+
+class TestCachedEmbeddingProvider(unittest.TestCase):
+
+    def setUp(self):
+        self.mock_embedder = MagicMock()
+        self.mock_embedder.get_dimension.return_value = 2
+        self.mock_embedder.encode.side_effect = lambda texts: np.array(
+            [[len(text), 1.0] for text in texts], dtype=np.float32
+        )
+
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+
+    def test_memory_hits_skip_the_encoder(self):
+        provider = CachedEmbeddingProvider(self.mock_embedder, max_size=10)
+
+        first = provider.encode(["a", "bb"])
+        second = provider.encode(["bb", "a"])
+
+        np.testing.assert_array_equal(second, first[[1, 0]])
+        self.mock_embedder.encode.assert_called_once_with(["a", "bb"])
+        self.assertEqual(provider.get_stats(), {"memory_hits": 2, "disk_hits": 0, "misses": 2})
+
+    def test_duplicates_are_encoded_once(self):
+        provider = CachedEmbeddingProvider(self.mock_embedder, max_size=10)
+
+        result = provider.encode(["a", "a", "ccc"])
+
+        self.mock_embedder.encode.assert_called_once_with(["a", "ccc"])
+        np.testing.assert_array_equal(result[:, 0], [1, 1, 3])
+
+    def test_disk_tier_survives_a_restart(self):
+        store = DiskEmbeddingStore(self.temp_dir.name, dimension=2)
+        CachedEmbeddingProvider(self.mock_embedder, disk_store=store).encode(["a", "bb"])
+        self.mock_embedder.encode.reset_mock()
+
+        reopened = DiskEmbeddingStore(self.temp_dir.name, dimension=2)
+        provider = CachedEmbeddingProvider(self.mock_embedder, disk_store=reopened)
+        result = provider.encode(["bb", "new"])
+
+        self.assertEqual(len(reopened), 3)
+        self.mock_embedder.encode.assert_called_once_with(["new"])
+        np.testing.assert_array_equal(result, [[2, 1], [3, 1]])
+        self.assertEqual(provider.disk_hits, 1)
+
+    def test_disk_store_rejects_other_dimensions(self):
+        DiskEmbeddingStore(self.temp_dir.name, dimension=2)
+        with self.assertRaises(ValueError):
+            DiskEmbeddingStore(self.temp_dir.name, dimension=3)
+
+
+class TestDiskEmbeddingStore(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.store = DiskEmbeddingStore(self.temp_dir.name, dimension=2)
+        self.store.put_many(
+            [text_digest("a"), text_digest("b")], np.array([[1, 1], [2, 2]], dtype=np.float32)
+        )
+
+    def test_orphan_vector_of_a_crashed_append_is_dropped(self):
+        # Crash after the vector append, before the key append
+        with open(self.store.vectors_path, "ab") as vectors_file:
+            vectors_file.write(np.array([9, 9], dtype=np.float32).tobytes())
+
+        reopened = DiskEmbeddingStore(self.temp_dir.name, dimension=2)
+        reopened.put_many([text_digest("c")], np.array([[3, 3]], dtype=np.float32))
+
+        stored = reopened.get_many([text_digest(text) for text in "abc"])
+        np.testing.assert_array_equal(stored, [[1, 1], [2, 2], [3, 3]])
+
+    def test_partial_key_of_a_crashed_append_is_dropped(self):
+        with open(self.store.vectors_path, "ab") as vectors_file:
+            vectors_file.write(np.array([9, 9], dtype=np.float32).tobytes())
+        with open(self.store.keys_path, "ab") as keys_file:
+            keys_file.write(text_digest("x")[:5])
+
+        reopened = DiskEmbeddingStore(self.temp_dir.name, dimension=2)
+        self.assertEqual(len(reopened), 2)
+        reopened.put_many(
+            [text_digest("c"), text_digest("d")], np.array([[3, 3], [4, 4]], dtype=np.float32)
+        )
+
+        stored = reopened.get_many([text_digest(text) for text in "abcd"])
+        np.testing.assert_array_equal(stored, [[1, 1], [2, 2], [3, 3], [4, 4]])
+        self.assertEqual(len(DiskEmbeddingStore(self.temp_dir.name, dimension=2)), 4)
+
+    def test_key_without_its_vector_is_ignored(self):
+        with open(self.store.keys_path, "ab") as keys_file:
+            keys_file.write(text_digest("x"))
+
+        reopened = DiskEmbeddingStore(self.temp_dir.name, dimension=2)
+
+        self.assertEqual(reopened.get_many([text_digest("x")]), [None])
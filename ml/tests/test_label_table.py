@@ -0,0 +1,45 @@
+import unittest
+
+import numpy as np
+from sklearn.preprocessing import LabelEncoder
+
+from src.models.label_table import LabelTable
+
+
+class TestLabelTable(unittest.TestCase):
+
+    def setUp(self):
+        encoder = LabelEncoder().fit(["brakes|pads", "engine|oil", "tires|rotation"])
+        self.table = LabelTable.from_label_encoder(encoder)
+        self.probs = np.array([[0.1, 0.7, 0.2], [0.4, 0.35, 0.25]])
+
+    def test_decode_applies_the_threshold(self):
+        self.assertEqual(
+            self.table.decode(self.probs, threshold=0.5),
+            [("engine", "oil"), ("unknown", "unknown")],
+        )
+
+    def test_top_k_is_sorted_by_probability(self):
+        top_k = self.table.top_k(self.probs, 2)
+
+        self.assertEqual(
+            top_k[0], [("engine", "oil", 0.7), ("tires", "rotation", 0.2)]
+        )
+        self.assertEqual(top_k[1], [("brakes", "pads", 0.4), ("engine", "oil", 0.35)])
+
+    def test_top_k_is_capped_by_the_number_of_classes(self):
+        top_k = self.table.top_k(self.probs, 10)
+
+        self.assertEqual([len(candidates) for candidates in top_k], [3, 3])
+        self.assertTrue(all(isinstance(c[2], float) for c in top_k[0]))
+
+    def test_label_ids_round_trip(self):
+        self.assertEqual(self.table.label_id("engine", "oil"), 1)
+        self.assertEqual(self.table.label(1), ("engine", "oil"))
+        self.assertEqual(self.table.label(self.table.label_id("unknown", "unknown")), ("unknown", "unknown"))
+        self.assertIsNone(self.table.label_id("engine", "coolant"))
+        self.assertIsNone(self.table.label(len(self.table)))
+
+
+if __name__ == "__main__":
+    unittest.main()
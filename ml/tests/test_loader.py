@@ -0,0 +1,119 @@
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+from fastapi.testclient import TestClient
+
+from src.core.config import AppConfig, WarmupConfig, load_config
+from src.core.metrics import BATCH_SIZE, OUTCOMES, STAGE_SECONDS
+from src.app import create_app, result_cache_version
+
+
+def wait_until_ready(client: TestClient, timeout: float = 5) -> int:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status_code = client.get("/readyz").status_code
+        if status_code != 503 or client.get("/healthz").status_code != 200:
+            return status_code
+        time.sleep(0.01)
+    return 503
+
+
+class TestBackgroundLoading(unittest.TestCase):
+
+    def setUp(self):
+        self.config = AppConfig.model_construct(
+            cache=MagicMock(enabled=False),
+            batching=None,
+            streaming=None,
+            warmup=WarmupConfig(batch_sizes=[1, 3]),
+        )
+
+        self.release = threading.Event()
+        self.detector = MagicMock()
+        self.detector.is_anomaly.side_effect = lambda texts, embeddings: [False] * len(texts)
+        self.classifier = MagicMock()
+        self.classifier.predict.side_effect = lambda texts, embeddings: [
+            ("section", "name") for _ in texts
+        ]
+
+        def load_models(config, timings=None):
+            self.release.wait(5)
+            return self.detector, self.classifier, None
+
+        patcher = patch("src.app.load_models", side_effect=load_models)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.release.set)
+
+    def test_binds_right_away_and_is_ready_after_the_warmup(self):
+        metrics_before = (
+            BATCH_SIZE.count(),
+            STAGE_SECONDS.count(stage="classifier"),
+            OUTCOMES.value(outcome="classified"),
+        )
+        with TestClient(create_app(self.config)) as client:
+            self.assertEqual(client.get("/healthz").status_code, 200)
+            self.assertEqual(client.get("/readyz").json(), {"status": "loading"})
+            response = client.post("/repairs", json={"text": "brake pads"})
+            self.assertEqual(response.status_code, 503)
+            self.assertIn("Retry-After", response.headers)
+
+            self.release.set()
+
+            self.assertEqual(wait_until_ready(client), 200)
+            self.assertEqual(
+                [len(call.args[0]) for call in self.classifier.predict.call_args_list], [1, 3]
+            )
+            self.assertIn("warmup", client.get("/readyz").json()["phase_seconds"])
+            # The warmup isn't traffic
+            self.assertEqual(
+                (
+                    BATCH_SIZE.count(),
+                    STAGE_SECONDS.count(stage="classifier"),
+                    OUTCOMES.value(outcome="classified"),
+                ),
+                metrics_before,
+            )
+            response = client.post("/repairs", json={"text": "brake pads"})
+            self.assertEqual(response.json(), {"section": "section", "name": "name"})
+
+    def test_failed_loading_fails_liveness(self):
+        self.detector.is_anomaly.side_effect = RuntimeError("corrupted weights")
+
+        with TestClient(create_app(self.config)) as client:
+            self.release.set()
+
+            self.assertEqual(wait_until_ready(client), 503)
+            self.assertEqual(client.get("/healthz").status_code, 500)
+            self.assertEqual(client.get("/readyz").json(), {"status": "failed"})
+
+
+class TestResultCacheVersion(unittest.TestCase):
+
+    def setUp(self):
+        self.config = load_config(Path(__file__).parent.parent / "config.yaml")
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.config.model.weights_path = Path(temp_dir.name) / "weights.pth"
+        self.config.model.weights_path.write_bytes(b"weights")
+
+    def test_changes_with_the_weights_and_settings(self):
+        version = result_cache_version(self.config)
+        self.assertEqual(result_cache_version(self.config), version)
+
+        self.config.model.weights_path.write_bytes(b"retrained weights")
+        retrained = result_cache_version(self.config)
+        self.config.preprocessing.casefold = False
+        self.assertEqual(len({version, retrained, result_cache_version(self.config)}), 3)
+
+    def test_can_be_pinned(self):
+        self.config.cache.version = "v7"
+        self.assertEqual(result_cache_version(self.config), "v7")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+import unittest
+
+from src.cache.lru_store import LRUTTLStore
+from src.cache.memory_cache import MemoryCache
+from src.core.interfaces import CachedLabel
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestLRUTTLStore(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.store = LRUTTLStore(max_size=3, default_ttl_seconds=10, clock=self.clock)
+
+    def test_evicts_least_recently_used_one_at_a_time(self):
+        for key in "abc":
+            self.store.set(key, key.upper())
+        self.store.get("a")  # "b" becomes the least recently used
+
+        self.store.set("d", "D")
+
+        self.assertEqual(len(self.store), 3)
+        self.assertIsNone(self.store.get("b"))
+        self.assertEqual(self.store.get("a"), "A")
+        self.assertEqual(self.store.get("d"), "D")
+
+    def test_entries_expire_lazily(self):
+        self.store.set("a", "A")
+        self.clock.now = 10
+        self.assertIsNone(self.store.get("a"))
+        self.assertEqual(len(self.store), 0)
+
+    def test_per_entry_ttl(self):
+        self.store.set("short", 1, ttl_seconds=1)
+        self.store.set("default", 2)
+        self.clock.now = 5
+        self.assertFalse(self.store.contains("short"))
+        self.assertTrue(self.store.contains("default"))
+
+    def test_periodic_sweep_drops_unread_expired_entries(self):
+        store = LRUTTLStore(
+            max_size=100, default_ttl_seconds=1, sweep_interval=4, sweep_batch=10, clock=self.clock
+        )
+        store.set("a", 1)
+        store.set("b", 2)
+        self.clock.now = 2
+        store.set("c", 3, ttl_seconds=100)
+        store.get("c")  # fourth operation triggers the sweep
+
+        self.assertEqual(len(store), 1)
+
+
+class TestMemoryCache(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = MemoryCache(max_size=2, default_ttl_hours=1, clock=self.clock)
+
+    async def test_get_set(self):
+        self.assertTrue(await self.cache.set("k", CachedLabel(0)))
+        self.assertEqual(await self.cache.get("k"), CachedLabel(0))
+        self.assertIsNone(await self.cache.get("other"))
+
+    async def test_honors_per_call_ttl(self):
+        await self.cache.set("k", CachedLabel(0), ttl_hours=0.5)
+        self.clock.now = 0.5 * 3600
+        self.assertFalse(await self.cache.exists("k"))
+
+    async def test_get_many_set_many(self):
+        await self.cache.set_many({"a": CachedLabel(1), "b": CachedLabel(2)})
+        self.assertEqual(await self.cache.get_many(["a", "c", "b"]), [CachedLabel(1), None, CachedLabel(2)])
+
+    async def test_size_is_bounded(self):
+        await self.cache.set_many({key: CachedLabel(ord(key)) for key in "abcde"})
+        self.assertEqual(len(self.cache), 2)
+        self.assertEqual(await self.cache.get_many(["d", "e"]), [CachedLabel(ord("d")), CachedLabel(ord("e"))])
+
+    async def test_delete_and_clear(self):
+        await self.cache.set("a", CachedLabel(1))
+        self.assertTrue(await self.cache.delete("a"))
+        self.assertFalse(await self.cache.delete("a"))
+        await self.cache.set("b", CachedLabel(2))
+        self.assertTrue(await self.cache.clear())
+        self.assertEqual(len(self.cache), 0)
@@ -0,0 +1,107 @@
+import unittest
+from unittest.mock import AsyncMock, MagicMock
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.api.metrics import MetricsMiddleware, create_metrics_router
+from src.api.routes import create_router
+from src.core.interfaces import CachedLabel
+from src.core.metrics import (
+    CACHE_LOOKUPS,
+    OUTCOMES,
+    STAGE_SECONDS,
+    Histogram,
+    register_stats,
+)
+from src.models.label_table import LabelTable
+from src.service.repair_service import RepairService
+
+
+class TestHistogram(unittest.TestCase):
+
+    def test_buckets_are_cumulative(self):
+        histogram = Histogram("latency_seconds", "Latency", ["stage"], buckets=[0.1, 1])
+
+        for value in (0.05, 0.1, 0.5, 3):
+            histogram.observe(value, stage="embedding")
+
+        self.assertEqual(
+            histogram.render()[2:],
+            [
+                'latency_seconds_bucket{stage="embedding",le="0.1"} 2',
+                'latency_seconds_bucket{stage="embedding",le="1"} 3',
+                'latency_seconds_bucket{stage="embedding",le="+Inf"} 4',
+                'latency_seconds_sum{stage="embedding"} 3.65',
+                'latency_seconds_count{stage="embedding"} 4',
+            ],
+        )
+
+
+class TestMetricsEndpoint(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = AsyncMock()
+        self.cache.get.return_value = None
+        self.cache.get_many.return_value = [CachedLabel(0), None, None]
+        self.detector = MagicMock()
+        self.detector.is_anomaly.side_effect = lambda texts, embeddings: [
+            text == "anomaly" for text in texts
+        ]
+        self.classifier = MagicMock()
+        self.classifier.predict.side_effect = lambda texts, embeddings: [
+            ("section", "name") for _ in texts
+        ]
+        service = RepairService(
+            self.cache,
+            self.detector,
+            self.classifier,
+            label_table=LabelTable.from_labels([("section", "name")]),
+        )
+
+        app = FastAPI()
+        app.include_router(create_metrics_router())
+        router = create_router(lambda: service)
+        app.include_router(router)
+        app.add_middleware(MetricsMiddleware, paths=[route.path for route in router.routes])
+        self.client = TestClient(app)
+
+    def test_server_timing_has_each_stage(self):
+        response = self.client.post("/repairs", json={"text": "brake pads"})
+
+        stages = [entry.split(";")[0] for entry in response.headers["Server-Timing"].split(", ")]
+        self.assertEqual(
+            stages,
+            ["sanitize", "cache_lookup", "queue_wait", "embedding", "similarity", "classifier", "cache_write"],
+        )
+
+    def test_counts_cache_lookups_and_outcomes(self):
+        backend = type(self.cache).__name__
+        hits = CACHE_LOOKUPS.value(backend=backend, result="hit")
+        misses = CACHE_LOOKUPS.value(backend=backend, result="miss")
+        anomalies = OUTCOMES.value(outcome="anomaly")
+        classified = OUTCOMES.value(outcome="classified")
+        classifier_runs = STAGE_SECONDS.count(stage="classifier")
+
+        self.client.post("/repairs_batch", json={"texts": ["cached", "anomaly", "brake pads"]})
+
+        self.assertEqual(CACHE_LOOKUPS.value(backend=backend, result="hit"), hits + 1)
+        self.assertEqual(CACHE_LOOKUPS.value(backend=backend, result="miss"), misses + 2)
+        self.assertEqual(OUTCOMES.value(outcome="anomaly"), anomalies + 1)
+        self.assertEqual(OUTCOMES.value(outcome="classified"), classified + 1)
+        self.assertEqual(STAGE_SECONDS.count(stage="classifier"), classifier_runs + 1)
+
+    def test_exposes_the_stats_of_the_caches(self):
+        tiered_cache = MagicMock()
+        tiered_cache.get_stats.return_value = {"l1_hits": 3, "l1_misses": 1}
+        register_stats("result", tiered_cache)
+
+        body = self.client.get("/metrics").text
+
+        self.assertIn('repair_cache_stats_total{cache="result",counter="l1_hits"} 3', body)
+        self.assertIn("# TYPE repair_stage_seconds histogram", body)
+        self.assertIn("# TYPE repair_requests_in_flight gauge", body)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,159 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import numpy as np
+import torch
+import torch.nn as nn
+from sklearn.preprocessing import LabelEncoder
+
+from src.embeddings.sentence_embedder import load_sentence_transformer
+from src.models.backend_parity import agreement, embedding_drift
+from src.models.classifier import EmbeddingsRepairClassifier
+from src.models.onnx_head import OnnxClassifierHead, head_export_path
+from src.models.trained_classifier import TrainingRepairClassifier
+
+
+class TestOnnxClassifierHead(unittest.TestCase):
+
+    def setUp(self):
+        torch.manual_seed(0)
+        self.head = nn.Sequential(nn.Linear(8, 6), nn.ReLU(), nn.Linear(6, 3)).eval()
+
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.weights_path = Path(self.temp_dir.name) / "classifier.pth"
+        self.weights_path.touch()
+
+    def test_matches_the_torch_head_for_any_batch_size(self):
+        onnx_head = OnnxClassifierHead(self.head, 8, self.weights_path)
+
+        for batch_size in (1, 5):
+            embeddings = np.random.default_rng(batch_size).normal(size=(batch_size, 8))
+            with torch.no_grad():
+                expected = self.head(torch.as_tensor(embeddings, dtype=torch.float32))
+            np.testing.assert_allclose(
+                onnx_head(embeddings), expected.numpy(), rtol=1e-5, atol=1e-6
+            )
+
+    def test_export_is_cached_next_to_the_weights(self):
+        OnnxClassifierHead(self.head, 8, self.weights_path)
+        export_path = head_export_path(self.weights_path)
+        self.assertEqual(export_path.name, "classifier.head.onnx")
+        exported_at = export_path.stat().st_mtime_ns
+
+        OnnxClassifierHead(self.head, 8, self.weights_path)
+
+        self.assertEqual(export_path.stat().st_mtime_ns, exported_at)
+
+    def test_newer_weights_trigger_a_new_export(self):
+        OnnxClassifierHead(self.head, 8, self.weights_path)
+        export_path = head_export_path(self.weights_path)
+        old_time = export_path.stat().st_mtime - 100
+        os.utime(export_path, (old_time, old_time))
+
+        OnnxClassifierHead(self.head, 8, self.weights_path)
+
+        self.assertGreater(export_path.stat().st_mtime, old_time)
+
+
+class TestDecodeLogits(unittest.TestCase):
+
+    def test_decodes_labels_and_applies_the_threshold(self):
+        label_encoder = LabelEncoder().fit(["engine|oil", "brakes|pads"])
+        sentence_transformer = MagicMock()
+        sentence_transformer.get_sentence_embedding_dimension.return_value = 4
+        sentence_transformer.parameters.return_value = []
+        classifier = TrainingRepairClassifier(
+            num_classes=2,
+            threshold=0.7,
+            label_encoder=label_encoder,
+            sentence_transformer=sentence_transformer,
+        )
+
+        # Classes are sorted by the encoder: brakes|pads, then engine|oil
+        results = classifier.decode_logits(np.array([[5.0, 0.0], [0.1, 0.0]]))
+
+        self.assertEqual(results, [("brakes", "pads"), ("unknown", "unknown")])
+
+    def test_top_k_from_precomputed_embeddings(self):
+        label_encoder = LabelEncoder().fit(["engine|oil", "brakes|pads"])
+        classifier = TrainingRepairClassifier(
+            num_classes=2, hidden_dim=8, label_encoder=label_encoder, embedding_dim=4
+        )
+
+        results = classifier.predict_top_k(["a"], 2, embeddings=np.ones((1, 4)))
+
+        (label, candidates), = results
+        self.assertEqual(len(candidates), 2)
+        self.assertAlmostEqual(sum(prob for _, _, prob in candidates), 1.0, places=5)
+        self.assertEqual(label, classifier.predict(["a"], embeddings=np.ones((1, 4)))[0])
+
+
+class TestSharedEmbedder(unittest.TestCase):
+
+    def setUp(self):
+        torch.manual_seed(0)
+        label_encoder = LabelEncoder().fit(["engine|oil", "brakes|pads"])
+        trained = TrainingRepairClassifier(
+            num_classes=2, hidden_dim=8, label_encoder=label_encoder, embedding_dim=4
+        )
+        self.repository = MagicMock()
+        self.repository.load_model.return_value = {
+            "model_config": {
+                "embedding_model_name": "model-a",
+                "num_classes": 2,
+                "hidden_dim": 8,
+                "dropout": 0.3,
+            },
+            "label_encoder": label_encoder,
+            "model_state_dict": trained.state_dict(),
+        }
+
+        self.embedder = MagicMock()
+        self.embedder.get_dimension.return_value = 4
+        self.embedder.encode.side_effect = lambda texts: np.ones((len(texts), 4), dtype=np.float32)
+
+    def test_raw_texts_are_encoded_by_the_shared_embedder(self):
+        self.embedder.get_model_name.return_value = "model-a"
+        classifier = EmbeddingsRepairClassifier(
+            self.repository, "classifier.pth", embedder=self.embedder
+        )
+
+        results = classifier.predict(["a", "b"])
+
+        self.assertEqual(len(results), 2)
+        self.embedder.encode.assert_called_once_with(["a", "b"])
+        self.assertIsNone(classifier.model.sentence_transformer)
+
+    def test_embedder_of_another_model_is_rejected(self):
+        self.embedder.get_model_name.return_value = "model-b"
+
+        with self.assertRaises(ValueError):
+            EmbeddingsRepairClassifier(self.repository, "classifier.pth", embedder=self.embedder)
+
+
+class TestBackendParity(unittest.TestCase):
+
+    def test_embedding_drift(self):
+        reference = np.array([[1.0, 0.0], [0.0, 2.0]])
+        candidate = np.array([[1.0, 0.0], [0.0, 1.0]])
+
+        drift = embedding_drift(reference, candidate)
+
+        self.assertAlmostEqual(drift["min_cosine"], 1.0, places=6)
+        self.assertAlmostEqual(drift["max_abs_diff"], 1.0)
+
+    def test_agreement(self):
+        self.assertEqual(agreement([True, False, True, True], [True, True, True, True]), 0.75)
+        self.assertEqual(agreement([], []), 1.0)
+
+    def test_onnx_encoder_needs_an_export_directory(self):
+        with self.assertRaises(ValueError):
+            load_sentence_transformer("dummy-model", backend="onnx")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+import pstats
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import numpy as np
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.api.admin import ProfilingMiddleware, create_admin_router
+from src.api.routes import create_router
+from src.core.config import BatchingConfig
+from src.service.memory_report import stop_tracemalloc
+from src.service.profiling import RequestProfiler
+from src.service.repair_service import RepairService
+
+
+class TestProfiling(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+        detector = MagicMock()
+        detector.is_anomaly.side_effect = lambda texts, embeddings: [False] * len(texts)
+        detector.known_embeddings = np.zeros((10, 4), dtype=np.float32)
+        classifier = MagicMock()
+        classifier.predict.side_effect = lambda texts, embeddings: [("section", "name") for _ in texts]
+        service = RepairService(None, detector, classifier, batching=BatchingConfig(enabled=True))
+        self.profiler = RequestProfiler(Path(self.directory.name), max_profiles=2)
+
+        app = FastAPI()
+        router = create_router(lambda: service)
+        app.include_router(router)
+        app.include_router(create_admin_router(lambda: service, self.profiler, "secret"))
+        app.add_middleware(
+            ProfilingMiddleware,
+            profiler=self.profiler,
+            paths=[route.path for route in router.routes],
+            admin_token="secret",
+        )
+        self.client = TestClient(app)
+        self.admin_headers = {"X-Admin-Token": "secret"}
+
+    def test_profiles_the_requested_request(self):
+        response = self.client.post(
+            "/repairs", json={"text": "brake pads"}, headers={"X-Profile": "1", **self.admin_headers}
+        )
+        profile_id = response.headers["X-Profile-Id"]
+
+        download = self.client.get(f"/admin/profiles/{profile_id}", headers=self.admin_headers)
+        self.assertEqual(download.status_code, 200)
+        profile_path = Path(self.directory.name) / "downloaded.prof"
+        profile_path.write_bytes(download.content)
+        functions = {function for _, _, function in pstats.Stats(str(profile_path)).stats}
+        # The inference thread's work is part of the trace
+        self.assertIn("run", functions)
+
+    def test_only_admins_get_profiled(self):
+        response = self.client.post("/repairs", json={"text": "brake pads"}, headers={"X-Profile": "1"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("X-Profile-Id", response.headers)
+        self.assertEqual(self.client.get("/admin/profiles").status_code, 403)
+
+    def test_only_the_latest_profiles_are_kept(self):
+        headers = {"X-Profile": "1", **self.admin_headers}
+        for _ in range(3):
+            self.client.post("/repairs_batch", json={"texts": ["a", "b"]}, headers=headers)
+
+        self.assertEqual(len(self.client.get("/admin/profiles", headers=self.admin_headers).json()), 2)
+        self.assertEqual(len(list(Path(self.directory.name).glob("*.prof"))), 2)
+
+    def test_admin_routes_are_closed_without_a_token(self):
+        app = FastAPI()
+        app.include_router(create_admin_router(lambda: None, self.profiler))
+        client = TestClient(app)
+
+        self.assertEqual(client.get("/admin/profiles").status_code, 403)
+        self.assertEqual(client.post("/admin/memory/tracemalloc?enabled=true").status_code, 403)
+
+    def test_memory_report(self):
+        self.addCleanup(stop_tracemalloc)
+        self.client.post("/admin/memory/tracemalloc?enabled=true", headers=self.admin_headers)
+        self.client.post("/repairs_batch", json={"texts": ["a", "b"]})
+
+        report = self.client.get("/admin/memory", headers=self.admin_headers).json()
+
+        self.assertGreater(report["rss_bytes"], 0)
+        self.assertEqual(report["components"]["known_embeddings"]["bytes"], 160)
+        self.assertGreater(report["tracemalloc"]["traced_bytes"], 0)
+        self.assertTrue(report["tracemalloc"]["top_allocators"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,8 +1,9 @@
-import json
 import unittest
 from unittest.mock import MagicMock, patch
 
+from src.cache.codec import encode_label
 from src.cache.redis_cache import RedisCache
+from src.core.interfaces import CachedLabel
 
 
 class TestRedisCache(unittest.IsolatedAsyncioTestCase):
@@ -19,12 +20,27 @@ class TestRedisCache(unittest.IsolatedAsyncioTestCase):
 
     async def test_get_hit(self):
         key = "abc"
-        value_dict = {"a": "1"}
-        self.mock_redis_client.get.return_value = json.dumps(value_dict)
+        value = CachedLabel(3, 0.75)
+        self.mock_redis_client.get.return_value = encode_label(value)
         result = await self.cache.get(key)
-        self.assertEqual(result, value_dict)
+        self.assertEqual(result, value)
         self.mock_redis_client.get.assert_called_once()
 
+    async def test_keys_and_values_are_fixed_width_binary(self):
+        self.mock_redis_client.setex.return_value = True
+        await self.cache.set("replace the front brake pads " * 8, CachedLabel(7))
+        await self.cache.set("oil", CachedLabel(7, 0.9))
+        (long_key, _, value), (short_key, _, confident_value) = [
+            call.args for call in self.mock_redis_client.setex.call_args_list
+        ]
+        self.assertEqual(len(long_key), len(short_key))
+        self.assertTrue(long_key.startswith(b"repairs_classification:"))
+        self.assertEqual((len(value), len(confident_value)), (2, 6))
+
+    async def test_undecodable_value_is_a_miss(self):
+        self.mock_redis_client.get.return_value = b'{"section": "s", "name": "n"}'
+        self.assertIsNone(await self.cache.get("abc"))
+
     async def test_get_miss(self):
         self.mock_redis_client.get.return_value = None
         result = await self.cache.get("abc")
@@ -32,13 +48,13 @@ class TestRedisCache(unittest.IsolatedAsyncioTestCase):
 
     async def test_set_success(self):
         self.mock_redis_client.setex.return_value = True
-        result = await self.cache.set("abc", {"x": "y"})
+        result = await self.cache.set("abc", CachedLabel(1))
         self.assertTrue(result)
         self.mock_redis_client.setex.assert_called_once()
 
     async def test_set_failure(self):
         self.mock_redis_client.setex.return_value = False
-        result = await self.cache.set("abc", {"x": "y"})
+        result = await self.cache.set("abc", CachedLabel(1))
         self.assertFalse(result)
 
     async def test_delete_found(self):
@@ -51,16 +67,35 @@ class TestRedisCache(unittest.IsolatedAsyncioTestCase):
         result = await self.cache.delete("abc")
         self.assertFalse(result)
 
-    async def test_clear_with_keys(self):
-        self.mock_redis_client.keys.return_value = ["k1", "k2"]
-        self.mock_redis_client.delete.return_value = 2
-        result = await self.cache.clear()
+    async def test_clear_scans_the_namespace_in_batches(self):
+        cache = RedisCache(namespace="v2")
+        self.mock_redis_client.scan.side_effect = [(7, [b"k1", b"k2"]), (3, []), (0, [b"k3"])]
+        self.mock_redis_client.unlink.side_effect = [2, 1]
+        result = await cache.clear()
         self.assertTrue(result)
+        self.assertEqual(self.mock_redis_client.unlink.call_count, 2)
+        self.assertEqual(
+            [call.args[0] for call in self.mock_redis_client.scan.call_args_list], [0, 7, 3]
+        )
+        self.assertEqual(
+            self.mock_redis_client.scan.call_args.kwargs["match"], b"repairs_classification:v2:*"
+        )
+        self.mock_redis_client.delete.assert_not_called()
 
     async def test_clear_no_keys(self):
-        self.mock_redis_client.keys.return_value = []
+        self.mock_redis_client.scan.return_value = (0, [])
         result = await self.cache.clear()
         self.assertTrue(result)
+        self.mock_redis_client.unlink.assert_not_called()
+
+    async def test_namespaces_keep_apart(self):
+        self.mock_redis_client.setex.return_value = True
+        await RedisCache(namespace="v1").set("abc", CachedLabel(1))
+        await RedisCache(namespace="v2").set("abc", CachedLabel(1))
+        v1_key, v2_key = [call.args[0] for call in self.mock_redis_client.setex.call_args_list]
+        self.assertTrue(v1_key.startswith(b"repairs_classification:v1:"))
+        self.assertNotEqual(v1_key, v2_key)
+        self.assertEqual(v1_key[-16:], v2_key[-16:])
 
     async def test_exists_true(self):
         self.mock_redis_client.exists.return_value = 1
@@ -71,3 +106,20 @@ class TestRedisCache(unittest.IsolatedAsyncioTestCase):
         self.mock_redis_client.exists.return_value = 0
         result = await self.cache.exists("abc")
         self.assertFalse(result)
+
+    async def test_get_many_uses_single_mget(self):
+        self.mock_redis_client.mget.return_value = [encode_label(CachedLabel(1)), None]
+        result = await self.cache.get_many(["abc", "def"])
+        self.assertEqual(result, [CachedLabel(1), None])
+        self.mock_redis_client.mget.assert_called_once()
+        self.mock_redis_client.get.assert_not_called()
+
+    async def test_set_many_pipelines_setex(self):
+        mock_pipeline = MagicMock()
+        mock_pipeline.execute.return_value = [True, True]
+        self.mock_redis_client.pipeline.return_value = mock_pipeline
+        result = await self.cache.set_many({"abc": CachedLabel(1), "def": CachedLabel(2)})
+        self.assertTrue(result)
+        self.assertEqual(mock_pipeline.setex.call_count, 2)
+        mock_pipeline.execute.assert_called_once()
+        self.mock_redis_client.setex.assert_not_called()
@@ -1,8 +1,21 @@
+import asyncio
+import threading
+import time
 import unittest
 from unittest.mock import AsyncMock, MagicMock
 
+import numpy as np
+
 from src.api.models import RepairResponse
+from src.core.config import BatchingConfig, PreprocessingConfig
+from src.core.interfaces import CachedLabel
+from src.models.label_table import UNKNOWN_LABEL_ID, LabelTable
 from src.service.repair_service import RepairService
+from src.service.scheduler import DeadlineExceededError, QueueFullError
+
+LABEL_TABLE = LabelTable.from_labels(
+    [("cached", "cached"), ("sec1", "name1"), ("sec2", "name2"), ("pred_section", "pred_name")]
+)
 
 
 class TestRepairService(unittest.IsolatedAsyncioTestCase):
@@ -16,13 +29,13 @@ class TestRepairService(unittest.IsolatedAsyncioTestCase):
         self.service = RepairService(
             cache=self.mock_cache,
             anomaly_detector=self.mock_anomaly_detector,
-            classifier=self.mock_classifier
+            classifier=self.mock_classifier,
+            label_table=LABEL_TABLE,
         )
 
     async def test_classify_repair_from_cache(self):
-        cached_value = {"section": "cached_section", "name": "cached_name"}
-        expected_result = RepairResponse(**cached_value)
-        self.mock_cache.get.return_value = cached_value
+        expected_result = RepairResponse(section="cached", name="cached")
+        self.mock_cache.get.return_value = CachedLabel(0)
 
         result = await self.service.classify_repair("some text")
 
@@ -55,24 +68,20 @@ class TestRepairService(unittest.IsolatedAsyncioTestCase):
         self.mock_cache.set.assert_awaited_once()
 
     async def test_classify_batch_repair_all_cached(self):
-        self.mock_cache.get.side_effect = [
-            {"section": "s1", "name": "n1"},
-            {"section": "s2", "name": "n2"}
-        ]
+        self.mock_cache.get_many.return_value = [CachedLabel(1), CachedLabel(2, 0.9)]
 
         result = await self.service.classify_batch_repair(["t1", "t2"])
 
         self.assertEqual(len(result), 2)
-        self.assertEqual(result[0].section, "s1")
-        self.assertEqual(result[1].section, "s2")
+        self.assertEqual(result[0].section, "sec1")
+        self.assertEqual(result[1].section, "sec2")
+        self.mock_cache.get_many.assert_awaited_once()
         self.mock_anomaly_detector.is_anomaly.assert_not_called()
+        self.mock_cache.get.assert_not_awaited()
 
     async def test_classify_batch_repair_mixed_anomalies_and_predictions(self):
         # First item cached, second needs prediction
-        self.mock_cache.get.side_effect = [
-            {"section": "cached", "name": "cached"},
-            None
-        ]
+        self.mock_cache.get_many.return_value = [CachedLabel(0), None]
         self.mock_anomaly_detector.is_anomaly.return_value = [True]
         self.mock_classifier.predict.return_value = [("sec_pred", "name_pred")]
 
@@ -81,10 +90,12 @@ class TestRepairService(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(len(result), 2)
         self.assertEqual(result[0].section, "cached")
         self.assertEqual(result[1].section, "unknown")  # anomaly
-        self.mock_cache.set.assert_awaited()
+        self.mock_cache.set_many.assert_awaited_once_with(
+            {"t2": CachedLabel(UNKNOWN_LABEL_ID)}
+        )
 
     async def test_classify_batch_repair_normal_predictions(self):
-        self.mock_cache.get.side_effect = [None, None]
+        self.mock_cache.get_many.return_value = [None, None]
         self.mock_anomaly_detector.is_anomaly.return_value = [False, False]
         self.mock_classifier.predict.return_value = [
             ("sec1", "name1"),
@@ -95,4 +106,193 @@ class TestRepairService(unittest.IsolatedAsyncioTestCase):
 
         self.assertEqual(result[0].section, "sec1")
         self.assertEqual(result[1].section, "sec2")
-        self.mock_cache.set.assert_awaited()
+        self.mock_cache.get_many.assert_awaited_once_with(["t1", "t2"])
+        self.mock_cache.set_many.assert_awaited_once()
+        self.mock_cache.set.assert_not_awaited()
+
+    async def test_classify_batch_repair_top_k_bypasses_cache_reads(self):
+        self.mock_anomaly_detector.is_anomaly.return_value = [False, True]
+        self.mock_classifier.predict_top_k.return_value = [
+            (("sec1", "name1"), [("sec1", "name1", 0.8), ("sec2", "name2", 0.1)])
+        ]
+
+        result = await self.service.classify_batch_repair(["t1", "t2"], top_k=2)
+
+        self.mock_cache.get_many.assert_not_awaited()
+        self.mock_classifier.predict_top_k.assert_called_once()
+        self.assertEqual(self.mock_classifier.predict_top_k.call_args[0][1], 2)
+        self.assertEqual(result[0].section, "sec1")
+        self.assertEqual(
+            [(c.section, c.probability) for c in result[0].candidates],
+            [("sec1", 0.8), ("sec2", 0.1)],
+        )
+        self.assertEqual(result[1].section, "unknown")
+        self.assertEqual(result[1].candidates, [])
+        # Only the labels are cached
+        self.mock_cache.set_many.assert_awaited_once_with(
+            {"t1": CachedLabel(1, 0.8), "t2": CachedLabel(UNKNOWN_LABEL_ID)}
+        )
+
+    async def test_classify_batch_repair_classifies_each_canonical_text_once(self):
+        self.mock_cache.get_many.return_value = [None, CachedLabel(0)]
+        self.mock_anomaly_detector.is_anomaly.return_value = [False]
+        self.mock_classifier.predict.return_value = [("sec1", "name1")]
+
+        result = await self.service.classify_batch_repair(
+            ["Replace brake pads", "oil", "replace  brake pads ", "ＯＩＬ", "REPLACE BRAKE PADS"]
+        )
+
+        self.mock_cache.get_many.assert_awaited_once_with(["replace brake pads", "oil"])
+        self.assertEqual(self.mock_classifier.predict.call_args[0][0], ["replace brake pads"])
+        self.assertEqual(
+            [r.section for r in result], ["sec1", "cached", "sec1", "cached", "sec1"]
+        )
+        self.mock_cache.set_many.assert_awaited_once_with(
+            {"replace brake pads": CachedLabel(1)}
+        )
+
+    async def test_canonicalization_is_configurable(self):
+        self.service = RepairService(
+            cache=self.mock_cache,
+            anomaly_detector=self.mock_anomaly_detector,
+            classifier=self.mock_classifier,
+            preprocessing=PreprocessingConfig(casefold=False),
+            label_table=LABEL_TABLE,
+        )
+        self.mock_cache.get.return_value = CachedLabel(0)
+
+        await self.service.classify_repair("  Brake\t pads ")
+
+        self.mock_cache.get.assert_awaited_once_with("Brake pads")
+
+
+class TestRepairServiceSharedEmbeddings(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.mock_embedder = MagicMock()
+        self.mock_anomaly_detector = MagicMock()
+        self.mock_classifier = MagicMock()
+
+        self.service = RepairService(
+            cache=None,
+            anomaly_detector=self.mock_anomaly_detector,
+            classifier=self.mock_classifier,
+            embedder=self.mock_embedder,
+        )
+
+    async def test_classify_repair_encodes_once(self):
+        embeddings = np.array([[0.1, 0.2]])
+        self.mock_embedder.encode.return_value = embeddings
+        self.mock_anomaly_detector.is_anomaly.return_value = False
+        self.mock_classifier.predict.return_value = ("sec", "name")
+
+        result = await self.service.classify_repair("some text")
+
+        self.assertEqual(result, RepairResponse(section="sec", name="name"))
+        self.mock_embedder.encode.assert_called_once_with(["some text"])
+        self.assertIs(
+            self.mock_anomaly_detector.is_anomaly.call_args.kwargs["embeddings"], embeddings
+        )
+        np.testing.assert_array_equal(
+            self.mock_classifier.predict.call_args.kwargs["embeddings"], embeddings
+        )
+
+    async def test_classify_batch_repair_passes_normal_rows_to_classifier(self):
+        embeddings = np.array([[0.1, 0.2], [0.3, 0.4], [0.5, 0.6]])
+        self.mock_embedder.encode.return_value = embeddings
+        self.mock_anomaly_detector.is_anomaly.return_value = [False, True, False]
+        self.mock_classifier.predict.return_value = [("s1", "n1"), ("s3", "n3")]
+
+        result = await self.service.classify_batch_repair(["t1", "t2", "t3"])
+
+        self.assertEqual([r.section for r in result], ["s1", "unknown", "s3"])
+        self.mock_embedder.encode.assert_called_once_with(["t1", "t2", "t3"])
+        args, kwargs = self.mock_classifier.predict.call_args
+        self.assertEqual(args[0], ["t1", "t3"])
+        np.testing.assert_array_equal(kwargs["embeddings"], embeddings[[0, 2]])
+
+    def test_pipeline_reports_the_time_of_each_stage(self):
+        self.mock_embedder.encode.return_value = np.array([[0.1, 0.2]])
+        self.mock_anomaly_detector.is_anomaly.return_value = [False]
+        self.mock_classifier.predict.return_value = [("s1", "n1")]
+        timings = {}
+
+        self.service.pipeline.run(["t1"], timings)
+
+        self.assertEqual(set(timings), {"embedding", "similarity", "classifier"})
+
+
+class TestRepairServiceMicroBatching(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.mock_anomaly_detector = MagicMock()
+        self.mock_classifier = MagicMock()
+
+        self.service = RepairService(
+            cache=None,
+            anomaly_detector=self.mock_anomaly_detector,
+            classifier=self.mock_classifier,
+            batching=BatchingConfig(enabled=True, max_batch_size=8, max_wait_ms=20),
+        )
+        self.addAsyncCleanup(self.service.close)
+
+    async def test_concurrent_single_requests_share_one_batch(self):
+        self.mock_anomaly_detector.is_anomaly.return_value = [False, True, False]
+        self.mock_classifier.predict.return_value = [("s1", "n1"), ("s3", "n3")]
+
+        results = await asyncio.gather(
+            self.service.classify_repair("t1"),
+            self.service.classify_repair("t2"),
+            self.service.classify_repair("t3"),
+        )
+
+        self.assertEqual([r.section for r in results], ["s1", "unknown", "s3"])
+        self.mock_anomaly_detector.is_anomaly.assert_called_once()
+        self.assertEqual(
+            self.mock_anomaly_detector.is_anomaly.call_args[0][0], ["t1", "t2", "t3"]
+        )
+        self.mock_classifier.predict.assert_called_once()
+
+
+class TestRepairServiceWithoutMicroBatching(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.mock_anomaly_detector = MagicMock()
+        self.mock_classifier = MagicMock()
+
+        self.service = RepairService(
+            cache=None,
+            anomaly_detector=self.mock_anomaly_detector,
+            classifier=self.mock_classifier,
+            batching=BatchingConfig(enabled=False, max_queue_size=1),
+        )
+        self.addAsyncCleanup(self.service.close)
+
+    async def test_full_queue_refuses_new_requests(self):
+        release = threading.Event()
+
+        def blocking_is_anomaly(texts, **kwargs):
+            release.wait(5)
+            return [True] * len(texts)
+
+        self.mock_anomaly_detector.is_anomaly.side_effect = blocking_is_anomaly
+        self.addCleanup(release.set)
+        # The first one runs, the second one waits for the inference thread
+        callers = [asyncio.ensure_future(self.service.classify_repair("t1"))]
+        await asyncio.sleep(0.05)
+        callers.append(asyncio.ensure_future(self.service.classify_batch_repair(["t2"])))
+        await asyncio.sleep(0.05)
+
+        with self.assertRaises(QueueFullError):
+            await self.service.classify_repair("t3")
+
+        release.set()
+        await asyncio.gather(*callers)
+        # Without batching, each request still runs on its own
+        self.assertEqual(self.mock_anomaly_detector.is_anomaly.call_count, 2)
+
+    async def test_expired_requests_are_dropped(self):
+        with self.assertRaises(DeadlineExceededError):
+            await self.service.classify_batch_repair(["t1", "t2"], deadline=time.monotonic() - 1)
+
+        self.mock_anomaly_detector.is_anomaly.assert_not_called()
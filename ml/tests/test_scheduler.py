@@ -0,0 +1,180 @@
+import asyncio
+import threading
+import time
+import unittest
+from unittest.mock import AsyncMock
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.api.routes import QUEUE_FULL_RETRY_AFTER, create_router
+from src.service.scheduler import (
+    DeadlineExceededError,
+    MicroBatchScheduler,
+    QueueFullError,
+)
+
+
+class TestMicroBatchScheduler(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.batches = []
+        self.threads = set()
+
+        def batch_fn(items):
+            self.batches.append(list(items))
+            self.threads.add(threading.current_thread().name)
+            return [item.upper() for item in items]
+
+        self.batch_fn = batch_fn
+
+    async def test_concurrent_submits_are_coalesced(self):
+        scheduler = MicroBatchScheduler(self.batch_fn, max_batch_size=32, max_wait_ms=20)
+        self.addAsyncCleanup(scheduler.close)
+
+        results = await asyncio.gather(*(scheduler.submit(t) for t in ["a", "b", "c"]))
+
+        self.assertEqual(results, ["A", "B", "C"])
+        self.assertEqual(self.batches, [["a", "b", "c"]])
+        self.assertNotIn(threading.current_thread().name, self.threads)
+
+    async def test_batches_are_capped_at_max_batch_size(self):
+        scheduler = MicroBatchScheduler(self.batch_fn, max_batch_size=2, max_wait_ms=20)
+        self.addAsyncCleanup(scheduler.close)
+
+        results = await asyncio.gather(*(scheduler.submit(t) for t in "abcde"))
+
+        self.assertEqual(results, list("ABCDE"))
+        self.assertTrue(all(len(batch) <= 2 for batch in self.batches))
+        self.assertEqual(sum(len(batch) for batch in self.batches), 5)
+
+    async def test_errors_are_propagated_to_every_caller(self):
+        def failing_fn(items):
+            raise RuntimeError("model failure")
+
+        scheduler = MicroBatchScheduler(failing_fn, max_batch_size=8, max_wait_ms=5)
+        self.addAsyncCleanup(scheduler.close)
+
+        results = await asyncio.gather(
+            scheduler.submit("a"), scheduler.submit("b"), return_exceptions=True
+        )
+
+        self.assertTrue(all(isinstance(r, RuntimeError) for r in results))
+
+    async def test_run_batch_skips_coalescing(self):
+        scheduler = MicroBatchScheduler(self.batch_fn, max_batch_size=2, max_wait_ms=5)
+        self.addAsyncCleanup(scheduler.close)
+
+        results = await scheduler.run_batch(["x", "y", "z"])
+
+        self.assertEqual(results, ["X", "Y", "Z"])
+        self.assertEqual(self.batches, [["x", "y", "z"]])
+
+    async def test_close_fails_waiting_callers_and_refuses_new_items(self):
+        release = threading.Event()
+
+        def blocking_fn(items):
+            release.wait(5)
+            return items
+
+        scheduler = MicroBatchScheduler(blocking_fn, max_batch_size=1, max_wait_ms=1)
+        self.addCleanup(release.set)
+        dispatched = asyncio.ensure_future(scheduler.submit("a"))
+        queued = asyncio.ensure_future(scheduler.submit("b"))
+        await asyncio.sleep(0.05)
+
+        await scheduler.close()
+
+        for caller in (dispatched, queued):
+            with self.assertRaises(RuntimeError):
+                await asyncio.wait_for(caller, 1)
+        with self.assertRaises(RuntimeError):
+            await scheduler.submit("c")
+        with self.assertRaises(RuntimeError):
+            await scheduler.run_batch(["d"])
+
+    async def test_full_queue_refuses_new_items(self):
+        release = threading.Event()
+
+        def blocking_fn(items):
+            release.wait(5)
+            return items
+
+        scheduler = MicroBatchScheduler(blocking_fn, max_batch_size=1, max_wait_ms=1, max_queue_size=2)
+        self.addAsyncCleanup(scheduler.close)
+        self.addCleanup(release.set)
+        # The first one runs, the next two wait for the inference thread
+        callers = [asyncio.ensure_future(scheduler.submit("a"))]
+        await asyncio.sleep(0.05)
+        callers += [asyncio.ensure_future(scheduler.submit(t)) for t in "bc"]
+        await asyncio.sleep(0.05)
+
+        with self.assertRaises(QueueFullError):
+            await scheduler.submit("d")
+        with self.assertRaises(QueueFullError):
+            await scheduler.run_batch(["e"])
+
+        release.set()
+        self.assertEqual(await asyncio.gather(*callers), ["a", "b", "c"])
+        self.assertEqual(scheduler.waiting, 0)
+        self.assertEqual(await scheduler.run_batch(["e", "f", "g"]), ["e", "f", "g"])
+
+    async def test_expired_items_are_dropped_and_waits_are_reported(self):
+        release = threading.Event()
+
+        def blocking_fn(items):
+            release.wait(5)
+            self.batches.append(list(items))
+            return items
+
+        scheduler = MicroBatchScheduler(blocking_fn, max_batch_size=1, max_wait_ms=1)
+        self.addAsyncCleanup(scheduler.close)
+        self.addCleanup(release.set)
+        timings = {}
+        running = asyncio.ensure_future(scheduler.submit("a"))
+        await asyncio.sleep(0.02)
+        expiring = asyncio.ensure_future(scheduler.submit("b", deadline=time.monotonic() + 0.01))
+        expiring_batch = asyncio.ensure_future(
+            scheduler.run_batch(["c"], deadline=time.monotonic() + 0.01)
+        )
+        waiting = asyncio.ensure_future(scheduler.submit("d", timings=timings))
+        await asyncio.sleep(0.1)
+        release.set()
+
+        self.assertEqual(await running, "a")
+        with self.assertRaises(DeadlineExceededError):
+            await expiring
+        with self.assertRaises(DeadlineExceededError):
+            await expiring_batch
+        self.assertEqual(await waiting, "d")
+        self.assertEqual(self.batches, [["a"], ["d"]])
+        self.assertGreaterEqual(timings["queue_wait"], 0.1)
+
+
+class TestAdmissionControlRoutes(unittest.TestCase):
+
+    def setUp(self):
+        self.service = AsyncMock()
+        app = FastAPI()
+        app.include_router(create_router(lambda: self.service))
+        self.client = TestClient(app)
+
+    def test_full_queue_answers_429_with_retry_after(self):
+        self.service.classify_repair.side_effect = QueueFullError("full")
+
+        response = self.client.post("/repairs", json={"text": "brake pads"})
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers["Retry-After"], str(QUEUE_FULL_RETRY_AFTER))
+
+    def test_deadline_is_passed_on_and_expiry_answers_504(self):
+        self.service.classify_batch_repair.side_effect = DeadlineExceededError("late")
+
+        before = time.monotonic()
+        response = self.client.post(
+            "/repairs_batch", json={"texts": ["a"]}, headers={"X-Deadline-Ms": "500"}
+        )
+
+        self.assertEqual(response.status_code, 504)
+        deadline = self.service.classify_batch_repair.call_args.args[2]
+        self.assertGreater(deadline, before + 0.4)
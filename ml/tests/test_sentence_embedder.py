@@ -0,0 +1,71 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+
+from src.embeddings.sentence_embedder import (
+    SentenceEmbeddingProvider,
+    token_budget_batches,
+)
+
+
+class TestTokenBudgetBatches(unittest.TestCase):
+
+    def test_batches_are_sorted_by_length_and_fit_the_budget(self):
+        lengths = np.array([10, 3, 8, 3, 4, 9])
+
+        batches = token_budget_batches(lengths, max_batch_tokens=16)
+
+        for batch in batches:
+            self.assertLessEqual(len(batch) * lengths[batch].max(), 16)
+        np.testing.assert_array_equal(np.concatenate(batches), np.argsort(lengths, kind="stable"))
+
+    def test_texts_over_the_budget_get_their_own_batch(self):
+        batches = token_budget_batches(np.array([2, 50, 2]), max_batch_tokens=10)
+
+        self.assertEqual([batch.tolist() for batch in batches], [[0, 2], [1]])
+
+
+class TestSentenceEmbeddingProvider(unittest.TestCase):
+
+    def setUp(self):
+        self.model = MagicMock()
+        self.model.max_seq_length = 128
+        self.model.get_sentence_embedding_dimension.return_value = 2
+        self.model.tokenizer.side_effect = lambda texts, **kwargs: {
+            "input_ids": [text.split() for text in texts]
+        }
+        self.model.encode.side_effect = lambda texts, **kwargs: np.array(
+            [[len(text.split()), len(text)] for text in texts], dtype=np.float32
+        )
+
+        patcher = patch(
+            "src.embeddings.sentence_embedder.load_sentence_transformer",
+            return_value=self.model,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_sub_batches_are_scattered_back_in_order(self):
+        provider = SentenceEmbeddingProvider("dummy-model", max_batch_tokens=4)
+        texts = ["a b c d", "a", "a b", "a b c", "b"]
+
+        embeddings = provider.encode(texts)
+
+        np.testing.assert_array_equal(embeddings[:, 0], [4, 1, 2, 3, 1])
+        self.assertGreater(self.model.encode.call_count, 1)
+        for call in self.model.encode.call_args_list:
+            batch = call.args[0]
+            self.assertLessEqual(len(batch) * max(len(t.split()) for t in batch), 4)
+
+    def test_no_budget_encodes_in_one_call(self):
+        provider = SentenceEmbeddingProvider("dummy-model")
+
+        provider.encode(["a", "b c"])
+
+        self.model.encode.assert_called_once_with(["a", "b c"], convert_to_numpy=True)
+        self.model.tokenizer.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
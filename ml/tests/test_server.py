@@ -0,0 +1,219 @@
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import textwrap
+import time
+import unittest
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+from src.server import worker_cpus
+
+WORKER_SCRIPT = textwrap.dedent(
+    """
+    import os, sys
+    from fastapi import FastAPI
+    from src.server import PreforkSupervisor
+
+    # Created before forking, and inherited by the workers
+    shared = {"parent": os.getpid()}
+
+    def create_worker_app():
+        app = FastAPI()
+
+        @app.get("/pid")
+        def pid():
+            return {"pid": os.getpid(), "parent": shared["parent"]}
+
+        return app
+
+    PreforkSupervisor(create_worker_app, "127.0.0.1", int(sys.argv[1]), workers=2).run()
+    """
+)
+
+SERVE_SCRIPT = textwrap.dedent(
+    """
+    import os, sys, time
+    from pathlib import Path
+    from unittest.mock import patch
+    from src.core.config import load_config
+    from src.server import serve
+
+    parent = os.getpid()
+    release_path = Path(sys.argv[2])
+
+    class Detector:
+        def is_anomaly(self, texts, embeddings=None):
+            return [False] * len(texts)
+
+    class Classifier:
+        def predict(self, texts, embeddings=None):
+            return [("section", "name")] * len(texts)
+
+    def load_models(config, timings=None):
+        # Models start thread pools, which a worker mustn't inherit
+        if os.getpid() == parent:
+            raise RuntimeError("The models were loaded before forking the workers")
+        while not release_path.exists():
+            time.sleep(0.01)
+        return Detector(), Classifier(), None
+
+    config = load_config(Path("config.yaml"))
+    config = config.model_copy(
+        update={
+            "cache": config.cache.model_copy(update={"enabled": False}),
+            "embedding_cache": config.embedding_cache.model_copy(update={"enabled": False}),
+            "warmup": config.warmup.model_copy(update={"batch_sizes": [1]}),
+            "server": config.server.model_copy(
+                update={"host": "127.0.0.1", "port": int(sys.argv[1]), "workers": 2}
+            ),
+        }
+    )
+    with patch("src.app.load_models", side_effect=load_models):
+        serve(config)
+    """
+)
+
+THREADED_SCRIPT = textwrap.dedent(
+    """
+    import threading
+    from fastapi import FastAPI
+    from src.server import PreforkSupervisor
+
+    # Stands for the thread pool of a model which already ran
+    release = threading.Event()
+    threading.Thread(target=release.wait, daemon=True).start()
+
+    PreforkSupervisor(FastAPI, "127.0.0.1", 0, workers=2).run()
+    """
+)
+
+
+def free_port() -> int:
+    with socket.socket() as free_socket:
+        free_socket.bind(("127.0.0.1", 0))
+        return free_socket.getsockname()[1]
+
+
+class TestWorkerCpus(unittest.TestCase):
+
+    def test_cpus_are_split_evenly(self):
+        cpus = list(range(16))
+
+        slices = [worker_cpus(worker, 4, cpus) for worker in range(4)]
+
+        self.assertEqual(slices[1], [4, 5, 6, 7])
+        self.assertEqual(sorted(sum(slices, [])), cpus)
+
+    def test_more_workers_than_cpus_share_them(self):
+        self.assertEqual([worker_cpus(worker, 3, [0, 1]) for worker in range(3)], [[0], [1], [0]])
+
+
+class TestPreforkSupervisor(unittest.TestCase):
+
+    def setUp(self):
+        self.port = free_port()
+        self.process = subprocess.Popen(
+            [sys.executable, "-c", WORKER_SCRIPT, str(self.port)],
+            cwd=Path(__file__).parent.parent,
+        )
+        self.addCleanup(self.process.kill)
+
+    def get_pid(self):
+        with urllib.request.urlopen(f"http://127.0.0.1:{self.port}/pid", timeout=1) as response:
+            return json.loads(response.read())
+
+    def wait_for_workers(self, count, exclude=()):
+        pids = set()
+        deadline = time.monotonic() + 30
+        while len(pids - set(exclude)) < count and time.monotonic() < deadline:
+            try:
+                pids.add(self.get_pid()["pid"])
+            except OSError:
+                time.sleep(0.1)
+        return pids - set(exclude)
+
+    def test_forked_workers_serve_and_are_replaced(self):
+        pids = self.wait_for_workers(2)
+        self.assertEqual(len(pids), 2)
+        self.assertEqual(self.get_pid()["parent"], self.process.pid)
+
+        dead_pid = pids.pop()
+        os.kill(dead_pid, signal.SIGKILL)
+        self.assertEqual(len(self.wait_for_workers(2, exclude=[dead_pid])), 2)
+
+        self.process.send_signal(signal.SIGTERM)
+        self.assertEqual(self.process.wait(timeout=30), 0)
+
+
+class TestForkSafety(unittest.TestCase):
+
+    def test_refuses_to_fork_with_threads_running(self):
+        process = subprocess.run(
+            [sys.executable, "-c", THREADED_SCRIPT],
+            cwd=Path(__file__).parent.parent,
+            capture_output=True,
+            text=True,
+            timeout=30,
+        )
+
+        self.assertNotEqual(process.returncode, 0)
+        self.assertIn("threads running", process.stderr)
+
+
+class TestServe(unittest.TestCase):
+
+    def setUp(self):
+        self.port = free_port()
+        self.release_path = Path(tempfile.mkdtemp()) / "release"
+        self.process = subprocess.Popen(
+            [sys.executable, "-c", SERVE_SCRIPT, str(self.port), str(self.release_path)],
+            cwd=Path(__file__).parent.parent,
+        )
+        self.addCleanup(self.process.kill)
+
+    def get_readiness(self):
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{self.port}/readyz", timeout=1) as response:
+                return response.status, json.loads(response.read())
+        except urllib.error.HTTPError as error:
+            return error.code, json.loads(error.read())
+
+    def wait_for_readiness(self, status_code):
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            try:
+                readiness = self.get_readiness()
+                if readiness[0] == status_code:
+                    return readiness
+            except OSError:
+                pass
+            time.sleep(0.1)
+        return None
+
+    def test_workers_report_loading_then_serve_the_models_they_loaded(self):
+        # The workers answer before their models are loaded, which only happens in them
+        self.assertEqual(self.wait_for_readiness(503), (503, {"status": "loading"}))
+
+        self.release_path.touch()
+
+        self.assertEqual(self.wait_for_readiness(200)[1]["status"], "ready")
+        request = urllib.request.Request(
+            f"http://127.0.0.1:{self.port}/repairs",
+            data=json.dumps({"text": "brake pads"}).encode(),
+            headers={"Content-Type": "application/json"},
+        )
+        with urllib.request.urlopen(request, timeout=5) as response:
+            self.assertEqual(json.loads(response.read()), {"section": "section", "name": "name"})
+
+        self.process.send_signal(signal.SIGTERM)
+        self.assertEqual(self.process.wait(timeout=30), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
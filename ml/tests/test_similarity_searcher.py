@@ -1,35 +1,35 @@
+import tempfile
 import unittest
+from pathlib import Path
 from unittest.mock import patch, mock_open, MagicMock
 import numpy as np
+from sklearn.metrics.pairwise import cosine_similarity, euclidean_distances
 
-from src.core.config import SimilarityConfig
+from src.core.config import SimilarityConfig, SimilarityIndexConfig
+from src.similarity.index import FlatIndex, IVFIndex, create_similarity_index
+from src.similarity.kernel import Top1SimilarityKernel
 from src.similarity.searcher import SimilarityAnomalyDetector
 
 
-class TestSimilarityAnomalyDetector(unittest.TestCase):
-
-    def setUp(self):
-        # Patch SentenceTransformer, cosine_similarity, euclidean_distances, and open()
-        patcher_model = patch("src.similarity.searcher.SentenceTransformer")
-        self.mock_model_cls = patcher_model.start()
-        self.addCleanup(patcher_model.stop)
+def pairwise_similarity(queries, known, metric):
+    """Reference sklearn implementation of the similarity matrix"""
+    if metric == "cosine":
+        return cosine_similarity(queries, known)
+    return 1 / (1 + euclidean_distances(queries, known))
 
-        patcher_cosine = patch("src.similarity.searcher.cosine_similarity")
-        self.mock_cosine = patcher_cosine.start()
-        self.addCleanup(patcher_cosine.stop)
 
-        patcher_euclid = patch("src.similarity.searcher.euclidean_distances")
-        self.mock_euclid = patcher_euclid.start()
-        self.addCleanup(patcher_euclid.stop)
+class TestSimilarityAnomalyDetector(unittest.TestCase):
 
+    def setUp(self):
+        # Patch open()
         patcher_open = patch("builtins.open", mock_open(read_data="text1\ntext2\ntext3\n"))
         self.mock_open = patcher_open.start()
         self.addCleanup(patcher_open.stop)
 
-        # Mock embedder.encode return
+        # Mock embedder.encode return, the known texts being encoded first
+        self.known_embeddings = np.array([[1.0, 0.0], [0.0, 1.0], [-1.0, 0.0]])
         self.mock_embedder_instance = MagicMock()
-        self.mock_embedder_instance.encode.return_value = np.array([[0.1, 0.2], [0.3, 0.4], [0.5, 0.6]])
-        self.mock_model_cls.return_value = self.mock_embedder_instance
+        self.mock_embedder_instance.encode.return_value = self.known_embeddings
 
         # Prepare config
         self.config = SimilarityConfig(
@@ -40,7 +40,7 @@ class TestSimilarityAnomalyDetector(unittest.TestCase):
         )
 
     def test_initialization_loads_training_data_and_embeddings(self):
-        detector = SimilarityAnomalyDetector(self.config)
+        detector = SimilarityAnomalyDetector(self.config, self.mock_embedder_instance)
 
         self.assertTrue(self.mock_open.called)
         args, kwargs = self.mock_open.call_args
@@ -49,34 +49,141 @@ class TestSimilarityAnomalyDetector(unittest.TestCase):
 
         self.assertEqual(detector.known_texts, ["text1", "text2", "text3"])
 
-        self.mock_embedder_instance.encode.assert_any_call(
-            ["text1", "text2", "text3"], convert_to_numpy=True
-        )
+        self.mock_embedder_instance.encode.assert_any_call(["text1", "text2", "text3"])
 
         self.assertTrue(hasattr(detector, "known_embeddings"))
 
     def test_is_anomaly_single_query(self):
-        detector = SimilarityAnomalyDetector(self.config)
-
-        # Setup mock cosine_similarity to return a matrix with max similarity > threshold
-        self.mock_cosine.return_value = np.array([[0.6, 0.4, 0.3]])
+        detector = SimilarityAnomalyDetector(self.config, self.mock_embedder_instance)
 
+        # Max cosine similarity 0.8 > threshold 0.5 => not anomaly
+        self.mock_embedder_instance.encode.return_value = np.array([[0.8, 0.6]])
         result = detector.is_anomaly("some query")
-        self.assertFalse(result)  # max similarity 0.6 > threshold 0.5 => not anomaly
+        self.assertFalse(result)
 
-        # Test when max similarity < threshold
-        self.mock_cosine.return_value = np.array([[0.4, 0.3, 0.2]])
+        # Max cosine similarity 0.3 < threshold 0.5 => anomaly
+        self.mock_embedder_instance.encode.return_value = np.array([[0.3, -0.95]])
         result = detector.is_anomaly("some query")
         self.assertTrue(result)
 
     def test_is_anomaly_batch_queries(self):
-        detector = SimilarityAnomalyDetector(self.config)
+        detector = SimilarityAnomalyDetector(self.config, self.mock_embedder_instance)
 
-        # Return a 2x3 similarity matrix (2 queries, 3 known embeddings)
-        self.mock_cosine.return_value = np.array([
-            [0.6, 0.4, 0.3],
-            [0.4, 0.3, 0.2]
-        ])
+        self.mock_embedder_instance.encode.return_value = np.array([[0.8, 0.6], [0.3, -0.95]])
 
         results = detector.is_anomaly(["query1", "query2"])
         self.assertEqual(results, [False, True])  # first query not anomaly, second is
+
+    def test_is_anomaly_euclidean(self):
+        self.config.metric = "euclidean"
+        detector = SimilarityAnomalyDetector(self.config, self.mock_embedder_instance)
+
+        # Distance 0.2 => similarity 1 / 1.2 > 0.5, distance 3 => similarity 0.25 < 0.5
+        results = detector.is_anomaly(
+            ["query1", "query2"], embeddings=np.array([[1.2, 0.0], [0.0, 4.0]])
+        )
+        self.assertEqual(results, [False, True])
+
+    def test_is_anomaly_uses_precomputed_embeddings(self):
+        detector = SimilarityAnomalyDetector(self.config, self.mock_embedder_instance)
+        self.mock_embedder_instance.encode.reset_mock()
+
+        result = detector.is_anomaly(["query1"], embeddings=np.array([[0.8, 0.6]]))
+
+        self.assertEqual(result, [False])
+        self.mock_embedder_instance.encode.assert_not_called()
+
+
+class TestSimilarityIndexes(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.known = rng.normal(size=(500, 16)).astype(np.float32)
+        self.queries = rng.normal(size=(40, 16)).astype(np.float32)
+
+    def test_flat_index_matches_brute_force(self):
+        for metric in ("cosine", "euclidean"):
+            index = FlatIndex(metric, chunk_size=7)
+            index.build(self.known)
+            scores, indices = index.search(self.queries)
+
+            expected = pairwise_similarity(self.queries, self.known, metric)
+            np.testing.assert_allclose(scores, expected.max(axis=1), rtol=1e-5)
+            np.testing.assert_array_equal(indices, expected.argmax(axis=1))
+
+    def test_ivf_index_probing_every_list_is_exact(self):
+        for metric in ("cosine", "euclidean"):
+            index = IVFIndex(metric, n_lists=8, n_probe=8, chunk_size=16)
+            index.build(self.known)
+            scores, indices = index.search(self.queries)
+
+            expected = pairwise_similarity(self.queries, self.known, metric)
+            np.testing.assert_allclose(scores, expected.max(axis=1), rtol=1e-5)
+            np.testing.assert_array_equal(indices, expected.argmax(axis=1))
+
+    def test_ivf_index_finds_known_points(self):
+        index = IVFIndex("cosine", n_lists=16, n_probe=1)
+        index.build(self.known)
+        scores, indices = index.search(self.known[:20])
+
+        np.testing.assert_array_equal(indices, np.arange(20))
+        np.testing.assert_allclose(scores, 1.0, rtol=1e-5)
+
+    def test_kernel_chunks_stay_under_memory_budget(self):
+        kernel = Top1SimilarityKernel(self.known, "cosine", max_block_bytes=500 * 4 * 3)
+        self.assertEqual(kernel.chunk_size, 3)
+
+        scores, indices = kernel.search(self.queries)
+
+        expected = pairwise_similarity(self.queries, self.known, "cosine")
+        np.testing.assert_allclose(scores, expected.max(axis=1), rtol=1e-5)
+        np.testing.assert_array_equal(indices, expected.argmax(axis=1))
+
+    def test_kernel_keeps_unit_norm_embeddings_without_copy(self):
+        unit = self.known / np.linalg.norm(self.known, axis=1, keepdims=True)
+        kernel = Top1SimilarityKernel(unit, "cosine")
+        self.assertTrue(np.shares_memory(kernel.known, unit))
+
+    def test_factory_uses_configured_index(self):
+        self.assertIsInstance(
+            create_similarity_index("cosine", SimilarityIndexConfig(type="ivf")), IVFIndex
+        )
+        self.assertIsInstance(
+            create_similarity_index("cosine", SimilarityIndexConfig()), FlatIndex
+        )
+
+
+class TestKnownEmbeddingsArtifact(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.data_path = Path(self.temp_dir.name) / "dataset.csv"
+        self.data_path.write_text("text1\ntext2\n")
+
+        self.mock_embedder = MagicMock()
+        self.mock_embedder.encode.return_value = np.array([[1.0, 0.0], [0.0, 1.0]])
+
+        self.config = SimilarityConfig(
+            model_name="dummy-model",
+            distance_threshold=0.5,
+            data_path=self.data_path,
+            metric="cosine",
+            artifact_dir=Path(self.temp_dir.name) / "artifacts",
+        )
+
+    def test_embeddings_are_encoded_once_and_memory_mapped(self):
+        SimilarityAnomalyDetector(self.config, self.mock_embedder)
+        detector = SimilarityAnomalyDetector(self.config, self.mock_embedder)
+
+        self.mock_embedder.encode.assert_called_once_with(["text1", "text2"])
+        self.assertIsInstance(detector.known_embeddings, np.memmap)
+        np.testing.assert_array_equal(detector.known_embeddings, [[1.0, 0.0], [0.0, 1.0]])
+
+    def test_changed_data_is_re_encoded(self):
+        SimilarityAnomalyDetector(self.config, self.mock_embedder)
+        self.data_path.write_text("text1\ntext3\n")
+        SimilarityAnomalyDetector(self.config, self.mock_embedder)
+
+        self.assertEqual(self.mock_embedder.encode.call_count, 2)
+        self.assertEqual(len(list(self.config.artifact_dir.glob("*.npy"))), 2)
@@ -0,0 +1,133 @@
+import json
+import unittest
+from typing import AsyncIterator, List
+from unittest.mock import MagicMock
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.api.routes import create_router
+from src.api.streaming import parse_stream_texts
+from src.core.config import StreamingConfig
+from src.service.repair_service import RepairService
+
+
+async def body(*chunks: bytes) -> AsyncIterator[bytes]:
+    for chunk in chunks:
+        yield chunk
+
+
+async def collect(items: AsyncIterator) -> List:
+    return [item async for item in items]
+
+
+class TestParseStreamTexts(unittest.IsolatedAsyncioTestCase):
+
+    async def test_lines_split_across_chunks(self):
+        texts = await collect(
+            parse_stream_texts(body(b"brake pa", b"ds\n\noil chan", b"ge"), ndjson=False)
+        )
+
+        self.assertEqual(texts, ["brake pads", "oil change"])
+
+    async def test_ndjson_strings_and_objects(self):
+        texts = await collect(
+            parse_stream_texts(body(b'"brake pads"\n{"text": "oil change"}\n'), ndjson=True)
+        )
+
+        self.assertEqual(texts, ["brake pads", "oil change"])
+
+    async def test_never_terminated_line_is_refused_once_too_long(self):
+        async def endless_line():
+            while True:
+                yield b"x" * 1000
+
+        with self.assertRaises(ValueError):
+            await collect(parse_stream_texts(endless_line(), ndjson=False, max_line_bytes=4096))
+
+    async def test_invalid_ndjson_record(self):
+        with self.assertRaises(ValueError):
+            await collect(parse_stream_texts(body(b'{"txt": "oil"}\n'), ndjson=True))
+
+
+class TestRepairServiceStreaming(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.mock_anomaly_detector = MagicMock()
+        self.mock_anomaly_detector.is_anomaly.side_effect = lambda texts, embeddings: [
+            text.startswith("?") for text in texts
+        ]
+        self.mock_classifier = MagicMock()
+        self.mock_classifier.predict.side_effect = lambda texts, embeddings: [
+            (f"section {text}", f"name {text}") for text in texts
+        ]
+
+        self.service = RepairService(
+            cache=None,
+            anomaly_detector=self.mock_anomaly_detector,
+            classifier=self.mock_classifier,
+            streaming=StreamingConfig(chunk_size=2, max_line_bytes=64),
+        )
+
+    async def test_stream_is_classified_in_chunks(self):
+        async def texts():
+            for text in ["a", "b", "c", "d", "e"]:
+                yield text
+
+        chunks = await collect(self.service.classify_stream(texts()))
+
+        self.assertEqual([(start, len(results)) for start, results in chunks], [(0, 2), (2, 2), (4, 1)])
+        self.assertEqual(chunks[2][1][0].section, "section e")
+        self.assertEqual(self.mock_anomaly_detector.is_anomaly.call_count, 3)
+
+    def test_endpoint_streams_ndjson_results(self):
+        app = FastAPI()
+        app.include_router(create_router(lambda: self.service))
+
+        response = TestClient(app).post(
+            "/repairs_stream",
+            content=b'"a"\n{"text": "b"}\n"c"\n',
+            headers={"content-type": "application/x-ndjson"},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("application/x-ndjson"))
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        self.assertEqual(
+            lines,
+            [
+                {"index": 0, "section": "section a", "name": "name a"},
+                {"index": 1, "section": "section b", "name": "name b"},
+                {"index": 2, "section": "section c", "name": "name c"},
+            ],
+        )
+
+    def test_endpoint_reports_a_malformed_line(self):
+        app = FastAPI()
+        app.include_router(create_router(lambda: self.service))
+
+        response = TestClient(app).post(
+            "/repairs_stream",
+            content=b'"a"\n"b"\nnot json\n',
+            headers={"content-type": "application/x-ndjson"},
+        )
+
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        self.assertEqual([line["index"] for line in lines[:-1]], [0, 1])
+        self.assertIn("error", lines[-1])
+
+    def test_endpoint_reports_a_line_over_the_limit(self):
+        app = FastAPI()
+        app.include_router(create_router(lambda: self.service))
+
+        response = TestClient(app).post(
+            "/repairs_stream", content=b"a\nb\n" + b"c" * 100 + b"\nd\n"
+        )
+
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        self.assertEqual([line["index"] for line in lines[:-1]], [0, 1])
+        self.assertIn("64 bytes", lines[-1]["error"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+from unittest.mock import AsyncMock
+
+from src.cache.memory_cache import MemoryCache
+from src.cache.tiered_cache import TieredCache
+from src.core.interfaces import CachedLabel
+
+
+class TestTieredCache(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.l1 = MemoryCache(max_size=10, default_ttl_hours=1)
+        self.l2 = AsyncMock()
+        self.cache = TieredCache(self.l1, self.l2, l1_ttl_seconds=60)
+
+    async def test_l2_hit_is_promoted_to_l1(self):
+        self.l2.get.return_value = CachedLabel(0)
+
+        self.assertEqual(await self.cache.get("k"), CachedLabel(0))
+        self.assertEqual(await self.cache.get("k"), CachedLabel(0))
+
+        self.l2.get.assert_awaited_once_with("k")
+        self.assertEqual(
+            self.cache.get_stats(),
+            {"l1_hits": 1, "l1_misses": 1, "l2_hits": 1, "l2_misses": 0},
+        )
+
+    async def test_miss_in_both_tiers(self):
+        self.l2.get.return_value = None
+        self.assertIsNone(await self.cache.get("k"))
+        self.assertEqual(self.cache.l2_misses, 1)
+
+    async def test_set_writes_through_both_tiers(self):
+        self.l2.set.return_value = True
+        self.assertTrue(await self.cache.set("k", CachedLabel(0)))
+        self.l2.set.assert_awaited_once()
+        self.assertEqual(await self.l1.get("k"), CachedLabel(0))
+
+    async def test_get_many_only_asks_l2_for_l1_misses(self):
+        await self.l1.set("a", CachedLabel(1))
+        self.l2.get_many.return_value = [CachedLabel(2), None]
+
+        results = await self.cache.get_many(["a", "b", "c"])
+
+        self.assertEqual(results, [CachedLabel(1), CachedLabel(2), None])
+        self.l2.get_many.assert_awaited_once_with(["b", "c"])
+        self.assertEqual(await self.l1.get("b"), CachedLabel(2))
+        self.assertEqual(
+            self.cache.get_stats(),
+            {"l1_hits": 1, "l1_misses": 2, "l2_hits": 1, "l2_misses": 1},
+        )
+
+    async def test_set_many_writes_through_both_tiers(self):
+        self.l2.set_many.return_value = True
+        self.assertTrue(await self.cache.set_many({"a": CachedLabel(1)}))
+        self.l2.set_many.assert_awaited_once()
+        self.assertTrue(await self.l1.exists("a"))
@@ -0,0 +1,37 @@
+import unittest
+
+import numpy as np
+import torch
+
+from src.models.torch_head import TorchClassifierHead
+from src.models.trained_classifier import build_classification_head
+
+
+class TestTorchClassifierHead(unittest.TestCase):
+
+    def setUp(self):
+        torch.manual_seed(0)
+        self.head = build_classification_head(8, 16, 0.3, 4)
+        self.embeddings = np.random.default_rng(0).normal(size=(5, 8)).astype(np.float32)
+
+    def test_serving_mode_disables_dropout_and_autograd(self):
+        serving_head = TorchClassifierHead(self.head, 8)
+
+        first = serving_head(self.embeddings)
+        second = serving_head(self.embeddings)
+
+        self.assertFalse(self.head.training)
+        self.assertIsInstance(first, np.ndarray)
+        np.testing.assert_array_equal(first, second)
+
+    def test_torchscript_head_matches_eager(self):
+        eager = TorchClassifierHead(self.head, 8)(self.embeddings)
+        traced = TorchClassifierHead(self.head, 8, "torchscript")
+
+        np.testing.assert_allclose(traced(self.embeddings), eager, rtol=1e-5, atol=1e-6)
+        # Traced with a batch of one, it still handles any batch size
+        self.assertEqual(traced(self.embeddings[0]).shape, (1, 4))
+
+
+if __name__ == "__main__":
+    unittest.main()